@@ -0,0 +1,204 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.metrics import registry
+
+User = get_user_model()
+
+TOKEN_RIGHTS_KEY = 'token-rights:{}'
+
+# Права пользователя, которые записываются в токен.
+CLAIMS = ('username', 'role', 'is_staff', 'is_superuser', 'token_version')
+# Claims, которые сверяются с текущими правами пользователя.
+RIGHTS_CLAIMS = ('token_version', 'role', 'is_staff', 'is_superuser')
+
+
+class ClaimsAccessToken(AccessToken):
+    """Токен доступа с ролью и флагами прав пользователя."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class ClaimsUser(TokenUser):
+    """
+    Пользователь, построенный по claims токена без запроса к базе.
+    Полная модель загружается только при обращении к instance.
+    """
+    is_admin = User.is_admin
+    is_moderator = User.is_moderator
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+    @cached_property
+    def instance(self):
+        try:
+            return User.objects.get(pk=self.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed(
+                'Пользователь не найден.', code='user_not_found'
+            )
+
+    def __str__(self):
+        return self.username
+
+
+def get_user_instance(user):
+    """Модель пользователя запроса для записи в связанные объекты."""
+    if isinstance(user, ClaimsUser):
+        return user.instance
+    return user
+
+
+def get_token_rights(user_id):
+    """
+    Текущие права пользователя (значения RIGHTS_CLAIMS) из кэша.
+    None - пользователя нет или он не активен.
+    Запись живёт TOKEN_RIGHTS_CACHE_TIMEOUT секунд и затем читается
+    из базы заново: так изменения прав доходят до процессов с отдельным
+    кэшем в памяти и изменения через queryset.update() без сигналов.
+    """
+    key = TOKEN_RIGHTS_KEY.format(user_id)
+    rights = cache.get(key)
+    if rights is None:
+        rights = User.objects.filter(pk=user_id, is_active=True).values_list(
+            *RIGHTS_CLAIMS
+        ).first()
+        if rights is not None:
+            rights = tuple(rights)
+            cache.add(key, rights, settings.TOKEN_RIGHTS_CACHE_TIMEOUT)
+    return rights
+
+
+def user_rights(user):
+    return tuple(getattr(user, claim) for claim in RIGHTS_CLAIMS)
+
+
+def store_token_rights(user_id, rights):
+    """Новые права после изменения; None - пользователь удалён."""
+    key = TOKEN_RIGHTS_KEY.format(user_id)
+    if rights is None:
+        cache.delete(key)
+    else:
+        cache.set(key, rights, settings.TOKEN_RIGHTS_CACHE_TIMEOUT)
+
+
+class VerifiedTokenCache:
+    """
+    LRU-кэш проверенных токенов в памяти процесса: повторный запрос
+    с тем же токеном не разбирает его и не проверяет подпись заново.
+    Ключ - sha256 токена, запись живёт до истечения токена (exp),
+    размер ограничен настройкой JWT_CACHE_SIZE (0 - кэш выключен).
+    Пользователь по-прежнему строится и проверяется на каждом запросе,
+    поэтому отзыв токенов по изменению прав продолжает работать.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(raw_token):
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, raw_token):
+        key = self.digest(raw_token)
+        with self.lock:
+            entry = self.tokens.get(key)
+            if entry is not None and entry[1] > time.time():
+                self.tokens.move_to_end(key)
+                self.hits += 1
+                result = entry[0]
+            else:
+                if entry is not None:
+                    del self.tokens[key]
+                self.misses += 1
+                result = None
+        registry.inc('cache_requests_total', {
+            'cache': 'jwt', 'result': 'miss' if result is None else 'hit',
+        })
+        return result
+
+    def put(self, raw_token, token):
+        size = settings.JWT_CACHE_SIZE
+        if not size or 'exp' not in token:
+            return
+        key = self.digest(raw_token)
+        with self.lock:
+            self.tokens[key] = (token, token['exp'])
+            self.tokens.move_to_end(key)
+            while len(self.tokens) > size:
+                self.tokens.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.tokens),
+            }
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Аутентификация по JWT без загрузки пользователя из базы:
+    права берутся из claims токена, а актуальность прав проверяется
+    по текущим правам пользователя в кэше. Токены без claims,
+    выданные раньше, проверяются по базе, как в JWTAuthentication.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = verified_tokens.get(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            verified_tokens.put(raw_token, token)
+        return token
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                'Токен не содержит идентификатор пользователя.'
+            )
+        rights = get_token_rights(user_id)
+        if rights is None:
+            raise AuthenticationFailed(
+                'Пользователь не найден.', code='user_not_found'
+            )
+        if rights != tuple(
+            validated_token[claim] for claim in RIGHTS_CLAIMS
+        ):
+            raise InvalidToken('Права пользователя изменились.')
+        return ClaimsUser(validated_token)
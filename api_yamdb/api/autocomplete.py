@@ -0,0 +1,311 @@
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from reviews.models import Category, Genre, Title
+
+GENERATION_KEY = 'autocomplete:generation'
+CHANGE_KEY = 'autocomplete:change:{}'
+
+TOKEN_RE = re.compile(r'\w+')
+
+Entry = namedtuple('Entry', ('type', 'pk', 'slug', 'name', 'popularity'))
+
+
+def normalize(text):
+    """Нижний регистр, слова через один пробел, без пунктуации."""
+    return ' '.join(TOKEN_RE.findall(text.casefold()))
+
+
+def suffixes(name):
+    """Ключи индекса: название, начиная с каждого его слова."""
+    name = normalize(name)
+    return {
+        name[match.start():] for match in TOKEN_RE.finditer(name)
+    }
+
+
+class AutocompleteIndex:
+    """
+    Префиксный индекс названий произведений, жанров и категорий
+    в памяти процесса: отсортированный список ключей и поиск bisect'ом.
+    Ключи строятся от начала каждого слова, поэтому «мир» находит
+    и «Мир Дикого Запада», и «Война и мир».
+
+    Записи через ORM применяются к индексу сразу (сигналы)
+    и публикуются в кэше под номером очередного поколения; другие
+    процессы догоняют общий счётчик поколений, применяя эти записи.
+    Индекс перестраивается целиком, если журнал неполон (изменение
+    в обход сигналов, вытеснение из кэша), и не реже раза
+    в AUTOCOMPLETE_REFRESH_INTERVAL секунд: так обновляется
+    популярность (число отзывов) жанров и категорий.
+    Перестроение идёт в фоновом потоке, а поиск до замены индекса
+    отвечает по прежнему индексу; в запросе строится только первый.
+    """
+    # Для коротких префиксов диапазон ключей велик, поэтому их топы
+    # запоминаются и поправляются при изменении отдельных записей.
+    scan_limit = 1000
+    # Отставание больше этого числа изменений дешевле перестроить.
+    replay_limit = 1000
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries = None
+        self.generation = None
+        self.built = 0
+        self.refreshing = None
+
+    @staticmethod
+    def load():
+        """Записи и отсортированные ключи индекса из базы."""
+        entries = {}
+        titles = Title.objects.values_list('pk', 'name', 'rating_count')
+        for pk, name, popularity in titles.iterator():
+            entries['title', pk] = Entry('title', pk, None, name, popularity)
+        for model in (Genre, Category):
+            kind = model._meta.model_name
+            rows = model.objects.annotate(
+                popularity=Coalesce(Sum('titles__rating_count'), 0)
+            ).values_list('pk', 'slug', 'name', 'popularity')
+            for pk, slug, name, popularity in rows:
+                entries[kind, pk] = Entry(kind, pk, slug, name, popularity)
+        keys = sorted(
+            (key, item) for item, entry in entries.items()
+            for key in suffixes(entry.name)
+        )
+        return entries, keys
+
+    def build(self, generation):
+        """
+        Строит индекс и заменяет им текущий. Поколение берётся
+        до чтения базы: изменения во время чтения придут следующими
+        поколениями. Записи и удаления при этом применяются повторно
+        без вреда, а отзыв может быть учтён в популярности дважды
+        до следующего перестроения.
+        """
+        entries, keys = self.load()
+        with self.lock:
+            self.entries, self.keys, self.top = entries, keys, {}
+            self.generation = generation
+            self.built = time.monotonic()
+
+    def ensure_fresh(self):
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            self.create_generation()
+            generation = cache.get(GENERATION_KEY)
+        if self.entries is None:
+            self.build(generation)
+            return
+        if generation != self.generation:
+            self.catch_up(generation)
+        interval = settings.AUTOCOMPLETE_REFRESH_INTERVAL
+        if (generation != self.generation
+                or time.monotonic() - self.built > interval):
+            self.refresh_in_background(generation)
+
+    def catch_up(self, generation):
+        """
+        Применяет изменения других процессов из журнала в кэше одним
+        запросом. False, если журнал неполон и индекс нужно перестроить.
+        """
+        if (self.generation is None
+                or not 0 <= generation - self.generation <= self.replay_limit):
+            return False
+        keys = [
+            CHANGE_KEY.format(number)
+            for number in range(self.generation + 1, generation + 1)
+        ]
+        records = cache.get_many(keys)
+        if len(records) < len(keys):
+            return False
+        for key in keys:
+            self.replay(records[key])
+        self.generation = generation
+        return True
+
+    def refresh_in_background(self, generation):
+        if self.refreshing is not None and self.refreshing.is_alive():
+            return
+
+        def refresh():
+            try:
+                self.build(generation)
+            finally:
+                connections.close_all()
+
+        self.refreshing = threading.Thread(target=refresh, daemon=True)
+        self.refreshing.start()
+
+    def reset(self):
+        """Забывает индекс: следующий поиск построит его заново."""
+        if self.refreshing is not None:
+            self.refreshing.join()
+        with self.lock:
+            self.entries = self.generation = None
+
+    def search(self, text, limit, types=None):
+        """
+        Топ-limit записей с ключом, начинающимся с text.
+        types - frozenset типов записей или None для всех.
+        """
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        if text[-1:].isspace():
+            prefix += ' '
+        with self.lock:
+            self.ensure_fresh()
+            memo_key = prefix, types
+            candidates = self.top.get(memo_key)
+            if candidates is None:
+                start = bisect_left(self.keys, (prefix,))
+                end = bisect_left(self.keys, (prefix + '\uffff',))
+                candidates = self.rank({
+                    item for _, item in self.keys[start:end]
+                    if types is None or item[0] in types
+                })
+                if end - start > self.scan_limit:
+                    self.top[memo_key] = candidates
+            return [self.entries[item] for item in candidates[:limit]]
+
+    def order(self, item):
+        entry = self.entries[item]
+        return -entry.popularity, entry.name
+
+    def rank(self, items):
+        return heapq.nsmallest(
+            settings.AUTOCOMPLETE_MAX_LIMIT, items, key=self.order
+        )
+
+    def apply(self, record):
+        """
+        Публикует изменение для других процессов и применяет его,
+        если индекс построен и догоняет журнал до этого изменения.
+        Иначе индекс будет перестроен после следующего запроса.
+        """
+        generation = self.publish(record)
+        with self.lock:
+            if self.generation is None:
+                return
+            if generation is None or not self.catch_up(generation - 1):
+                self.generation = None
+                return
+            self.replay(record)
+            self.generation = generation
+
+    def replay(self, record):
+        """
+        Запись журнала: ('put', тип, pk, slug, название),
+        ('remove', тип, pk) или ('popularity', тип, pk, приращение).
+        """
+        operation, kind, pk, *args = record
+        item = kind, pk
+        previous = self.entries.get(item)
+        if operation == 'put':
+            slug, name = args
+            self.remove_entry(kind, pk)
+            popularity = previous.popularity if previous else 0
+            self.entries[item] = Entry(kind, pk, slug, name, popularity)
+            for key in suffixes(name):
+                insort(self.keys, (key, item))
+        elif operation == 'remove':
+            self.remove_entry(kind, pk)
+        elif previous is not None:
+            delta, = args
+            self.entries[item] = previous._replace(
+                popularity=previous.popularity + delta
+            )
+        self.update_top(item)
+
+    def update_top(self, item):
+        """
+        Поправляет запомненные топы префиксов, которым соответствует
+        изменённая запись. Топ забывается, только если запись была в нём
+        и оказалась последней или выбыла из полного топа: следующего
+        за ней кандидата не узнать без просмотра ключей.
+        """
+        entry = self.entries.get(item)
+        keys = suffixes(entry.name) if entry is not None else ()
+        limit = settings.AUTOCOMPLETE_MAX_LIMIT
+        for memo_key, candidates in list(self.top.items()):
+            prefix, types = memo_key
+            if types is not None and item[0] not in types:
+                continue
+            matches = any(key.startswith(prefix) for key in keys)
+            listed = item in candidates
+            if not (listed or matches):
+                continue
+            full = len(candidates) == limit
+            if listed:
+                candidates.remove(item)
+            if matches:
+                candidates.append(item)
+                candidates.sort(key=self.order)
+                del candidates[limit:]
+            if listed and full and (not matches or candidates[-1] == item):
+                del self.top[memo_key]
+
+    @staticmethod
+    def create_generation():
+        """
+        Начальное поколение - текущее время, а не 0: после потери
+        ключа в кэше построенные ранее индексы не сочтут себя актуальными.
+        """
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+
+    def bump(self):
+        self.create_generation()
+        try:
+            return cache.incr(GENERATION_KEY)
+        except ValueError:
+            return None
+
+    def publish(self, record):
+        """
+        Номер поколения изменения. Журнал хранится не дольше интервала
+        перестроения: более старые индексы всё равно перестраиваются.
+        """
+        generation = self.bump()
+        if generation is not None:
+            cache.set(
+                CHANGE_KEY.format(generation), record,
+                settings.AUTOCOMPLETE_REFRESH_INTERVAL,
+            )
+        return generation
+
+    def invalidate(self):
+        """Изменения в обход сигналов: индексы всех процессов устарели."""
+        self.bump()
+
+    def put(self, kind, pk, slug, name):
+        self.apply(('put', kind, pk, slug, name))
+
+    def remove(self, kind, pk):
+        self.apply(('remove', kind, pk))
+
+    def remove_entry(self, kind, pk):
+        entry = self.entries.pop((kind, pk), None)
+        if entry is None:
+            return None
+        for key in suffixes(entry.name):
+            position = bisect_left(self.keys, (key, (kind, pk)))
+            if self.keys[position:position + 1] == [(key, (kind, pk))]:
+                del self.keys[position]
+        return entry
+
+    def add_popularity(self, pk, delta):
+        """Отзывы меняют популярность произведения без перестроения."""
+        self.apply(('popularity', 'title', int(pk), delta))
+
+
+index = AutocompleteIndex()
@@ -0,0 +1,346 @@
+import copy
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from api.metrics import locked, registry
+
+VERSION_KEY = 'version:{}'
+RESPONSE_KEY = 'response:{}'
+LOCK_KEY = 'lock:{}'
+# Файл flock, под которым FileBasedCache берёт и снимает блокировки.
+LOCKS_GUARD = 'locks.lock'
+# Тег всех закэшированных ответов: данные изменили в обход сигналов.
+IMPORT_TAG = 'import'
+
+
+def model_tag(model):
+    """Тег версии для всех объектов модели."""
+    return model._meta.label_lower
+
+
+def title_tag(title_id):
+    """Тег страниц одного произведения: карточка и списки с ним."""
+    return f'title:{title_id}'
+
+
+def reviews_tag(title_id):
+    return f'reviews:{title_id}'
+
+
+def comments_tag(review_id):
+    return f'comments:{review_id}'
+
+
+def version_timeout():
+    """
+    В общем кэше версии хранятся без срока. Кэш в памяти процесса
+    не видит записей других процессов, поэтому там версия живёт
+    CACHE_VERSION_LOCAL_TIMEOUT секунд: ответы и ETag, построенные
+    по устаревшей версии, действуют не дольше этого срока.
+    """
+    if isinstance(caches['default'], LocMemCache):
+        return settings.CACHE_VERSION_LOCAL_TIMEOUT
+    return None
+
+
+def get_versions(*tags):
+    """
+    Возвращает текущие версии тегов.
+    Версия - время последнего изменения в наносекундах.
+    Отсутствующая в кэше версия создаётся заново с отрицательным
+    временем создания: она отличается от всех прежних версий,
+    но не выглядит как изменение данных (см. CachedResponseMixin).
+    """
+    keys = {VERSION_KEY.format(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, -time.time_ns(), timeout=version_timeout())
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump_versions(*tags):
+    """Делает устаревшими все записи кэша, построенные на этих тегах."""
+    version = time.time_ns()
+    cache.set_many(
+        {VERSION_KEY.format(tag): version for tag in tags},
+        timeout=version_timeout(),
+    )
+
+
+def bump_after_commit(*tags):
+    """
+    Теги закэшированных ответов сбрасываются после фиксации транзакции,
+    иначе параллельный запрос закэширует ещё не изменённые данные.
+    """
+    transaction.on_commit(lambda: bump_versions(*tags))
+
+
+def lock_path(backend, key):
+    return os.path.join(
+        backend._dir, hashlib.md5(key.encode()).hexdigest() + '.lock'
+    )
+
+
+def acquire_lock(key):
+    """
+    Блокировка на RESPONSE_CACHE_LOCK_TIMEOUT секунд. cache.add атомарен
+    в памяти процесса, memcached и Redis, но FileBasedCache проверяет
+    и записывает файл в два шага, и блокировку могут получить двое.
+    Для него блокировка - файл, созданный с O_CREAT | O_EXCL;
+    файл старше таймаута считается оставленным упавшим процессом.
+    Проверка возраста, удаление и создание файла идут под flock
+    каталога кэша: иначе двое, увидев один и тот же старый файл,
+    удалили бы и блокировку, только что созданную другим.
+    """
+    timeout = settings.RESPONSE_CACHE_LOCK_TIMEOUT
+    backend = caches['default']
+    if not isinstance(backend, FileBasedCache):
+        return cache.add(key, True, timeout)
+    path = lock_path(backend, key)
+    with locked(Path(backend._dir), exclusive=True, name=LOCKS_GUARD):
+        try:
+            if time.time() - os.stat(path).st_mtime > timeout:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+    return True
+
+
+def release_lock(key):
+    backend = caches['default']
+    if not isinstance(backend, FileBasedCache):
+        cache.delete(key)
+        return
+    with locked(Path(backend._dir), exclusive=True, name=LOCKS_GUARD):
+        try:
+            os.remove(lock_path(backend, key))
+        except FileNotFoundError:
+            pass
+
+
+class CachedResponseMixin:
+    """
+    Кэширование ответов GET для действий из cached_actions.
+    Список кэшируется сам, остальные действия оборачиваются в cached().
+    Ключ - путь, отсортированные параметры запроса, роль пользователя
+    и тип ответа. Вместе с ответом хранятся версии его тегов
+    (get_cache_tags): ответ действителен, пока ни один тег не изменился,
+    поэтому запись сбрасывает только зависящие от неё страницы.
+    Общий для всех ответов IMPORT_TAG сбрасывает их все сразу.
+
+    Для действий из conditional_actions по тем же версиям строятся
+    ETag и Last-Modified, и совпадающий условный запрос получает 304
+    до обращения к базе данных. Теги таких действий не должны
+    зависеть от ответа: get_cache_tags вызывается с response=None.
+
+    Промах кэша для действий из coalesced_actions пересчитывает
+    один запрос под блокировкой (acquire_lock), остальные ждут
+    его результат.
+    В режиме RESPONSE_CACHE_STALE_WHILE_REVALIDATE устаревший ответ
+    отдаётся сразу, а пересчёт идёт в фоновом потоке.
+    """
+    cached_actions = ('list', 'retrieve')
+    conditional_actions = ()
+    coalesced_actions = ()
+    coalesce_poll_interval = 0.02
+
+    def get_cache_tags(self, response):
+        raise NotImplementedError
+
+    def get_response_tags(self, response):
+        return [IMPORT_TAG, *self.get_cache_tags(response)]
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def cached(self, handler, request, *args, **kwargs):
+        validators = None
+        if self.action in self.conditional_actions:
+            validators = self.get_validators(request)
+            not_modified = get_conditional_response(
+                request._request, *validators
+            )
+            if not_modified is not None:
+                return self.set_validators(not_modified, validators)
+        response = self.get_cached_response(
+            handler, request, *args, **kwargs
+        )
+        if validators is not None and response.status_code == 200:
+            self.set_validators(response, validators)
+        return response
+
+    def get_validators(self, request):
+        """
+        ETag из версий тегов и параметров ответа, Last-Modified -
+        время последнего изменения. Для версии, созданной заново,
+        берётся время её создания: изменений после него точно не было.
+        """
+        versions = get_versions(*self.get_response_tags(None))
+        user = request.user
+        signature = repr((
+            request.get_full_path(), sorted(versions.items()),
+            user.role if user.is_authenticated else 'anonymous',
+            request.accepted_media_type,
+        )).encode()
+        etag = quote_etag(hashlib.md5(signature).hexdigest())
+        last_modified = max(abs(version) for version in versions.values())
+        return etag, last_modified // 10 ** 9
+
+    @staticmethod
+    def set_validators(response, validators):
+        etag, last_modified = validators
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if (self.action not in self.cached_actions
+                or request.accepted_renderer.format != 'json'):
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        refresh_lock = getattr(request._request, 'response_cache_lock', None)
+        if refresh_lock is not None:
+            return self.compute(
+                key, refresh_lock, handler, request, *args, **kwargs
+            )
+        entry, fresh = self.get_entry(key)
+        registry.inc('cache_requests_total', {
+            'cache': 'response', 'result': 'hit' if fresh else 'miss',
+        })
+        if fresh:
+            return self.entry_response(entry)
+        if self.action in self.coalesced_actions:
+            return self.coalesce(key, entry, handler, request, *args, **kwargs)
+        return self.compute(key, None, handler, request, *args, **kwargs)
+
+    def coalesce(self, key, entry, handler, request, *args, **kwargs):
+        """
+        Промах кэша: ответ строит запрос, взявший блокировку,
+        остальные опрашивают кэш, пока не появится актуальная запись.
+        Если блокировку не сняли за RESPONSE_CACHE_LOCK_TIMEOUT,
+        запрос строит ответ сам.
+        """
+        lock_key = LOCK_KEY.format(key)
+        stale = settings.RESPONSE_CACHE_STALE_WHILE_REVALIDATE
+        if entry is not None and stale:
+            if acquire_lock(lock_key):
+                self.refresh_in_background(request, lock_key)
+            return self.entry_response(entry)
+        deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_TIMEOUT
+        while not acquire_lock(lock_key):
+            time.sleep(self.coalesce_poll_interval)
+            entry, fresh = self.get_entry(key)
+            if fresh:
+                return self.entry_response(entry)
+            if time.monotonic() > deadline:
+                return self.compute(
+                    key, None, handler, request, *args, **kwargs
+                )
+        # Пока блокировку ждали, ответ мог сохранить предыдущий владелец.
+        entry, fresh = self.get_entry(key)
+        if fresh:
+            release_lock(lock_key)
+            return self.entry_response(entry)
+        return self.compute(key, lock_key, handler, request, *args, **kwargs)
+
+    def compute(self, key, lock_key, handler, request, *args, **kwargs):
+        """Строит ответ; finalize_response сохранит его и снимет lock_key."""
+        self.response_cache_key = key
+        self.response_cache_lock = lock_key
+        self.response_started = time.time_ns()
+        return handler(request, *args, **kwargs)
+
+    @staticmethod
+    def get_entry(key):
+        """Запись кэша и признак того, что её теги не менялись."""
+        entry = cache.get(key)
+        if entry is None:
+            return None, False
+        return entry, get_versions(*entry['versions']) == entry['versions']
+
+    @staticmethod
+    def entry_response(entry):
+        return HttpResponse(
+            entry['content'], status=entry['status'],
+            content_type=entry['content_type'],
+        )
+
+    def refresh_in_background(self, request, lock_key):
+        """
+        Повторяет запрос в отдельном потоке: новый экземпляр вьюсета
+        строит и сохраняет ответ, минуя проверку кэша.
+        """
+        django_request = copy.copy(request._request)
+        django_request.response_cache_lock = lock_key
+        view = type(self).as_view(self.action_map)
+
+        def refresh():
+            try:
+                view(django_request, *self.args, **self.kwargs)
+            finally:
+                release_lock(lock_key)
+                connections.close_all()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get_response_cache_key(self, request):
+        user = request.user
+        role = user.role if user.is_authenticated else 'anonymous'
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        signature = repr((
+            request.path, params, role, request.accepted_media_type
+        )).encode()
+        return RESPONSE_KEY.format(hashlib.md5(signature).hexdigest())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        key = getattr(self, 'response_cache_key', None)
+        if (key is not None and isinstance(response, Response)
+                and response.status_code == 200):
+            self.store_response(key, response)
+        if getattr(self, 'response_cache_lock', None) is not None:
+            release_lock(self.response_cache_lock)
+        return response
+
+    def store_response(self, key, response):
+        """
+        Сохраняет ответ, если во время его построения теги не менялись:
+        версия тега - время изменения, более поздняя версия значит,
+        что ответ мог быть построен по устаревшим данным.
+        """
+        versions = get_versions(*self.get_response_tags(response))
+        if any(
+            version >= self.response_started for version in versions.values()
+        ):
+            return
+        response.render()
+        cache.set(key, {
+            'versions': versions,
+            'content': response.content,
+            'status': response.status_code,
+            'content_type': response['Content-Type'],
+        }, settings.RESPONSE_CACHE_TIMEOUT)
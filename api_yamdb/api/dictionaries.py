@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from api.cache import get_versions, model_tag
+from reviews.models import Category, Genre
+
+
+class Snapshot(namedtuple(
+    'Snapshot',
+    ('version', 'loaded', 'objects', 'by_id', 'by_slug', 'position'),
+)):
+    """
+    Неизменяемый снимок справочника. Сериализатор страницы берёт
+    снимок один раз и читает из него, не проверяя версию на каждый объект.
+    """
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def get_many(self, pks):
+        """Объекты по id в порядке сортировки модели."""
+        return sorted(
+            (self.by_id[pk] for pk in pks if pk in self.by_id),
+            key=lambda obj: self.position[obj.pk],
+        )
+
+    def get_by_slugs(self, slugs):
+        """Словарь {slug: объект} для найденных slug'ов."""
+        return {
+            slug: self.by_slug[slug] for slug in slugs if slug in self.by_slug
+        }
+
+
+class Dictionary:
+    """
+    Копия небольшой таблицы-справочника в памяти процесса
+    с доступом по id и по slug.
+    Таблица перечитывается, когда меняется её версия в общем кэше:
+    версию при каждой записи увеличивают сигналы из api.signals,
+    поэтому изменения видят все процессы, а в остальное время
+    чтение справочника не обращается к базе данных.
+    Снимок старше DICTIONARY_MAX_AGE секунд перечитывается в любом
+    случае: с кэшем в памяти процесса версии других процессов не видны.
+    Объекты общие для всех запросов и не должны изменяться.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.tag = model_tag(model)
+        self.lock = threading.Lock()
+        self.snapshot = Snapshot(None, 0, [], {}, {}, {})
+
+    def is_fresh(self, version):
+        return (
+            self.snapshot.version == version
+            and time.monotonic() - self.snapshot.loaded
+            < settings.DICTIONARY_MAX_AGE
+        )
+
+    def load(self):
+        """Актуальный снимок таблицы."""
+        version = get_versions(self.tag)[self.tag]
+        if self.is_fresh(version):
+            return self.snapshot
+        with self.lock:
+            if not self.is_fresh(version):
+                objects = list(self.model.objects.all())
+                self.snapshot = Snapshot(
+                    version,
+                    time.monotonic(),
+                    objects,
+                    {obj.pk: obj for obj in objects},
+                    {obj.slug: obj for obj in objects},
+                    {obj.pk: index for index, obj in enumerate(objects)},
+                )
+        return self.snapshot
+
+    def all(self):
+        """Все объекты в порядке сортировки модели."""
+        return self.load().objects
+
+    def get(self, pk):
+        return self.load().get(pk)
+
+    def get_many(self, pks):
+        """Объекты по id в порядке сортировки модели."""
+        if not pks:
+            return []
+        return self.load().get_many(pks)
+
+    def get_by_slugs(self, slugs):
+        """Словарь {slug: объект} для найденных slug'ов."""
+        return self.load().get_by_slugs(slugs)
+
+
+categories = Dictionary(Category)
+genres = Dictionary(Genre)
+
+DICTIONARIES = {Category: categories, Genre: genres}
@@ -0,0 +1,84 @@
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from api.dictionaries import DICTIONARIES
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """
+    Список связанных объектов, которые ищутся
+    одним запросом с IN вместо запроса на каждый slug.
+    """
+    default_error_messages = {
+        **serializers.ManyRelatedField.default_error_messages,
+        'does_not_exist': 'Не найдены объекты с {slug_name}: {values}.',
+        'invalid': 'Некорректное значение.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        if not all(isinstance(value, str) for value in data):
+            self.fail('invalid')
+
+        slugs = list(dict.fromkeys(data))
+        found = self.child_relation.resolve(slugs)
+        missing = [slug for slug in slugs if slug not in found]
+        if missing:
+            self.fail(
+                'does_not_exist',
+                slug_name=self.child_relation.slug_field,
+                values=', '.join(missing),
+            )
+        return [found[slug] for slug in slugs]
+
+
+class BulkSlugRelatedField(serializers.SlugRelatedField):
+    """
+    SlugRelatedField, который при many=True разрешает все slug'и сразу.
+    Если в контексте сериализатора уже есть найденные объекты
+    (prefetched_slugs) или модель - справочник в памяти процесса,
+    запросы к базе не выполняются.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        obj = self.resolve([data]).get(data)
+        if obj is None:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+        return obj
+
+    def resolve(self, slugs):
+        """Словарь {slug: объект} для найденных значений."""
+        queryset = self.get_queryset()
+        prefetched = self.context.get('prefetched_slugs', {}).get(
+            queryset.model
+        )
+        if prefetched is not None:
+            return {slug: prefetched[slug] for slug in slugs
+                    if slug in prefetched}
+        found = {}
+        dictionary = DICTIONARIES.get(queryset.model)
+        if dictionary is not None and self.slug_field == 'slug':
+            found = dictionary.get_by_slugs(slugs)
+            # Не найденные в справочнике ищутся в базе: снимок
+            # справочника мог ещё не увидеть запись другого процесса.
+            slugs = [slug for slug in slugs if slug not in found]
+            if not slugs:
+                return found
+        queryset = queryset.filter(**{f'{self.slug_field}__in': slugs})
+        found.update(
+            (getattr(obj, self.slug_field), obj) for obj in queryset
+        )
+        return found
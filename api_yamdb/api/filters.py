@@ -1,17 +1,72 @@
 import django_filters
 
-from reviews.models import Title
+from reviews.models import Comment, Review, Title
+from reviews.search import match_query, search_available
+
+
+def full_text_search(queryset, field, value, *ordering):
+    """
+    Полнотекстовый поиск по индексу search связанной модели
+    с сортировкой по релевантности. Без индекса (не SQLite) -
+    поиск подстроки без изменения сортировки.
+    """
+    query = match_query(value)
+    if query is None or not search_available(queryset.db):
+        return queryset.filter(**{f'{field}__icontains': value})
+    return queryset.filter(**{f'search__{field}__match': query}).order_by(
+        'search__rank', *ordering
+    )
 
 
 class TitleFilter(django_filters.FilterSet):
     """Возможность фильтрации вывода произведений."""
     genre = django_filters.CharFilter(field_name='genre__slug')
     category = django_filters.CharFilter(field_name='category__slug')
-    name = django_filters.CharFilter(
-        field_name='name',
-        lookup_expr='icontains'
-    )
+    name = django_filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Title
         fields = ('name', 'year', 'genre', 'category',)
+
+    def filter_name(self, queryset, name, value):
+        """Поиск по словам названия, результаты по релевантности."""
+        return full_text_search(queryset, 'name', value, 'name')
+
+
+class TextSearchFilter(django_filters.FilterSet):
+    """Общие параметры поиска по текстам отзывов и комментариев."""
+    q = django_filters.CharFilter(method='filter_text', required=True)
+    author = django_filters.CharFilter(field_name='author__username')
+
+    def filter_text(self, queryset, name, value):
+        return full_text_search(queryset, 'text', value, '-pub_date')
+
+
+class ReviewSearchFilter(TextSearchFilter):
+    """Поиск по отзывам с фильтрами по произведению и оценке."""
+    title = django_filters.NumberFilter(field_name='title_id')
+    min_score = django_filters.NumberFilter(
+        field_name='score', lookup_expr='gte'
+    )
+    max_score = django_filters.NumberFilter(
+        field_name='score', lookup_expr='lte'
+    )
+
+    class Meta:
+        model = Review
+        fields = ('q', 'title', 'author', 'min_score', 'max_score')
+
+
+class CommentSearchFilter(TextSearchFilter):
+    """Поиск по комментариям с фильтрами по произведению и оценке отзыва."""
+    title = django_filters.NumberFilter(field_name='review__title_id')
+    min_score = django_filters.NumberFilter(
+        field_name='review__score', lookup_expr='gte'
+    )
+    max_score = django_filters.NumberFilter(
+        field_name='review__score', lookup_expr='lte'
+    )
+
+    class Meta:
+        model = Comment
+        fields = ('q', 'title', 'author', 'min_score', 'max_score')
@@ -0,0 +1,351 @@
+import json
+import random
+import statistics
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import cycle, islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.authentication import ClaimsAccessToken
+from reviews.models import Category, Comment, Genre, Review, Title
+
+User = get_user_model()
+
+Scenario = namedtuple('Scenario', ('route', 'method', 'requests', 'auth'))
+
+# Маршруты, которые изменяют данные, в замеры не входят.
+SKIPPED = {
+    'categories-detail': 'только удаление',
+    'genres-detail': 'только удаление',
+    'titles-bulk': 'только запись',
+    'auth-signup': 'создаёт пользователей и письма',
+}
+
+
+def percentile(values, share):
+    """Значение с рангом share по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def sample_ids(model, count, rng, hot=None):
+    """
+    Половина - самые популярные строки (по полю hot),
+    половина - случайные из диапазона первичных ключей.
+    """
+    ids = []
+    if hot is not None:
+        ids += model.objects.order_by(hot).values_list(
+            'pk', flat=True
+        )[:count // 2 or 1]
+    bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    while len(ids) < count:
+        pk = model.objects.filter(
+            pk__gte=rng.randint(bounds['low'], bounds['high'])
+        ).values_list('pk', flat=True).first()
+        ids.append(pk)
+    return ids
+
+
+def scenarios(sample, rng):
+    """
+    Запросы к каждому читающему маршруту api/urls.py
+    по выборке существующих объектов.
+    """
+    titles = sample_ids(Title, sample, rng, hot='-rating_count')
+    reviews = list(Review.objects.filter(
+        pk__in=sample_ids(Review, sample, rng)
+    ).values_list('pk', 'title_id', 'text'))
+    comments = list(Comment.objects.filter(
+        pk__in=sample_ids(Comment, sample, rng)
+    ).values_list('pk', 'review_id', 'review__title_id'))
+    usernames = list(User.objects.filter(
+        pk__in=sample_ids(User, sample, rng)
+    ).values_list('username', flat=True))
+    genres = list(Genre.objects.values_list('slug', flat=True)[:sample])
+    categories = list(
+        Category.objects.values_list('slug', flat=True)[:sample]
+    )
+    names = Title.objects.filter(pk__in=titles).values_list('name', flat=True)
+    words = [text.split()[0] for _, _, text in reviews if text.split()]
+
+    def get(route, **kwargs):
+        return reverse(route, kwargs=kwargs), None
+
+    return [
+        Scenario('api-root', 'get', [get('api-root')], None),
+        Scenario('titles-list', 'get', [
+            get('titles-list'),
+            *((reverse('titles-list'), {'genre': slug}) for slug in genres),
+            *((reverse('titles-list'), {'category': slug})
+              for slug in categories),
+        ], None),
+        Scenario('titles-detail', 'get', [
+            get('titles-detail', pk=pk) for pk in titles
+        ], None),
+        Scenario('reviews-list', 'get', [
+            get('reviews-list', title_id=pk) for pk in titles
+        ], None),
+        Scenario('reviews-detail', 'get', [
+            get('reviews-detail', title_id=title_id, pk=pk)
+            for pk, title_id, _ in reviews
+        ], None),
+        Scenario('comments-list', 'get', [
+            get('comments-list', title_id=title_id, review_id=pk)
+            for pk, title_id, _ in reviews
+        ], None),
+        Scenario('comments-detail', 'get', [
+            get('comments-detail', title_id=title_id, review_id=review_id,
+                pk=pk)
+            for pk, review_id, title_id in comments
+        ], None),
+        Scenario('categories-list', 'get', [get('categories-list')], None),
+        Scenario('genres-list', 'get', [get('genres-list')], None),
+        Scenario('search-reviews-list', 'get', [
+            (reverse('search-reviews-list'), {'q': word}) for word in words
+        ], None),
+        Scenario('search-comments-list', 'get', [
+            (reverse('search-comments-list'), {'q': word}) for word in words
+        ], None),
+        Scenario('autocomplete', 'get', [
+            (reverse('autocomplete'), {'q': name[:3]}) for name in names
+        ], None),
+        Scenario('users-list', 'get', [get('users-list')], 'admin'),
+        Scenario('users-detail', 'get', [
+            get('users-detail', username=username) for username in usernames
+        ], 'admin'),
+        Scenario('users-me', 'get', [get('users-me')], 'user'),
+        Scenario('metrics', 'get', [get('metrics')], 'admin'),
+        Scenario('auth-token', 'post', [
+            (reverse('auth-token'),
+             {'username': username, 'confirmation_code': 'invalid'})
+            for username in usernames
+        ], None),
+    ]
+
+
+def tokens():
+    """Токены администратора и обычного пользователя из базы."""
+    admin = User.objects.filter(role='admin').first() or User.objects.filter(
+        is_superuser=True
+    ).first()
+    user = User.objects.filter(role='user').first()
+    return {
+        role: str(ClaimsAccessToken.for_user(account))
+        for role, account in (('admin', admin), ('user', user))
+        if account is not None
+    }
+
+
+def run(scenario, count, concurrency, token, cold):
+    """
+    Выполняет count запросов в concurrency потоков.
+    Возвращает (время, число SQL-запросов, статус) каждого запроса
+    и общее время замера.
+    """
+    requests = list(islice(cycle(scenario.requests), count))
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+
+    def worker(part):
+        client = Client()
+        results = []
+        try:
+            for url, data in part:
+                if cold:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = getattr(client, scenario.method)(
+                        url, data, **headers
+                    )
+                    elapsed = time.perf_counter() - started
+                results.append(
+                    (elapsed, len(queries), response.status_code)
+                )
+        finally:
+            connections.close_all()
+        return results
+
+    parts = [requests[index::concurrency] for index in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = [
+            result for part in executor.map(worker, parts)
+            for result in part
+        ]
+    return results, time.perf_counter() - started
+
+
+def summarize(scenario, results, elapsed):
+    latencies = [result[0] * 1000 for result in results]
+    queries = [result[1] for result in results]
+    statuses = Counter(result[2] for result in results)
+    return {
+        'route': scenario.route,
+        'method': scenario.method.upper(),
+        'requests': len(results),
+        'errors': sum(
+            count for status, count in statuses.items() if status >= 500
+        ),
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies), 3),
+            'p50': round(percentile(latencies, 0.5), 3),
+            'p90': round(percentile(latencies, 0.9), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(max(latencies), 3),
+        },
+        'throughput_rps': round(len(results) / elapsed, 1),
+        'queries': {
+            'mean': round(statistics.fmean(queries), 2),
+            'max': max(queries),
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеры задержек, пропускной способности и числа SQL-запросов '
+        'для маршрутов API на данных текущей базы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Количество замеряемых запросов на маршрут.',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=10,
+            help='Количество незамеряемых запросов перед замером.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Количество параллельных клиентов.',
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=20,
+            help='Сколько объектов каждого типа выбрать для запросов.',
+        )
+        parser.add_argument(
+            '--route',
+            action='append',
+            help='Замерить только этот маршрут (можно повторять).',
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Начальное значение для выборки объектов.',
+        )
+        parser.add_argument(
+            '--output',
+            type=Path,
+            help='Файл для результатов в формате JSON.',
+        )
+        parser.add_argument(
+            '--baseline',
+            type=Path,
+            help='Файл прошлого замера для сравнения.',
+        )
+
+    def handle(self, *args, **options):
+        if min(options['requests'], options['concurrency']) < 1:
+            raise CommandError(
+                '--requests и --concurrency должны быть положительными'
+            )
+        rng = random.Random(options['seed'])
+        available = tokens()
+        results, skipped = [], dict(SKIPPED)
+        for scenario in scenarios(options['sample'], rng):
+            if options['route'] and scenario.route not in options['route']:
+                continue
+            if not scenario.requests:
+                skipped[scenario.route] = 'нет данных'
+                continue
+            if scenario.auth and scenario.auth not in available:
+                skipped[scenario.route] = f'нет пользователя {scenario.auth}'
+                continue
+            token = available.get(scenario.auth)
+            if options['warmup']:
+                run(scenario, options['warmup'], 1, token, options['cold'])
+            measured, elapsed = run(
+                scenario, options['requests'], options['concurrency'],
+                token, options['cold'],
+            )
+            results.append(summarize(scenario, measured, elapsed))
+
+        report = {
+            'started': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'dataset': {
+                model._meta.model_name: model.objects.count()
+                for model in (User, Category, Genre, Title, Review, Comment)
+            },
+            'options': {
+                name: options[name] for name in (
+                    'requests', 'warmup', 'concurrency', 'sample', 'cold',
+                    'seed',
+                )
+            },
+            'results': results,
+            'skipped': skipped,
+        }
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = {
+                    result['route']: result
+                    for result in json.load(file)['results']
+                }
+        self.print_table(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+    def print_table(self, results, baseline):
+        self.stdout.write(
+            f'{"Маршрут":<22}{"p50, мс":>10}{"p99, мс":>10}'
+            f'{"запр/с":>10}{"SQL":>7}'
+        )
+        for result in results:
+            latency = result['latency_ms']
+            line = (
+                f'{result["route"]:<22}{latency["p50"]:>10.2f}'
+                f'{latency["p99"]:>10.2f}{result["throughput_rps"]:>10.1f}'
+                f'{result["queries"]["mean"]:>7.1f}'
+            )
+            previous = (baseline or {}).get(result['route'])
+            if previous and previous['latency_ms']['p50']:
+                line += '  p50 {:+.0%}, SQL {:+.1f}'.format(
+                    latency['p50'] / previous['latency_ms']['p50'] - 1,
+                    result['queries']['mean'] - previous['queries']['mean'],
+                )
+            self.stdout.write(line)
@@ -0,0 +1,256 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+HELP = {
+    'http_requests_total': ('counter', 'Число обработанных запросов.'),
+    'http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса.'
+    ),
+    'db_queries_total': ('counter', 'Число SQL-запросов.'),
+    'cache_requests_total': ('counter', 'Обращения к кэшам.'),
+}
+
+# Сумма значений завершившихся процессов.
+ARCHIVE = 'metrics_dead.json'
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def locked(directory, exclusive, name='metrics.lock'):
+    """
+    Блокировка каталога между процессами на файле name. fcntl есть
+    только на POSIX, а каталог нужен лишь с несколькими рабочими
+    процессами, поэтому модуль импортируется здесь.
+    """
+    import fcntl
+
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / name, 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def read(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def write(path, snapshot):
+    """Атомарная запись: читатели не увидят файл наполовину."""
+    with tempfile.NamedTemporaryFile(
+        'w', dir=path.parent, suffix='.tmp', delete=False
+    ) as file:
+        json.dump(snapshot, file)
+    os.replace(file.name, path)
+
+
+def merge(snapshots):
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, values in snapshot['histograms']:
+            key = name, tuple(map(tuple, labels))
+            total = histograms.setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                total[index] += value
+    return counters, histograms
+
+
+def to_snapshot(counters, histograms):
+    return {
+        'counters': [
+            [name, labels, value]
+            for (name, labels), value in counters.items()
+        ],
+        'histograms': [
+            [name, labels, list(values)]
+            for (name, labels), values in histograms.items()
+        ],
+    }
+
+
+class Registry:
+    """
+    Счётчики и гистограммы в памяти процесса. Изменение метрики -
+    несколько операций со словарём под общей блокировкой.
+
+    Для нескольких рабочих процессов задаётся METRICS_DIR:
+    каждый процесс не чаще раза в METRICS_FLUSH_INTERVAL секунд
+    записывает свои значения в собственный файл каталога,
+    а collect() складывает значения всех файлов.
+    Перед первой записью процесс переносит в общий архив файлы
+    завершившихся процессов и файл прежнего процесса со своим PID:
+    счётчики не убывают, а число файлов не растёт с перезапусками.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed = time.monotonic()
+        self.archived = None
+        atexit.register(self.flush, force=True)
+
+    def inc(self, name, labels, value=1):
+        key = name, tuple(sorted(labels.items()))
+        with self.lock:
+            self.counters[key] += value
+
+    def observe(self, name, labels, value):
+        """Бакеты хранятся некумулятивно, сумма считается при выводе."""
+        buckets = settings.METRICS_LATENCY_BUCKETS
+        key = name, tuple(sorted(labels.items()))
+        position = bisect_left(buckets, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 3)
+            histogram[position] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return to_snapshot(self.counters, self.histograms)
+
+    def path(self):
+        return Path(settings.METRICS_DIR) / f'metrics_{os.getpid()}.json'
+
+    def archive_dead(self, directory):
+        """Переносит в архив файлы процессов, которых уже нет."""
+        with locked(directory, exclusive=True):
+            dead = []
+            for path in directory.glob('metrics_*.json'):
+                pid = path.stem.rpartition('_')[2]
+                if pid.isdigit() and (
+                    path == self.path() or not pid_alive(int(pid))
+                ):
+                    dead.append(path)
+            if not dead:
+                return
+            archive = directory / ARCHIVE
+            snapshots = [read(path) for path in dead]
+            if archive.exists():
+                snapshots.append(read(archive))
+            write(archive, to_snapshot(*merge(snapshots)))
+            for path in dead:
+                path.unlink()
+
+    def flush(self, force=False):
+        """Сохраняет значения процесса в METRICS_DIR, если он задан."""
+        if not settings.METRICS_DIR:
+            return
+        now = time.monotonic()
+        if not force and now - self.flushed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed = now
+        directory = Path(settings.METRICS_DIR)
+        if self.archived != (os.getpid(), directory):
+            self.archive_dead(directory)
+            self.archived = os.getpid(), directory
+        write(self.path(), self.snapshot())
+
+    def collect(self):
+        """Значения всех процессов: свои из памяти, чужие из файлов."""
+        snapshots = [self.snapshot()]
+        if settings.METRICS_DIR:
+            directory = Path(settings.METRICS_DIR)
+            own = self.path()
+            with locked(directory, exclusive=False):
+                snapshots += [
+                    read(path) for path in directory.glob('metrics_*.json')
+                    if path != own
+                ]
+        return merge(snapshots)
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+registry = Registry()
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in pairs
+    ) + '}'
+
+
+def format_value(value):
+    """Целые - без экспоненты, дробные - без потери точности."""
+    value = float(value)
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return str(int(value))
+    return repr(value)
+
+
+def exposition(counters, histograms):
+    """Текстовый формат Prometheus 0.0.4."""
+    lines = []
+    series = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        series[name].append(
+            f'{name}{format_labels(labels)} {format_value(value)}'
+        )
+    buckets = settings.METRICS_LATENCY_BUCKETS
+    for (name, labels), values in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip([*buckets, '+Inf'], values):
+            cumulative += count
+            series[name].append(
+                f'{name}_bucket{format_labels(labels, le=bound)} '
+                f'{format_value(cumulative)}'
+            )
+        series[name].append(f'{name}_sum{format_labels(labels)} '
+                            f'{format_value(values[-2])}')
+        series[name].append(f'{name}_count{format_labels(labels)} '
+                            f'{format_value(values[-1])}')
+    for name, samples in series.items():
+        kind, description = HELP.get(name, ('untyped', ''))
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        lines += samples
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
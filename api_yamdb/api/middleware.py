@@ -0,0 +1,188 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+
+from api.metrics import registry
+from api.nplusone import MODES, NPlusOneDetector
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: запросы к базе и их время."""
+
+    def __init__(self):
+        self.queries = []
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.duration += duration
+            self.queries.append((sql, duration))
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 1)
+
+
+class ServerTimingMiddleware:
+    """
+    Замеры запроса: число SQL-запросов и их время (db), время
+    представления (view), время рендеринга ответа (render) и общее
+    время (total). Сериализаторы DRF вызываются из представления,
+    поэтому их время входит в view, а render - только перевод
+    готовых данных в JSON. У ответов из кэша рендеринга нет
+    и render равен нулю.
+    Замеры отдаются в заголовке Server-Timing и пишутся в лог
+    одной JSON-строкой. Запросы медленнее SQL_TIMING_SLOW_MS или
+    с числом SQL-запросов от SQL_TIMING_MAX_QUERIES логируются
+    со списком SQL. Замеряется доля SQL_TIMING_SAMPLE_RATE запросов,
+    остальные проходят без обёрток.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SQL_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        request.timing = {}
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        finished = time.perf_counter()
+
+        view_started = request.timing.get('view_started', started)
+        view_finished = request.timing.get('view_finished', finished)
+        timing = {
+            'db': milliseconds(recorder.duration),
+            'view': milliseconds(view_finished - view_started),
+            'render': milliseconds(finished - view_finished),
+            'total': milliseconds(finished - started),
+        }
+        metrics = [f'{name};dur={value}' for name, value in timing.items()]
+        metrics[0] += f';desc="{len(recorder.queries)} queries"'
+        response['Server-Timing'] = ', '.join(metrics)
+        self.log(request, response, timing, recorder.queries)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'timing'):
+            request.timing['view_started'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        """Вызывается после представления и перед рендерингом ответа."""
+        if hasattr(request, 'timing'):
+            request.timing['view_finished'] = time.perf_counter()
+        return response
+
+    @staticmethod
+    def log(request, response, timing, queries):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': len(queries),
+            **{f'{name}_ms': duration for name, duration in timing.items()},
+        }
+        if (timing['total'] >= settings.SQL_TIMING_SLOW_MS
+                or len(queries) >= settings.SQL_TIMING_MAX_QUERIES):
+            record['sql'] = [
+                {'sql': sql, 'ms': milliseconds(duration)}
+                for sql, duration in queries
+            ]
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+
+class QueryCounter:
+    """Обёртка execute_wrapper, только считающая запросы."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def route_name(request):
+    """
+    Метка маршрута: ресурс из имени URL (titles, reviews, comments,
+    users, auth...). Нераспознанные адреса объединяются в other,
+    чтобы число рядов метрик не зависело от входящих URL.
+    """
+    match = request.resolver_match
+    if match is None or not match.url_name:
+        return 'other'
+    return match.url_name.partition('-')[0]
+
+
+class MetricsMiddleware:
+    """Число запросов, время ответа, статусы и SQL-запросы по маршрутам."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        route = route_name(request)
+        registry.observe(
+            'http_request_duration_seconds', {'route': route},
+            time.perf_counter() - started,
+        )
+        registry.inc('http_requests_total', {
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+        })
+        registry.inc('db_queries_total', {'route': route}, counter.count)
+        registry.flush()
+        return response
+
+
+class NPlusOneMiddleware:
+    """
+    Поиск N+1 для разработки и тестовых стендов: одинаковый SQL-запрос,
+    повторённый больше NPLUSONE_THRESHOLD раз за запрос, сообщается
+    предупреждением, записью в лог или исключением (NPLUSONE_MODE)
+    вместе со связью, полем сериализатора и стеком вызовов.
+    Без NPLUSONE_MODE middleware отключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_MODE:
+            raise MiddlewareNotUsed
+        if settings.NPLUSONE_MODE not in MODES:
+            raise ImproperlyConfigured(
+                f'NPLUSONE_MODE должен быть одним из: {", ".join(MODES)}'
+            )
+        self.get_response = get_response
+
+    def __call__(self, request):
+        detector = NPlusOneDetector(
+            request, settings.NPLUSONE_MODE, settings.NPLUSONE_THRESHOLD
+        )
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(detector))
+            return self.get_response(request)
@@ -0,0 +1,142 @@
+import logging
+import sys
+import traceback
+import warnings
+from collections import Counter
+from pathlib import Path
+
+import django
+import rest_framework
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.fields.related_descriptors import (
+    ForwardManyToOneDescriptor, ReverseOneToOneDescriptor)
+from rest_framework.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+MODES = ('warn', 'log', 'raise')
+
+DJANGO_DIR = str(Path(django.__file__).parent)
+REST_FRAMEWORK_DIR = str(Path(rest_framework.__file__).parent)
+
+
+class NPlusOneWarning(UserWarning):
+    pass
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def describe_relation(frames):
+    """
+    Связь, которую загружает запрос: дескриптор внешнего ключа в стеке,
+    а если его нет - queryset менеджера связи.
+    """
+    objs = [frame.f_locals.get('self') for frame in frames]
+    for obj in objs:
+        if isinstance(obj, ForwardManyToOneDescriptor):
+            return f'{obj.field.model.__name__}.{obj.field.name}'
+        if isinstance(obj, ReverseOneToOneDescriptor):
+            related = obj.related
+            return f'{related.model.__name__}.{related.get_accessor_name()}'
+    for obj in objs:
+        if isinstance(obj, QuerySet):
+            for field, instances in obj._known_related_objects.items():
+                instance = next(iter(instances.values()))
+                accessor = field.remote_field.get_accessor_name()
+                return f'{type(instance).__name__}.{accessor}'
+            instance = obj._hints.get('instance')
+            if instance is not None:
+                return f'{type(instance).__name__} -> {obj.model.__name__}'
+    return None
+
+
+def describe_fields(frames):
+    """
+    Цепочка полей сериализаторов, которые сейчас выводятся:
+    Serializer.to_representation держит текущее поле в переменной field.
+    """
+    fields = []
+    for frame in frames:
+        obj = frame.f_locals.get('self')
+        field = frame.f_locals.get('field')
+        if (isinstance(obj, Serializer) and field is not None
+                and frame.f_code.co_name == 'to_representation'):
+            fields.append((f'{type(obj).__name__}.{field.field_name}', field))
+    fields.reverse()
+    return fields
+
+
+def caller_frame(frames):
+    """
+    Кадр, из которого вызван ORM: ниже него в стеке только код Django
+    и обёртки execute_wrapper.
+    """
+    in_django = False
+    for frame in frames:
+        if frame.f_code.co_filename.startswith(DJANGO_DIR):
+            in_django = True
+        elif in_django:
+            return frame
+    return frames[0]
+
+
+def is_reported_frame(summary):
+    """В стек попадает код проекта и DRF."""
+    return (
+        summary.filename.startswith(str(settings.BASE_DIR))
+        or summary.filename.startswith(REST_FRAMEWORK_DIR)
+    )
+
+
+class NPlusOneDetector:
+    """
+    Обёртка execute_wrapper: считает SQL-запросы одной формы
+    (текст без параметров) и сообщает о форме, повторившейся
+    больше threshold раз, один раз за запрос.
+    """
+
+    def __init__(self, request, mode, threshold):
+        self.request = request
+        self.mode = mode
+        self.threshold = threshold
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.shapes[sql] += 1
+        if self.shapes[sql] == self.threshold + 1:
+            self.report(sql, sys._getframe(1))
+        return execute(sql, params, many, context)
+
+    def report(self, sql, frame):
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        fields = describe_fields(frames)
+        lines = [
+            f'N+1: запрос выполнен больше {self.threshold} раз '
+            f'за {self.request.method} {self.request.path}',
+            f'Связь: {describe_relation(frames) or "не определена"}',
+        ]
+        if fields:
+            lines.append(
+                'Поле: ' + ' -> '.join(name for name, _ in fields)
+                + f' = {fields[-1][1]!r}'
+            )
+        lines.append(f'SQL: {sql}')
+        stack = [
+            summary
+            for summary in traceback.extract_stack(caller_frame(frames))
+            if is_reported_frame(summary)
+        ]
+        lines.append('Стек:\n' + ''.join(traceback.format_list(stack)))
+        message = '\n'.join(lines)
+        if self.mode == 'raise':
+            raise NPlusOneError(message)
+        if self.mode == 'warn':
+            warnings.warn(message, NPlusOneWarning)
+        else:
+            logger.warning(message)
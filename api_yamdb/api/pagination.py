@@ -0,0 +1,317 @@
+import hashlib
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from urllib import parse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.cache import IMPORT_TAG, get_versions, model_tag
+
+APPROXIMATE_COUNT_SQL = {
+    'postgresql': (
+        'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    ),
+    'mysql': (
+        'SELECT table_rows FROM information_schema.tables '
+        'WHERE table_schema = DATABASE() AND table_name = %s'
+    ),
+    'sqlite': 'SELECT MAX(rowid) - MIN(rowid) + 1 FROM {table}',
+}
+
+
+def get_approximate_count(queryset):
+    """
+    Оценка числа строк таблицы по статистике СУБД без COUNT(*).
+    Имеет смысл только для запросов без фильтрации.
+    """
+    connection = connections[queryset.db]
+    sql = APPROXIMATE_COUNT_SQL.get(connection.vendor)
+    if sql is None:
+        return None
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if '{table}' in sql:
+            cursor.execute(sql.format(table=connection.ops.quote_name(table)))
+        else:
+            cursor.execute(sql, (table,))
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    return int(row[0])
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, получающий количество объектов от пагинации."""
+
+    def __init__(self, object_list, per_page, count_function, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_function = count_function
+
+    @cached_property
+    def count(self):
+        return self.count_function()
+
+
+class CachedCountPageNumberPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с кэшированием общего количества объектов.
+    Счётчик хранится для пары (эндпоинт, фильтры) и сбрасывается
+    при записи в модели, от которых зависит список. Представление
+    может назвать более узкие теги методом get_count_tags(),
+    например отзывы одного произведения.
+    Для больших таблиц без фильтров используется оценка из статистики СУБД,
+    а параметр ?count=false отключает подсчёт совсем.
+    """
+    count_query_param = 'count'
+    count_disabled_values = ('false', '0', 'no')
+    count_ignored_params = ('page', 'page_size', 'count', 'cursor')
+    count_dependencies = {
+        'reviews.title': ('reviews.category', 'reviews.genre'),
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.page = None
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        value = request.query_params.get(self.count_query_param, '')
+        if value.lower() in self.count_disabled_values:
+            return self.paginate_without_count(queryset, request, page_size)
+
+        paginator = CachedCountPaginator(
+            queryset, page_size, lambda: self.get_count(queryset, request)
+        )
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    def paginate_without_count(self, queryset, request, page_size):
+        try:
+            self.page_number = int(
+                request.query_params.get(self.page_query_param, 1)
+            )
+            if self.page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=request.query_params.get(self.page_query_param),
+                message='Некорректный номер страницы.',
+            ))
+        offset = (self.page_number - 1) * page_size
+        results = list(queryset[offset:offset + page_size + 1])
+        self.has_next_page = len(results) > page_size
+        return results[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.page is not None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if self.page is not None:
+            return super().get_next_link()
+        if not self.has_next_page:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.page_query_param,
+            self.page_number + 1,
+        )
+
+    def get_previous_link(self):
+        if self.page is not None:
+            return super().get_previous_link()
+        if self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.page_query_param, self.page_number - 1
+        )
+
+    def get_count(self, queryset, request):
+        if not isinstance(queryset, QuerySet):
+            return len(queryset)
+        key = self.get_count_cache_key(queryset, request)
+        count = cache.get(key)
+        if count is None:
+            threshold = settings.PAGINATION_APPROXIMATE_COUNT_THRESHOLD
+            if threshold is not None and not queryset.query.where:
+                count = get_approximate_count(queryset)
+            if count is None or count < (threshold or 0):
+                count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_count_tags(self, queryset):
+        if hasattr(self.view, 'get_count_tags'):
+            return self.view.get_count_tags()
+        tag = model_tag(queryset.model)
+        return (tag, *self.count_dependencies.get(tag, ()))
+
+    def get_count_cache_key(self, queryset, request):
+        versions = get_versions(IMPORT_TAG, *self.get_count_tags(queryset))
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            if key not in self.count_ignored_params
+            for value in values
+        )
+        signature = repr((
+            request.path, params, sorted(versions.items())
+        )).encode()
+        return f'count:{hashlib.md5(signature).hexdigest()}'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по паре (pub_date, id) от новых к старым.
+    Страница выбирается условием по ключу, без OFFSET и COUNT(*),
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(request)
+
+        if reverse:
+            queryset = queryset.order_by('pub_date', 'id')
+        else:
+            queryset = queryset.order_by('-pub_date', '-id')
+        if position is not None:
+            pub_date, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+                )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_position = (
+            self.get_position(results[-1]) if has_next and results else None
+        )
+        self.previous_position = (
+            self.get_position(results[0])
+            if has_previous and results else None
+        )
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    @staticmethod
+    def get_position(obj):
+        return obj.pub_date, obj.pk
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            pub_date = parse_datetime(tokens['p'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (pub_date, pk), reverse
+
+    def encode_cursor(self, position, reverse):
+        pub_date, pk = position
+        tokens = {'p': pub_date.isoformat(), 'i': pk}
+        if reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+
+class PageNumberOrKeysetPagination(CachedCountPageNumberPagination):
+    """
+    Постраничная пагинация для старых клиентов.
+    Запрос с параметром cursor (в том числе пустым)
+    переключает ответ на курсорную пагинацию KeysetPagination.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_previous_link()
+        return super().get_previous_link()
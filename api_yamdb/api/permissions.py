@@ -24,7 +24,7 @@ class IsAdminModeratorAuthorOrReadOnly(BasePermission):
         return (request.method in SAFE_METHODS
                 or request.user.is_admin
                 or request.user.is_moderator
-                or obj.author == request.user)
+                or obj.author_id == request.user.id)
 
 
 class IsAdminOrReadOnly(BasePermission):
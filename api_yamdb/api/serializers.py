@@ -1,8 +1,18 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from rest_framework import serializers
-
-from reviews.models import Category, Comment, Genre, Review, Title
+from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
+
+from api import dictionaries
+from api.autocomplete import index as autocomplete_index
+from api.cache import bump_after_commit, model_tag, title_tag
+from api.fields import BulkSlugRelatedField
+from api.utils import bulk_create_with_pk, cache_prefetched
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
 from users.validators import ValidateUsername
 
 User = get_user_model()
@@ -68,13 +78,51 @@ class TitleReadSerializer(serializers.ModelSerializer):
     Сериализатор для возвращения одного произведения
     или списка произведений.
     """
-    category = CategorySerializer(read_only=True)
-    genre = GenreSerializer(read_only=True, many=True)
+    category = serializers.SerializerMethodField()
+    genre = serializers.SerializerMethodField()
     rating = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Title
-        fields = '__all__'
+        exclude = ('rating_sum', 'rating_count')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.snapshots = {}
+
+    def get_snapshot(self, dictionary):
+        """
+        Снимок справочника, общий для всех произведений страницы:
+        при many=True это один экземпляр, и версия справочника
+        проверяется в кэше один раз на страницу, а не на объект.
+        """
+        if dictionary not in self.snapshots:
+            self.snapshots[dictionary] = dictionary.load()
+        return self.snapshots[dictionary]
+
+    def get_category(self, obj):
+        """Категория из справочника в памяти процесса."""
+        if obj.category_id is None:
+            return None
+        category = self.get_snapshot(dictionaries.categories).get(
+            obj.category_id
+        )
+        if category is None:
+            category = obj.category
+        return CategorySerializer(category).data
+
+    def get_genre(self, obj):
+        """
+        Жанры из справочника по id связей, загруженных
+        prefetch_related('genretitle_set') одним запросом на страницу.
+        """
+        ids = [link.genre_id for link in obj.genretitle_set.all()]
+        if not ids:
+            return []
+        genres = self.get_snapshot(dictionaries.genres).get_many(ids)
+        if len(genres) < len(ids):
+            genres = obj.genre.all()
+        return GenreSerializer(genres, many=True).data
 
 
 class TitleWriteSerializer(serializers.ModelSerializer):
@@ -82,12 +130,11 @@ class TitleWriteSerializer(serializers.ModelSerializer):
     Сериализатор для добавления, редактирования
     и удаления произведений.
     """
-    category = serializers.SlugRelatedField(
+    category = BulkSlugRelatedField(
         queryset=Category.objects.all(),
         slug_field='slug',
-
     )
-    genre = serializers.SlugRelatedField(
+    genre = BulkSlugRelatedField(
         queryset=Genre.objects.all(),
         slug_field='slug',
         many=True,
@@ -95,7 +142,187 @@ class TitleWriteSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        exclude = ('rating_sum', 'rating_count')
+
+    @transaction.atomic
+    def create(self, validated_data):
+        genres = validated_data.pop('genre')
+        title = super().create(validated_data)
+        self.set_genres(title, genres, created=True)
+        cache_prefetched(title, 'genre', genres)
+        return title
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        genres = validated_data.pop('genre', None)
+        title = super().update(instance, validated_data)
+        if genres is not None:
+            self.set_genres(title, genres)
+            cache_prefetched(title, 'genre', genres)
+        return title
+
+    @staticmethod
+    def set_genres(title, genres, created=False):
+        """
+        Сохраняет только разницу между текущими и новыми жанрами:
+        одним DELETE для убранных и одним INSERT для добавленных.
+        """
+        new = {genre.pk for genre in genres}
+        current = set() if created else set(
+            GenreTitle.objects.filter(title=title).values_list(
+                'genre_id', flat=True
+            )
+        )
+        if current - new:
+            GenreTitle.objects.filter(
+                title=title, genre_id__in=current - new
+            ).delete()
+        GenreTitle.objects.bulk_create(
+            GenreTitle(title=title, genre_id=pk) for pk in new - current
+        )
+
+
+class TitleBulkListSerializer(serializers.ListSerializer):
+    """
+    Пакетное создание и обновление произведений.
+    Категории, жанры и обновляемые произведения загружаются
+    не более чем одним запросом на таблицу,
+    запись идёт пакетами в одной транзакции.
+    В пакете не больше BULK_MAX_ITEMS элементов.
+    """
+    update_fields = ('name', 'year', 'description', 'category')
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            if len(data) > settings.BULK_MAX_ITEMS:
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        'В пакете не больше '
+                        f'{settings.BULK_MAX_ITEMS} произведений.'
+                    ]
+                }, code='max_length')
+            self.prefetch(data)
+        return super().to_internal_value(data)
+
+    def prefetch(self, data):
+        """
+        Загружает упомянутые в пакете категории, жанры и произведения.
+        Категории и жанры берутся из справочников в памяти процесса,
+        в базе ищутся только отсутствующие в них slug'и.
+        """
+        categories, genres = set(), set()
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            if isinstance(item.get('category'), str):
+                categories.add(item['category'])
+            if isinstance(item.get('genre'), list):
+                genres.update(
+                    slug for slug in item['genre'] if isinstance(slug, str)
+                )
+        prefetched = {}
+        for model, slugs in ((Category, categories), (Genre, genres)):
+            found = dictionaries.DICTIONARIES[model].get_by_slugs(slugs)
+            if slugs - found.keys():
+                found.update(model.objects.in_bulk(
+                    slugs - found.keys(), field_name='slug'
+                ))
+            prefetched[model] = found
+        self.context['prefetched_slugs'] = prefetched
+        ids, duplicate_ids = self.collect_ids(data)
+        self.context['existing_titles'] = Title.objects.in_bulk(ids)
+        self.context['duplicate_ids'] = duplicate_ids
+
+    @staticmethod
+    def collect_ids(data):
+        """
+        id обновляемых произведений и повторяющиеся id. Значения
+        приводятся к типу первичного ключа, как их приведёт поле id,
+        поэтому "5" и 5 - одно и то же произведение.
+        """
+        ids, duplicate_ids = set(), set()
+        for item in data:
+            if not isinstance(item, dict) or item.get('id') is None:
+                continue
+            try:
+                pk = Title._meta.pk.to_python(item['id'])
+            except ValidationError:
+                continue
+            if pk in ids:
+                duplicate_ids.add(pk)
+            ids.add(pk)
+        return ids, duplicate_ids
+
+    @transaction.atomic
+    def create(self, validated_data):
+        batch_size = settings.BULK_BATCH_SIZE
+        titles, created, updated = [], [], []
+        for item in validated_data:
+            genres = item.pop('genre')
+            pk = item.pop('id', None)
+            if pk is None:
+                title = Title(**item)
+                created.append(title)
+            else:
+                title = self.context['existing_titles'][pk]
+                for attr, value in item.items():
+                    setattr(title, attr, value)
+                updated.append(title)
+            titles.append((title, genres))
+
+        bulk_create_with_pk(Title, created, batch_size)
+        Title.objects.bulk_update(updated, self.update_fields, batch_size)
+        self.save_genres(titles, updated, batch_size)
+        bump_after_commit(
+            model_tag(Title), *(title_tag(title.pk) for title in updated)
+        )
+        transaction.on_commit(autocomplete_index.invalidate)
+
+        for title, genres in titles:
+            cache_prefetched(title, 'genre', genres)
+        return [title for title, _ in titles]
+
+    @staticmethod
+    def save_genres(titles, updated, batch_size):
+        current = {}
+        for pk, title_id, genre_id in GenreTitle.objects.filter(
+            title__in=updated
+        ).values_list('pk', 'title_id', 'genre_id'):
+            current[title_id, genre_id] = pk
+        wanted = {
+            (title.pk, genre.pk) for title, genres in titles
+            for genre in genres
+        }
+        removed = [pk for key, pk in current.items() if key not in wanted]
+        if removed:
+            GenreTitle.objects.filter(pk__in=removed).delete()
+        GenreTitle.objects.bulk_create(
+            (
+                GenreTitle(title_id=title_id, genre_id=genre_id)
+                for title_id, genre_id in wanted - current.keys()
+            ),
+            batch_size=batch_size,
+        )
+
+
+class TitleBulkSerializer(TitleWriteSerializer):
+    """
+    Элемент пакета произведений:
+    с полем id обновляет существующее произведение, без него - создаёт.
+    """
+    id = serializers.IntegerField(required=False)
+
+    class Meta(TitleWriteSerializer.Meta):
+        list_serializer_class = TitleBulkListSerializer
+
+    def validate_id(self, value):
+        if value not in self.context.get('existing_titles', {}):
+            raise serializers.ValidationError('Произведение не найдено.')
+        if value in self.context.get('duplicate_ids', ()):
+            raise serializers.ValidationError(
+                'Произведение указано в пакете несколько раз.'
+            )
+        return value
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -122,12 +349,57 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ('id', 'text', 'author', 'score', 'pub_date')
 
     def validate(self, data):
+        """
+        Одним запросом проверяет, что произведение существует
+        и автор ещё не оставлял на него отзыв.
+        """
         if self.context['request'].method != 'POST':
             return data
         title_id = self.context['request'].parser_context['kwargs']['title_id']
-        author = self.context['request'].user
-        if Review.objects.filter(title=title_id, author=author).exists():
+        author_id = self.context['request'].user.id
+        reviewed = Title.objects.filter(id=title_id).annotate(
+            reviewed=Exists(Review.objects.filter(
+                title=OuterRef('pk'), author_id=author_id
+            ))
+        ).values_list('reviewed', flat=True).first()
+        if reviewed is None:
+            raise NotFound('Произведение не найдено.')
+        if reviewed:
             raise serializers.ValidationError(
                 'Можно оставить только один отзыв на произведение'
             )
         return data
+
+
+class SearchSnippetMixin(serializers.Serializer):
+    """Фрагмент найденного текста с подсвеченными совпадениями."""
+    snippet = serializers.SerializerMethodField()
+
+    def get_snippet(self, obj):
+        return self.context.get('snippets', {}).get(obj.pk)
+
+
+class ReviewSearchSerializer(SearchSnippetMixin, ReviewSerializer):
+    """Сериализатор результатов поиска по отзывам."""
+
+    class Meta(ReviewSerializer.Meta):
+        fields = ('id', 'title', *ReviewSerializer.Meta.fields[1:], 'snippet')
+
+
+class CommentSearchSerializer(SearchSnippetMixin, CommentSerializer):
+    """Сериализатор результатов поиска по комментариям."""
+    title = serializers.IntegerField(source='title_id', read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = (
+            'id', 'title', 'review', *CommentSerializer.Meta.fields[1:],
+            'snippet',
+        )
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Подсказка автодополнения."""
+    type = serializers.CharField()
+    id = serializers.IntegerField(source='pk')
+    slug = serializers.CharField()
+    name = serializers.CharField()
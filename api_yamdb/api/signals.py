@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.authentication import store_token_rights, user_rights
+from api.autocomplete import index as autocomplete_index
+from api.cache import (IMPORT_TAG, bump_after_commit, bump_versions,
+                       comments_tag, model_tag, reviews_tag, title_tag)
+from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.signals import data_imported
+
+User = get_user_model()
+
+VERSIONED_MODELS = (Category, Comment, Genre, Review, Title, User)
+
+
+def bump_model_version(sender, **kwargs):
+    """Запись в модель сбрасывает закэшированные счётчики её списков."""
+    bump_after_commit(model_tag(sender))
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model)
+    post_delete.connect(bump_model_version, sender=model)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def bump_title_genre_version(sender, instance, reverse, pk_set, **kwargs):
+    bump_after_commit(model_tag(Title))
+    if not reverse:
+        bump_after_commit(title_tag(instance.pk))
+    elif pk_set:
+        bump_after_commit(*(title_tag(pk) for pk in pk_set))
+    else:
+        bump_after_commit(model_tag(Genre))
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def bump_title_pages(sender, instance, **kwargs):
+    bump_after_commit(title_tag(instance.pk))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_review_pages(sender, instance, **kwargs):
+    """Отзыв меняет список отзывов и рейтинг своего произведения."""
+    title_ids = {instance.title_id}
+    previous = getattr(instance, '_previous_rating', None)
+    if previous:
+        title_ids.add(previous[0])
+    bump_after_commit(*(
+        tag for title_id in title_ids
+        for tag in (title_tag(title_id), reviews_tag(title_id))
+    ))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_pages(sender, instance, **kwargs):
+    bump_after_commit(comments_tag(instance.review_id))
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+def put_autocomplete_entry(sender, instance, **kwargs):
+    """Новое или изменённое название сразу попадает в автодополнение."""
+    autocomplete_index.put(
+        sender._meta.model_name, instance.pk,
+        getattr(instance, 'slug', None), instance.name,
+    )
+
+
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+def remove_autocomplete_entry(sender, instance, **kwargs):
+    autocomplete_index.remove(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=Review)
+def add_autocomplete_popularity(sender, instance, created, **kwargs):
+    if created:
+        autocomplete_index.add_popularity(instance.title_id, 1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_autocomplete_popularity(sender, instance, **kwargs):
+    autocomplete_index.add_popularity(instance.title_id, -1)
+
+
+@receiver(post_save, sender=User)
+def store_user_token_rights(sender, instance, **kwargs):
+    """Права пользователя в кэше меняются после фиксации транзакции."""
+    rights = user_rights(instance) if instance.is_active else None
+    transaction.on_commit(lambda: store_token_rights(instance.pk, rights))
+
+
+@receiver(post_delete, sender=User)
+def remove_user_token_rights(sender, instance, **kwargs):
+    transaction.on_commit(lambda: store_token_rights(instance.pk, None))
+
+
+@receiver(data_imported)
+def reset_after_import(sender, models, **kwargs):
+    """
+    Импорт сбрасывает версии загруженных моделей (справочники,
+    счётчики списков), все закэшированные ответы и индексы
+    автодополнения во всех процессах.
+    """
+    bump_versions(IMPORT_TAG, *(model_tag(model) for model in models))
+    autocomplete_index.invalidate()
@@ -1,9 +1,10 @@
 from django.urls import include, path
 from rest_framework import routers
 
-from api.views import (CategoryViewSet, CommentViewSet, GenreViewSet,
-                       ReviewViewSet, TitleViewSet, UserViewSet,
-                       create_token, signup_user)
+from api.views import (CategoryViewSet, CommentSearchViewSet, CommentViewSet,
+                       GenreViewSet, ReviewSearchViewSet, ReviewViewSet,
+                       TitleViewSet, UserViewSet, autocomplete, create_token,
+                       metrics, signup_user)
 
 v1_router = routers.DefaultRouter()
 v1_router.register(r'users', UserViewSet, basename='users')
@@ -18,14 +19,22 @@ v1_router.register(
     CommentViewSet,
     basename='comments',
 )
+v1_router.register(
+    r'search/reviews', ReviewSearchViewSet, basename='search-reviews'
+)
+v1_router.register(
+    r'search/comments', CommentSearchViewSet, basename='search-comments'
+)
 
 
 auth_urlpatterns = [
-    path('signup/', signup_user),
-    path('token/', create_token),
+    path('signup/', signup_user, name='auth-signup'),
+    path('token/', create_token, name='auth-token'),
 ]
 
 urlpatterns = [
     path('v1/', include(v1_router.urls)),
     path('v1/auth/', include(auth_urlpatterns)),
+    path('v1/autocomplete/', autocomplete, name='autocomplete'),
+    path('v1/metrics/', metrics, name='metrics'),
 ]
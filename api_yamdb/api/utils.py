@@ -1,9 +1,14 @@
+from django.db import connections, transaction
+from django.db.models import Max
 from rest_framework import filters, mixins, viewsets
 
+from api.cache import CachedResponseMixin, model_tag
+from api.dictionaries import DICTIONARIES
 from api.permissions import IsAdminOrReadOnly
 
 
-class CategoryGenreBaseClass(mixins.CreateModelMixin,
+class CategoryGenreBaseClass(CachedResponseMixin,
+                             mixins.CreateModelMixin,
                              mixins.ListModelMixin,
                              mixins.DestroyModelMixin,
                              viewsets.GenericViewSet):
@@ -16,9 +21,116 @@ class CategoryGenreBaseClass(mixins.CreateModelMixin,
     lookup_field = 'slug'
     search_fields = ('name',)
 
+    def get_cache_tags(self, response):
+        return [model_tag(self.queryset.model)]
+
+    def filter_queryset(self, queryset):
+        """
+        Список отдаётся из справочника в памяти процесса,
+        поиск по названию выполняется там же, без запросов к базе.
+        """
+        if self.action != 'list':
+            return super().filter_queryset(queryset)
+        terms = [
+            term.casefold()
+            for term in filters.SearchFilter().get_search_terms(self.request)
+        ]
+        return [
+            obj for obj in DICTIONARIES[queryset.model].all()
+            if all(term in obj.name.casefold() for term in terms)
+        ]
+
 
 class NoPutModelViewSet(viewsets.ModelViewSet):
     """
     Базовый вьюсет, запрещающий метод PUT.
     """
     http_method_names = ('get', 'patch', 'post', 'delete')
+
+
+def bulk_create_with_pk(model, objs, batch_size):
+    """
+    bulk_create, после которого у объектов заполнены первичные ключи.
+    PostgreSQL и MariaDB 10.5+ возвращают ключи из INSERT (RETURNING).
+    На остальных СУБД ключи перечитываются одним запросом:
+    автоинкремент выдаёт ключи по возрастанию, поэтому вставленным
+    строкам принадлежат ключи больше прежнего максимума.
+    SQLite держит блокировку записи до конца транзакции, и это
+    последние len(objs) ключей. На MySQL и Oracle прежний максимум
+    читается до вставки; если строк с большими ключами больше, чем
+    объектов (параллельная вставка в READ COMMITTED), вставка
+    откатывается до точки сохранения и объекты сохраняются по одному.
+    """
+    if not objs:
+        return objs
+    using = model.objects.db
+    connection = connections[using]
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size)
+    if connection.vendor == 'sqlite':
+        model.objects.bulk_create(objs, batch_size)
+        pks = model.objects.order_by('-pk').values_list('pk', flat=True)
+        return set_pks(objs, reversed(pks[:len(objs)]))
+    with transaction.atomic(using=using):
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        savepoint = transaction.savepoint(using=using)
+        model.objects.bulk_create(objs, batch_size)
+        pks = model.objects.filter(pk__gt=last).order_by('pk').values_list(
+            'pk', flat=True
+        )
+        if len(pks) == len(objs):
+            return set_pks(objs, pks)
+        transaction.savepoint_rollback(savepoint, using=using)
+        for obj in objs:
+            obj.pk = None
+            obj.save(force_insert=True)
+    return objs
+
+
+def set_pks(objs, pks):
+    for obj, pk in zip(objs, pks):
+        obj.pk = pk
+        obj._state.adding = False
+    return objs
+
+
+def cache_prefetched(instance, name, objs):
+    """
+    Кладёт уже известные связанные объекты в кэш prefetch_related,
+    чтобы сериализация не запрашивала их повторно.
+    """
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = list(objs)
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = queryset
+
+
+def query_budget(**budgets):
+    """
+    Бюджет SQL-запросов представления-функции по HTTP-методам.
+    У вьюсетов бюджет задаётся атрибутом query_budget по действиям.
+    """
+    def decorator(view):
+        view.cls.query_budget = budgets
+        return view
+    return decorator
+
+
+def get_query_budget(match, method):
+    """
+    Наибольшее допустимое число SQL-запросов для маршрута resolve()
+    и HTTP-метода; None, если бюджет не объявлен.
+    Бюджет считается для запроса мимо кэша ответов, при загруженных
+    справочниках и версии токена в кэше, и не зависит от размера страницы.
+    """
+    view = match.func
+    budgets = getattr(getattr(view, 'cls', None), 'query_budget', None)
+    if not budgets:
+        return None
+    actions = getattr(view, 'actions', None)
+    key = method.lower()
+    if actions is not None:
+        key = actions.get(key)
+    return budgets.get(key)
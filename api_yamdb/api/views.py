@@ -1,27 +1,38 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.db.models.aggregates import Avg
+from django.db.models import F
 from django.shortcuts import get_object_or_404
-from rest_framework import filters, status
-from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.exceptions import ValidationError
+from rest_framework import filters, mixins, status, viewsets
+from rest_framework.decorators import (action, api_view, permission_classes,
+                                       renderer_classes)
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import AccessToken
 
-from api.filters import TitleFilter
+from api.authentication import ClaimsAccessToken, get_user_instance
+from api.autocomplete import index as autocomplete_index
+from api.cache import (CachedResponseMixin, comments_tag, model_tag,
+                       reviews_tag, title_tag)
+from api.filters import CommentSearchFilter, ReviewSearchFilter, TitleFilter
+from api.metrics import PrometheusRenderer, exposition
+from api.metrics import registry as metrics_registry
+from api.pagination import PageNumberOrKeysetPagination
 from api.permissions import (IsAdminAndSuperuserOnly,
                              IsAdminModeratorAuthorOrReadOnly,
                              IsAdminOrReadOnly)
-from api.serializers import (CategorySerializer, CommentSerializer,
+from api.serializers import (AutocompleteSerializer, CategorySerializer,
+                             CommentSearchSerializer, CommentSerializer,
                              GenreSerializer, RegistrationSerializer,
-                             ReviewSerializer, TitleReadSerializer,
+                             ReviewSearchSerializer, ReviewSerializer,
+                             TitleBulkSerializer, TitleReadSerializer,
                              TitleWriteSerializer, TokenSerializer,
                              UserMeSerializer, UserSerializer)
-from api.utils import CategoryGenreBaseClass, NoPutModelViewSet
-from reviews.models import Category, Genre, Review, Title
+from api.utils import CategoryGenreBaseClass, NoPutModelViewSet, query_budget
+from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.search import (COMMENT_INDEX, REVIEW_INDEX, match_query,
+                            search_available)
+from users import outbox
 from users.validators import ValidateUsername
 
 User = get_user_model()
@@ -38,6 +49,10 @@ class UserViewSet(ValidateUsername, NoPutModelViewSet):
     filter_backends = (filters.SearchFilter,)
     serializer_class = UserSerializer
     search_fields = ('username',)
+    query_budget = {
+        'list': 2, 'retrieve': 1, 'create': 3, 'partial_update': 2,
+        'destroy': 8, 'me': 2,
+    }
 
     @action(
         methods=('get', 'patch'),
@@ -46,7 +61,7 @@ class UserViewSet(ValidateUsername, NoPutModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def me(self, request):
-        user = get_object_or_404(User, username=self.request.user)
+        user = get_user_instance(request.user)
         if request.method == 'GET':
             serializer = UserSerializer(user)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -57,12 +72,13 @@ class UserViewSet(ValidateUsername, NoPutModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@query_budget(post=8)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def signup_user(request):
     """
     Функция создания кода подтверждения,
-    отправляет код на email.
+    ставит письмо с кодом в очередь на отправку.
     """
     serializer = RegistrationSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
@@ -80,7 +96,7 @@ def signup_user(request):
         )
 
     confirmation_code = default_token_generator.make_token(user)
-    send_mail(
+    outbox.enqueue(
         subject='Регистрация на YaMDb.',
         message=f'Ваш код подтверждения: {confirmation_code}',
         from_email=settings.DEFAULT_EMAIL,
@@ -89,6 +105,7 @@ def signup_user(request):
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@query_budget(post=1)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def create_token(request):
@@ -104,7 +121,7 @@ def create_token(request):
     if default_token_generator.check_token(
             user, serializer.validated_data['confirmation_code']
     ):
-        token = AccessToken.for_user(user)
+        token = ClaimsAccessToken.for_user(user)
         return Response(
             {'access': str(token)}, status=status.HTTP_200_OK
         )
@@ -114,24 +131,72 @@ def create_token(request):
     )
 
 
+AUTOCOMPLETE_TYPES = frozenset(('title', 'genre', 'category'))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def autocomplete(request):
+    """
+    Подсказки по началу слов в названиях произведений, жанров
+    и категорий, самые популярные (по числу отзывов) первыми.
+    """
+    try:
+        limit = int(request.query_params.get(
+            'limit', settings.AUTOCOMPLETE_LIMIT
+        ))
+    except ValueError:
+        raise ValidationError({'limit': 'Ожидается целое число.'})
+    limit = max(1, min(limit, settings.AUTOCOMPLETE_MAX_LIMIT))
+    types = None
+    if request.query_params.get('type'):
+        types = frozenset(request.query_params['type'].split(','))
+        if not types <= AUTOCOMPLETE_TYPES:
+            raise ValidationError({'type': (
+                'Допустимые значения: '
+                + ', '.join(sorted(AUTOCOMPLETE_TYPES)) + '.'
+            )})
+    entries = autocomplete_index.search(
+        request.query_params.get('q', ''), limit, types
+    )
+    return Response(AutocompleteSerializer(entries, many=True).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminAndSuperuserOnly])
+@renderer_classes([PrometheusRenderer])
+def metrics(request):
+    """Метрики всех рабочих процессов в текстовом формате Prometheus."""
+    return Response(exposition(*metrics_registry.collect()))
+
+
 class CategoryViewSet(CategoryGenreBaseClass):
     """Вьюсет для категорий."""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    query_budget = {'list': 0, 'create': 2, 'destroy': 5}
 
 
 class GenreViewSet(CategoryGenreBaseClass):
     """Вьюсет для жанров."""
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    query_budget = {'list': 0, 'create': 2, 'destroy': 4}
 
 
-class TitleViewSet(NoPutModelViewSet):
+class TitleViewSet(CachedResponseMixin, NoPutModelViewSet):
     """Вьюсет для произведений."""
-    queryset = Title.objects.annotate(
-        rating=Avg('reviews__score')).order_by('name')
+    queryset = Title.objects.prefetch_related(
+        'genretitle_set'
+    ).order_by('name')
     filterset_class = TitleFilter
     permission_classes = (IsAdminOrReadOnly,)
+    conditional_actions = ('retrieve',)
+    coalesced_actions = ('retrieve',)
+    query_budget = {
+        'list': 3, 'retrieve': 2, 'create': 3, 'bulk': 4,
+        'partial_update': 8, 'destroy': 9,
+    }
 
     def get_serializer_class(self):
         """
@@ -141,37 +206,165 @@ class TitleViewSet(NoPutModelViewSet):
         """
         if self.action in ('list', 'retrieve'):
             return TitleReadSerializer
+        if self.action == 'bulk':
+            return TitleBulkSerializer
         return TitleWriteSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
 
-class ReviewViewSet(NoPutModelViewSet):
+    def get_cache_tags(self, response):
+        """
+        Карточка зависит от своего произведения, страница списка -
+        от состава списка и от каждого показанного произведения.
+        """
+        tags = [model_tag(Genre), model_tag(Category)]
+        if self.action == 'retrieve':
+            return [*tags, title_tag(self.kwargs['pk'])]
+        return [
+            *tags, model_tag(Title),
+            *(title_tag(title['id']) for title in response.data['results']),
+        ]
+
+    @action(methods=('post',), detail=False, url_path='bulk')
+    def bulk(self, request):
+        """
+        Создание и обновление списка произведений одним запросом.
+        При ошибке в любом элементе ничего не сохраняется,
+        а ответ содержит ошибки по каждому элементу.
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ReviewViewSet(CachedResponseMixin, NoPutModelViewSet):
     """Вьюсет для отзывов о произведениях."""
     serializer_class = ReviewSerializer
     permission_classes = (IsAdminModeratorAuthorOrReadOnly,)
+    pagination_class = PageNumberOrKeysetPagination
+    cached_actions = ('list',)
+    conditional_actions = ('list',)
+    coalesced_actions = ('list',)
+    query_budget = {
+        'list': 2, 'retrieve': 1, 'create': 5, 'partial_update': 5,
+        'destroy': 6,
+    }
+
+    def get_cache_tags(self, response):
+        return [reviews_tag(self.kwargs.get('title_id'))]
+
+    def get_count_tags(self):
+        return [reviews_tag(self.kwargs.get('title_id'))]
 
     def get_queryset(self):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        return title.reviews.all()
+        return Review.objects.filter(
+            title_id=self.kwargs.get('title_id')
+        ).select_related('author')
+
+    def paginate_queryset(self, queryset):
+        """
+        Пустая страница может означать несуществующее произведение,
+        только в этом случае его наличие проверяется отдельно.
+        """
+        page = super().paginate_queryset(queryset)
+        if not page and not Title.objects.filter(
+            id=self.kwargs.get('title_id')
+        ).exists():
+            raise NotFound('Произведение не найдено.')
+        return page
 
     def perform_create(self, serializer):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        serializer.save(author=self.request.user, title=title)
+        serializer.save(
+            author=get_user_instance(self.request.user),
+            title_id=int(self.kwargs.get('title_id'))
+        )
 
 
-class CommentViewSet(NoPutModelViewSet):
+class CommentViewSet(CachedResponseMixin, NoPutModelViewSet):
     """Вьюсет для комментариев к отзывам."""
     serializer_class = CommentSerializer
     permission_classes = (IsAdminModeratorAuthorOrReadOnly,)
+    pagination_class = PageNumberOrKeysetPagination
+    cached_actions = ('list',)
+    conditional_actions = ('list',)
+    query_budget = {
+        'list': 2, 'retrieve': 1, 'create': 3, 'partial_update': 2,
+        'destroy': 3,
+    }
 
-    def get_review(self):
-        title_id = self.kwargs.get('title_id')
-        review_id = self.kwargs.get('review_id')
-        return get_object_or_404(Review, id=review_id, title=title_id)
+    def get_cache_tags(self, response):
+        return [comments_tag(self.kwargs.get('review_id'))]
+
+    def get_count_tags(self):
+        return [comments_tag(self.kwargs.get('review_id'))]
+
+    def review_exists(self):
+        return Review.objects.filter(
+            id=self.kwargs.get('review_id'),
+            title_id=self.kwargs.get('title_id'),
+        ).exists()
 
     def get_queryset(self):
-        review = self.get_review()
-        return review.comments.all()
+        return Comment.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review__title_id=self.kwargs.get('title_id'),
+        ).select_related('author')
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if not page and not self.review_exists():
+            raise NotFound('Отзыв не найден.')
+        return page
 
     def perform_create(self, serializer):
-        review = self.get_review()
-        serializer.save(author=self.request.user, review=review)
+        if not self.review_exists():
+            raise NotFound('Отзыв не найден.')
+        serializer.save(
+            author=get_user_instance(self.request.user),
+            review_id=int(self.kwargs.get('review_id'))
+        )
+
+
+class FullTextSearchViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Базовый вьюсет полнотекстового поиска: ранжированный список
+    с фрагментами текста, в которых подсвечены совпадения.
+    Фрагменты строятся отдельным запросом только для текущей страницы.
+    """
+    search_index = None
+    permission_classes = (AllowAny,)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        query = match_query(self.request.query_params.get('q', ''))
+        self.snippets = {}
+        if page and query and search_available(queryset.db):
+            self.snippets = self.search_index.snippets(
+                queryset.db, query, [obj.pk for obj in page]
+            )
+        return page
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['snippets'] = getattr(self, 'snippets', {})
+        return context
+
+
+class ReviewSearchViewSet(FullTextSearchViewSet):
+    """Поиск по текстам отзывов."""
+    queryset = Review.objects.select_related('author')
+    serializer_class = ReviewSearchSerializer
+    filterset_class = ReviewSearchFilter
+    search_index = REVIEW_INDEX
+
+
+class CommentSearchViewSet(FullTextSearchViewSet):
+    """Поиск по текстам комментариев."""
+    queryset = Comment.objects.select_related('author').annotate(
+        title_id=F('review__title_id')
+    )
+    serializer_class = CommentSearchSerializer
+    filterset_class = CommentSearchFilter
+    search_index = COMMENT_INDEX
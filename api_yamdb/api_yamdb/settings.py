@@ -36,6 +36,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ServerTimingMiddleware',
+    'api.middleware.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,6 +70,18 @@ TEMPLATES = [
 WSGI_APPLICATION = 'api_yamdb.wsgi.application'
 
 
+# Cache
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# Сколько секунд живут версии тегов кэша ответов в кэше памяти процесса
+# (locmemcache://): записи других рабочих процессов он не видит.
+CACHE_VERSION_LOCAL_TIMEOUT = env.int(
+    'CACHE_VERSION_LOCAL_TIMEOUT', default=30
+)
+
+
 # Database
 
 DATABASES = {
@@ -118,26 +133,105 @@ CSV_DIRS = BASE_DIR / 'static/data/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CachedCountPageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
 }
 
+BULK_BATCH_SIZE = 500
+# Наибольшее число произведений в одном запросе /titles/bulk/.
+BULK_MAX_ITEMS = 1000
+
+AUTOCOMPLETE_LIMIT = 10
+
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+# Полное перестроение индекса автодополнения обновляет популярность
+# жанров и категорий и изменения, сделанные в обход ORM.
+AUTOCOMPLETE_REFRESH_INTERVAL = 300
+
+PAGINATION_COUNT_CACHE_TIMEOUT = 300
+
+# Справочники жанров и категорий перечитываются не реже, чем раз
+# в столько секунд, даже если версия в кэше не изменилась.
+DICTIONARY_MAX_AGE = 60
+
+RESPONSE_CACHE_TIMEOUT = 300
+# Сколько запрос ждёт ответ, который пересчитывает другой запрос.
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+# Отдавать устаревший ответ, пока новый строится в фоне.
+RESPONSE_CACHE_STALE_WHILE_REVALIDATE = env.bool(
+    'RESPONSE_CACHE_STALE_WHILE_REVALIDATE', default=False
+)
+# Начиная с этого размера таблицы без фильтров отдают оценку количества
+# строк из статистики СУБД вместо COUNT(*). None - всегда точный подсчёт.
+PAGINATION_APPROXIMATE_COUNT_THRESHOLD = env.int(
+    'PAGINATION_APPROXIMATE_COUNT_THRESHOLD', default=None
+)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Сколько проверенных токенов хранится в памяти процесса.
+JWT_CACHE_SIZE = env.int('JWT_CACHE_SIZE', default=10000)
+# Сколько секунд права пользователя для проверки токенов хранятся в кэше.
+# С кэшем в памяти процесса (locmemcache://) другие рабочие процессы
+# узнают об изменении прав не позже чем через это время.
+TOKEN_RIGHTS_CACHE_TIMEOUT = env.int('TOKEN_RIGHTS_CACHE_TIMEOUT', default=30)
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = BASE_DIR / 'email/'
 DEFAULT_EMAIL = 'review@yamdb.info'
+# Письма ставятся в очередь и отправляются командой send_outbox.
+# EMAIL_OUTBOX_EAGER - отправлять сразу после фиксации транзакции.
+EMAIL_OUTBOX_EAGER = env.bool('EMAIL_OUTBOX_EAGER', default=False)
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+# Задержка перед повторной попыткой, удваивается с каждой неудачей.
+EMAIL_OUTBOX_RETRY_DELAY = 60
+# На сколько секунд обработчик резервирует выбранные письма.
+EMAIL_OUTBOX_LEASE = 300
+
+# Замеры запросов в заголовке Server-Timing и в логе api.middleware.
+# Обёртки SQL замедляют запрос, поэтому по умолчанию замеряется 1%.
+SQL_TIMING_SAMPLE_RATE = env.float('SQL_TIMING_SAMPLE_RATE', default=0.01)
+# Запросы медленнее порога или с большим числом SQL
+# логируются со списком SQL-запросов.
+SQL_TIMING_SLOW_MS = env.int('SQL_TIMING_SLOW_MS', default=500)
+SQL_TIMING_MAX_QUERIES = env.int('SQL_TIMING_MAX_QUERIES', default=30)
+
+# Поиск N+1: SQL-запрос одной формы больше NPLUSONE_THRESHOLD раз
+# за запрос. Режим warn, log или raise; без режима поиск выключен.
+NPLUSONE_MODE = env('NPLUSONE_MODE', default=None)
+NPLUSONE_THRESHOLD = env.int('NPLUSONE_THRESHOLD', default=5)
+
+# Каталог для метрик нескольких рабочих процессов; None - один процесс.
+METRICS_DIR = env('METRICS_DIR', default=None)
+METRICS_FLUSH_INTERVAL = 1
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.middleware': {'handlers': ['console'], 'level': 'INFO'},
+        'api.nplusone': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
 
 MAX_LENGTH_NAME = 256
 MAX_LENGTH_USERNAME = 150
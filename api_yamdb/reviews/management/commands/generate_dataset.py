@@ -0,0 +1,251 @@
+import csv
+import math
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+WORDS = (
+    'время', 'жизнь', 'дорога', 'город', 'море', 'ночь', 'звезда', 'память',
+    'тень', 'свет', 'ветер', 'огонь', 'песня', 'сердце', 'мир', 'война',
+    'дом', 'небо', 'река', 'история', 'тайна', 'зима', 'лето', 'голос',
+    'последний', 'тихий', 'долгий', 'красный', 'белый', 'старый', 'новый',
+    'далёкий', 'чужой', 'тёмный', 'быстрый', 'первый', 'золотой', 'юный',
+    'сюжет', 'актёр', 'герой', 'финал', 'автор', 'музыка', 'книга', 'кадр',
+    'отлично', 'скучно', 'смешно', 'сильно', 'неожиданно', 'красиво',
+    'затянуто', 'честно', 'ярко', 'наивно', 'глубоко', 'рекомендую',
+)
+
+# Таблицы в формате static/data, который читает import_csv.
+HEADERS = {
+    'users.csv': ('id', 'username', 'email', 'role', 'bio',
+                  'first_name', 'last_name'),
+    'category.csv': ('id', 'name', 'slug'),
+    'genre.csv': ('id', 'name', 'slug'),
+    'titles.csv': ('id', 'name', 'year', 'category'),
+    'genre_title.csv': ('id', 'title_id', 'genre_id'),
+    'review.csv': ('id', 'title_id', 'text', 'author', 'score', 'pub_date'),
+    'comments.csv': ('id', 'review_id', 'text', 'author', 'pub_date'),
+}
+
+EPOCH = datetime(2015, 1, 1, tzinfo=timezone.utc)
+PERIOD = timedelta(days=365 * 10).total_seconds()
+
+
+def zipf_weights(count, skew):
+    """Веса рангов 1..count по закону Ципфа."""
+    return [rank ** -skew for rank in range(1, count + 1)]
+
+
+def split(total, weights, rng):
+    """
+    Делит total пропорционально весам: целая часть доли плюс единица
+    с вероятностью дробной части, сумма в среднем равна total.
+    """
+    scale = total / math.fsum(weights)
+    for weight in weights:
+        expected = weight * scale
+        count = int(expected)
+        yield count + (rng.random() < expected - count)
+
+
+def capped_split(total, weights, cap, rng):
+    """
+    Как split, но не больше cap на вес: излишек повторно делится
+    между ещё не заполненными позициями.
+    """
+    counts = [0] * len(weights)
+    remaining = list(range(len(weights)))
+    while total > 0 and remaining:
+        shares = split(total, [weights[i] for i in remaining], rng)
+        assigned, still_open = 0, []
+        for index, share in zip(remaining, shares):
+            added = min(share, cap - counts[index])
+            counts[index] += added
+            assigned += added
+            if counts[index] < cap:
+                still_open.append(index)
+        if not assigned:
+            break
+        total -= assigned
+        remaining = still_open
+    return counts
+
+
+class Generator:
+    """Синтетические данные с неравномерной популярностью произведений."""
+
+    def __init__(self, options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+
+    def text(self, low, high):
+        words = self.rng.choices(WORDS, k=self.rng.randint(low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def pub_date(self):
+        moment = EPOCH + timedelta(seconds=self.rng.random() * PERIOD)
+        return moment.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+    def users(self):
+        """Первый пользователь - администратор, второй - модератор."""
+        roles = ('user',) * 97 + ('moderator',) * 2 + ('admin',)
+        for pk in range(1, self.options['users'] + 1):
+            role = {1: 'admin', 2: 'moderator'}.get(pk) or self.rng.choice(
+                roles
+            )
+            yield (pk, f'user{pk}', f'user{pk}@yamdb.fake', role, '', '', '')
+
+    def dictionary(self, prefix, count):
+        for pk in range(1, count + 1):
+            yield pk, f'{self.text(1, 2)[:-1]} {pk}', f'{prefix}-{pk}'
+
+    def titles(self):
+        category_weights = zipf_weights(self.options['categories'], 1)
+        categories = range(1, self.options['categories'] + 1)
+        for pk in range(1, self.options['titles'] + 1):
+            yield (pk, self.text(1, 4)[:-1], self.rng.randint(1950, 2024),
+                   self.rng.choices(categories, category_weights)[0])
+
+    def genre_titles(self):
+        genres = range(1, self.options['genres'] + 1)
+        weights = zipf_weights(self.options['genres'], 1)
+        pk = 0
+        for title_id in range(1, self.options['titles'] + 1):
+            chosen = set(self.rng.choices(
+                genres, weights, k=self.rng.randint(1, 3)
+            ))
+            for genre_id in sorted(chosen):
+                pk += 1
+                yield pk, title_id, genre_id
+
+    def reviews_and_comments(self, reviews, comments):
+        """
+        Число отзывов на произведение убывает по Ципфу от его ранга,
+        ранги перемешаны. Авторы отзывов одного произведения различны.
+        Комментарии распределяются пропорционально числу отзывов.
+        """
+        options = self.options
+        ranks = list(range(options['titles']))
+        self.rng.shuffle(ranks)
+        weights = zipf_weights(options['titles'], options['skew'])
+        counts = capped_split(
+            options['reviews'], weights, options['users'], self.rng
+        )
+        comment_counts = [0] * len(counts)
+        if any(counts):
+            comment_counts = list(
+                split(options['comments'], counts, self.rng)
+            )
+        review_pk = comment_pk = 0
+        for title_id, rank in enumerate(ranks, start=1):
+            count = counts[rank]
+            mood = self.rng.uniform(3, 9)
+            authors = self.rng.sample(range(1, options['users'] + 1), count)
+            first = review_pk + 1
+            for author in authors:
+                review_pk += 1
+                score = min(10, max(1, round(self.rng.gauss(mood, 2))))
+                reviews.writerow((review_pk, title_id, self.text(5, 40),
+                                  author, score, self.pub_date()))
+            for _ in range(comment_counts[rank] if count else 0):
+                comment_pk += 1
+                comments.writerow((
+                    comment_pk, self.rng.randint(first, review_pk),
+                    self.text(3, 20),
+                    self.rng.randint(1, options['users']), self.pub_date(),
+                ))
+        return review_pk, comment_pk
+
+
+def open_table(directory, name):
+    file = open(directory / name, 'w', encoding='utf-8', newline='')
+    writer = csv.writer(file)
+    writer.writerow(HEADERS[name])
+    return file, writer
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация синтетических CSV-файлов заданного размера '
+        'в формате import_csv'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=Path,
+            default=Path(tempfile.gettempdir()) / 'yamdb_dataset',
+            help='Каталог для CSV-файлов, по умолчанию - во временном '
+                 'каталоге системы.',
+        )
+        for name, default, description in (
+            ('users', 1000, 'пользователей'),
+            ('categories', 10, 'категорий'),
+            ('genres', 30, 'жанров'),
+            ('titles', 1000, 'произведений'),
+            ('reviews', 20000, 'отзывов'),
+            ('comments', 50000, 'комментариев'),
+        ):
+            parser.add_argument(
+                f'--{name}',
+                type=int,
+                default=default,
+                help=f'Количество {description}.',
+            )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Показатель Ципфа для популярности произведений.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Начальное значение генератора случайных чисел.',
+        )
+        parser.add_argument(
+            '--load',
+            action='store_true',
+            help='Загрузить файлы в базу данных командой import_csv.',
+        )
+
+    def handle(self, *args, **options):
+        for name in ('users', 'categories', 'genres', 'titles'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} должен быть положительным')
+        output = options['output']
+        output.mkdir(parents=True, exist_ok=True)
+        generator = Generator(options)
+        tables = {
+            'users.csv': generator.users(),
+            'category.csv': generator.dictionary(
+                'category', options['categories']
+            ),
+            'genre.csv': generator.dictionary('genre', options['genres']),
+            'titles.csv': generator.titles(),
+            'genre_title.csv': generator.genre_titles(),
+        }
+        for name, rows in tables.items():
+            file, writer = open_table(output, name)
+            with file:
+                writer.writerows(rows)
+        reviews_file, reviews = open_table(output, 'review.csv')
+        comments_file, comments = open_table(output, 'comments.csv')
+        with reviews_file, comments_file:
+            review_count, comment_count = generator.reviews_and_comments(
+                reviews, comments
+            )
+        self.stdout.write(
+            f'{output}: отзывов {review_count}, '
+            f'комментариев {comment_count}'
+        )
+        if options['load']:
+            call_command(
+                'import_csv', data_dir=output, restart=True,
+                stdout=self.stdout,
+            )
@@ -1,59 +1,496 @@
-import datetime
-import sqlite3
+import csv
+import os
+import pickle
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain, islice
+from pathlib import Path
 
-import pandas as pd
+import django
+from django.apps import apps
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
 
+from reviews.models import (Category, Comment, Genre, GenreTitle,
+                            ImportCheckpoint, Review, Title)
+from reviews.signals import data_imported
+
+User = get_user_model()
+
+# Порядок загрузки вычисляется по внешним ключам моделей.
 data = (
-    (f'{settings.CSV_DIRS}/users.csv', 'user'),
-    (f'{settings.CSV_DIRS}/category.csv', 'category'),
-    (f'{settings.CSV_DIRS}/genre.csv', 'genre'),
-    (f'{settings.CSV_DIRS}/titles.csv', 'title'),
-    (f'{settings.CSV_DIRS}/genre_title.csv', 'genre_title'),
-    (f'{settings.CSV_DIRS}/review.csv', 'review'),
-    (f'{settings.CSV_DIRS}/comments.csv', 'comment'),
+    ('users.csv', User),
+    ('category.csv', Category),
+    ('genre.csv', Genre),
+    ('titles.csv', Title),
+    ('genre_title.csv', GenreTitle),
+    ('review.csv', Review),
+    ('comments.csv', Comment),
+)
+
+COLUMN_ALIASES = {
+    'category': 'category_id',
+    'author': 'author_id',
+}
+
+UPSERT_KEYS = {
+    Category: 'slug',
+    Genre: 'slug',
+}
+
+
+PreparedTable = namedtuple(
+    'PreparedTable', ('label', 'spill', 'rows', 'seconds', 'error')
 )
 
 
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def dependency_order(models):
+    """
+    Порядок загрузки по внешним ключам моделей:
+    таблица загружается после всех таблиц, на которые ссылается.
+    """
+    pending = {
+        model: {
+            field.related_model for field in model._meta.concrete_fields
+            if field.many_to_one
+            and field.related_model in models
+            and field.related_model is not model
+        }
+        for model in models
+    }
+    order = []
+    while pending:
+        ready = [model for model, deps in pending.items() if not deps]
+        if not ready:
+            raise CommandError(
+                'Циклическая зависимость между таблицами: '
+                + ', '.join(model._meta.db_table for model in pending)
+            )
+        for model in ready:
+            order.append(model)
+            del pending[model]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return order
+
+
+def prepare_table(path, label, chunk_size, spill_dir):
+    """
+    Разбор и проверка CSV-файла в рабочем процессе.
+    Готовые для вставки пакеты строк сбрасываются во временный файл,
+    который основной процесс потоково читает при записи в базу.
+    """
+    started = time.monotonic()
+    table = CsvTable(Path(path), apps.get_model(label))
+    rows = 0
+    with tempfile.NamedTemporaryFile(
+        dir=spill_dir, suffix='.pickle', delete=False
+    ) as spill:
+        message = None
+        try:
+            with table.open() as file:
+                reader = csv.reader(file)
+                table.read_header(reader)
+                for chunk in batched(table.rows(reader), chunk_size):
+                    pickle.dump(chunk, spill, pickle.HIGHEST_PROTOCOL)
+                    rows += len(chunk)
+        except (OSError, ValueError, csv.Error, ValidationError,
+                CommandError) as error:
+            message = f'{path}: {error}'
+    if message is not None:
+        os.unlink(spill.name)
+        spill = None
+    return PreparedTable(
+        label, spill and spill.name, rows, time.monotonic() - started, message
+    )
+
+
+def read_spill(path):
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+
+class InlineExecutor:
+    """Выполнение подготовки в основном процессе при --workers 1."""
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+    def shutdown(self):
+        pass
+
+
+class CsvTable:
+    """
+    Потоковое чтение CSV-файла модели:
+    строки приводятся к значениям для базы данных через поля модели.
+    """
+
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        self.fields = {
+            field.column: field for field in model._meta.concrete_fields
+        }
+
+    def open(self):
+        return open(self.path, encoding='utf-8', newline='')
+
+    @property
+    def fingerprint(self):
+        """Размер и время изменения файла: другой файл - другой импорт."""
+        stat = self.path.stat()
+        return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+    def read_header(self, reader):
+        line = next(reader, None)
+        if line is None:
+            raise CommandError(f'{self.path}: файл пуст')
+        header = [COLUMN_ALIASES.get(column, column) for column in line]
+        unknown = set(header) - self.fields.keys()
+        if unknown:
+            raise CommandError(
+                f'{self.path}: неизвестные столбцы {", ".join(unknown)}'
+            )
+        self.header = header
+        self.missing = [
+            field for column, field in self.fields.items()
+            if column not in header
+        ]
+        self.columns = header + [field.column for field in self.missing]
+
+    def default(self, field):
+        if getattr(field, 'auto_now', False) or getattr(
+            field, 'auto_now_add', False
+        ):
+            return timezone.now()
+        return field.get_default()
+
+    def convert(self, field, value):
+        if value == '' and field.null:
+            return None
+        return field.get_db_prep_save(field.to_python(value), connection)
+
+    def rows(self, reader):
+        fields = [self.fields[column] for column in self.header]
+        defaults = [
+            field.get_db_prep_save(self.default(field), connection)
+            for field in self.missing
+        ]
+        for line in reader:
+            if len(line) != len(fields):
+                raise ValueError(
+                    f'строка {reader.line_num}: ожидалось {len(fields)} '
+                    f'значений, получено {len(line)}'
+                )
+            yield [
+                self.convert(field, value)
+                for field, value in zip(fields, line)
+            ] + defaults
+
+    @property
+    def insert_sql(self):
+        quote = connection.ops.quote_name
+        return 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(self.model._meta.db_table),
+            ', '.join(quote(column) for column in self.columns),
+            ', '.join(['%s'] * len(self.columns)),
+        )
+
+
+class Upsert:
+    """
+    Вставка новых и обновление изменившихся строк по ключу:
+    первичному ключу или slug для категорий и жанров.
+    Неизменившиеся строки не затрагиваются.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        key_field = table.model._meta.get_field(
+            UPSERT_KEYS.get(table.model, table.model._meta.pk.name)
+        )
+        if key_field.column not in table.header:
+            raise CommandError(
+                f'{table.path}: для обновления нужен столбец '
+                f'{key_field.column}'
+            )
+        self.key_field = key_field
+        self.key = table.header.index(key_field.column)
+        pk_column = table.model._meta.pk.column
+        self.updated = [
+            index for index, column in enumerate(table.header)
+            if column not in (key_field.column, pk_column)
+        ]
+        self.fields = [
+            table.fields[table.header[index]] for index in self.updated
+        ]
+        quote = connection.ops.quote_name
+        self.update_sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+            quote(table.model._meta.db_table),
+            ', '.join(f'{quote(field.column)} = %s' for field in self.fields),
+            quote(key_field.column),
+        )
+        self.lookup_size = connection.features.max_query_params or 1000
+
+    def existing(self, keys):
+        """Текущие значения обновляемых столбцов по ключам пакета."""
+        names = [field.attname for field in self.fields]
+        current = {}
+        for batch in batched(keys, self.lookup_size):
+            queryset = self.table.model.objects.filter(
+                **{f'{self.key_field.attname}__in': batch}
+            ).values_list(self.key_field.attname, *names)
+            for key, *values in queryset:
+                current[self.key_field.get_db_prep_save(key, connection)] = [
+                    field.get_db_prep_save(value, connection)
+                    for field, value in zip(self.fields, values)
+                ]
+        return current
+
+    def write(self, cursor, chunk):
+        """Записывает пакет, возвращает число вставленных и обновлённых."""
+        rows = {row[self.key]: row for row in chunk}
+        current = self.existing(list(rows))
+        inserts, updates = [], []
+        for key, row in rows.items():
+            values = [row[index] for index in self.updated]
+            if key not in current:
+                inserts.append(row)
+            elif current[key] != values:
+                updates.append(values + [key])
+        if inserts:
+            cursor.executemany(self.table.insert_sql, inserts)
+        if updates and self.fields:
+            cursor.executemany(self.update_sql, updates)
+        return len(inserts), len(updates)
+
+
 class Command(BaseCommand):
     help = 'Импорт данных из файлов CSV'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одной транзакции вставки.',
+        )
+        parser.add_argument(
+            '--data-dir',
+            type=Path,
+            default=settings.CSV_DIRS,
+            help='Каталог с CSV-файлами.',
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help=(
+                'Обновлять существующие строки по первичному ключу '
+                '(по slug для категорий и жанров) вместо вставки.'
+            ),
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Количество процессов для разбора и проверки файлов.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Забыть сохранённый прогресс и начать импорт заново.',
+        )
+
     def handle(self, *args, **options):
-        con = sqlite3.connect('db.sqlite3')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным')
+        if options['restart']:
+            ImportCheckpoint.objects.all().delete()
+        files = {model: options['data_dir'] / file for file, model in data}
+        order = dependency_order(list(files))
 
-        for file, table in data:
+        tables, checkpoints = {}, {}
+        for model in order:
+            table = CsvTable(files[model], model)
             try:
-                df = pd.read_csv(
-                    file,
-                    sep=',',
-                    header=0,
+                checkpoints[model] = self.get_checkpoint(
+                    table, options['upsert']
                 )
-                df.rename(
-                    columns={
-                        'category': 'category_id',
-                        'author': 'author_id',
-                    },
-                    inplace=True,
+            except OSError as error:
+                raise CommandError(
+                    f'Ошибка загрузки {table.path}: {error}'
+                ) from error
+            if checkpoints[model].completed:
+                self.stdout.write(f'{table.path} уже импортирован, пропуск')
+            else:
+                tables[model] = table
+
+        timings = []
+        with tempfile.TemporaryDirectory() as spill_dir:
+            prepared = self.prepare(tables, spill_dir, options)
+            for model, table in tables.items():
+                try:
+                    seconds = self.import_table(
+                        table, prepared[model], checkpoints[model],
+                        options['chunk_size'], options['upsert'],
+                    )
+                except (OSError, ValueError, csv.Error,
+                        DatabaseError) as error:
+                    raise CommandError(
+                        f'Ошибка загрузки {table.path}: {error}'
+                    ) from error
+                timings.append((table, prepared[model], seconds))
+
+        self.reset_sequences()
+        call_command('rebuild_ratings', stdout=self.stdout)
+        data_imported.send(sender=type(self), models={*tables, Title})
+        self.report(timings)
+        self.stdout.write('Работа команды import_csv завершена')
+
+    def prepare(self, tables, spill_dir, options):
+        """Параллельный разбор файлов до начала записи в базу."""
+        executor = self.get_executor(options['workers'], len(tables))
+        try:
+            futures = {
+                model: executor.submit(
+                    prepare_table, str(table.path), model._meta.label,
+                    options['chunk_size'], spill_dir,
                 )
-                if table == 'user':
-                    df = df.assign(
-                        password='12345678',
-                        is_superuser=False,
-                        is_staff=False,
-                        is_active=True,
-                        date_joined=datetime.datetime.now(),
-                        first_name='null',
-                        last_name='null',
-                        bio='null'
+                for model, table in tables.items()
+            }
+            prepared = {
+                model: future.result() for model, future in futures.items()
+            }
+        finally:
+            executor.shutdown()
+        errors = [table.error for table in prepared.values() if table.error]
+        if errors:
+            raise CommandError(
+                'Ошибки в CSV-файлах, данные не загружались:\n'
+                + '\n'.join(errors)
+            )
+        return prepared
+
+    def get_executor(self, workers, tables):
+        workers = min(workers, tables)
+        if workers <= 1:
+            return InlineExecutor()
+        return ProcessPoolExecutor(workers, initializer=django.setup)
+
+    def get_checkpoint(self, table, upsert):
+        """
+        Прогресс загрузки таблицы. Для изменившегося файла
+        в режиме обновления прогресс сбрасывается, а при обычной
+        вставке повторная загрузка запрещена: строки бы задвоились.
+        """
+        checkpoint, created = ImportCheckpoint.objects.get_or_create(
+            table=table.model._meta.db_table,
+            defaults={'fingerprint': table.fingerprint},
+        )
+        if created or checkpoint.fingerprint == table.fingerprint:
+            return checkpoint
+        if not upsert:
+            raise CommandError(
+                f'{table.path} изменился после прошлого импорта: '
+                'используйте --upsert или --restart'
+            )
+        checkpoint.fingerprint = table.fingerprint
+        checkpoint.rows = 0
+        checkpoint.completed = False
+        checkpoint.save()
+        return checkpoint
+
+    def import_table(self, table, prepared, checkpoint, chunk_size, upsert):
+        """Записывает подготовленные пакеты, возвращает время записи."""
+        table_name = table.model._meta.db_table
+        if checkpoint.rows:
+            self.stdout.write(
+                f'{table_name}: продолжение со строки {checkpoint.rows + 1}'
+            )
+        started = time.monotonic()
+        total = inserted = updated = 0
+        with table.open() as file:
+            table.read_header(csv.reader(file))
+        writer = Upsert(table) if upsert else None
+        rows = islice(
+            chain.from_iterable(read_spill(prepared.spill)),
+            checkpoint.rows, None,
+        )
+        for chunk in batched(rows, chunk_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                if writer is None:
+                    cursor.executemany(table.insert_sql, chunk)
+                    chunk_inserted, chunk_updated = len(chunk), 0
+                else:
+                    chunk_inserted, chunk_updated = writer.write(
+                        cursor, chunk
                     )
-                df.to_sql(
-                    table,
-                    con,
-                    if_exists='append',
-                    index=False
+                ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                    rows=F('rows') + len(chunk)
                 )
-                print(f'Данные из {file} успешно импортированы')
-            except Exception as error:
-                print(f'Ошибка загрузки - {error}')
-        print('Работа команды import_csv завершена')
+            total += len(chunk)
+            inserted += chunk_inserted
+            updated += chunk_updated
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{table_name}: {total} строк, '
+                f'{total / elapsed if elapsed else total:.0f} строк/с'
+            )
+        ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            completed=True
+        )
+        self.stdout.write(
+            f'Данные из {table.path} успешно импортированы: '
+            f'добавлено {inserted}, обновлено {updated}'
+        )
+        return time.monotonic() - started
+
+    def report(self, timings):
+        """Время разбора и записи по таблицам."""
+        if not timings:
+            return
+        self.stdout.write(
+            f'{"Таблица":<15}{"Строк":>10}{"Разбор, с":>12}'
+            f'{"Запись, с":>12}{"Строк/с":>10}'
+        )
+        for table, prepared, seconds in timings:
+            rate = prepared.rows / seconds if seconds else prepared.rows
+            self.stdout.write(
+                f'{table.model._meta.db_table:<15}{prepared.rows:>10}'
+                f'{prepared.seconds:>12.2f}{seconds:>12.2f}{rate:>10.0f}'
+            )
+
+    def reset_sequences(self):
+        """Счётчики ключей должны продолжаться после импортированных id."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [model for _, model in data]
+        )
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from reviews.models import Title, rating_subquery
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт рейтингов всех произведений по отзывам'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = Title.objects.update(
+                rating_sum=rating_subquery(Sum('score')),
+                rating_count=rating_subquery(Count('pk')),
+            )
+        self.stdout.write(f'Рейтинги пересчитаны для {updated} произведений')
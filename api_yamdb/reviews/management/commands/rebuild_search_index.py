@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from reviews.search import INDEXES, search_available
+
+
+class Command(BaseCommand):
+    help = 'Перестроение полнотекстовых индексов по содержимому таблиц'
+
+    def handle(self, *args, **options):
+        if not search_available(connection.alias):
+            raise CommandError(
+                'Полнотекстовые индексы поддерживаются только в SQLite'
+            )
+        with transaction.atomic():
+            for index in INDEXES:
+                index.rebuild(connection)
+                self.stdout.write(f'Индекс {index.table} перестроен')
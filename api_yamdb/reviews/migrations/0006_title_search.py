@@ -0,0 +1,29 @@
+# Generated by Django 3.2.23 on 2026-10-18 16:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import reviews.search
+from reviews.search import TITLE_INDEX, create_indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleSearch',
+            fields=[
+                ('title', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='reviews.title')),
+                ('name', reviews.search.SearchField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'title_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(*create_indexes(TITLE_INDEX)),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import reviews.search
+from reviews.search import COMMENT_INDEX, REVIEW_INDEX, create_indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_title_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentSearch',
+            fields=[
+                ('comment', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='reviews.comment')),
+                ('text', reviews.search.SearchField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'comment_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewSearch',
+            fields=[
+                ('review', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='reviews.review')),
+                ('text', reviews.search.SearchField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'review_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(*create_indexes(REVIEW_INDEX, COMMENT_INDEX)),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:31
+
+from django.db import migrations, models
+import reviews.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_review_comment_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='title',
+            field=models.ForeignKey(on_delete=reviews.models.cascade_without_rating, related_name='reviews', to='reviews.title', verbose_name='Произведение'),
+        ),
+    ]
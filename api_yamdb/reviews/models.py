@@ -1,8 +1,11 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 
+from reviews.search import SearchField
 from reviews.validators import validate_year
 
 User = get_user_model()
@@ -86,6 +89,16 @@ class Title(models.Model):
         null=True,
         related_name='titles',
     )
+    rating_sum = models.PositiveIntegerField(
+        verbose_name='Сумма оценок',
+        default=0,
+        editable=False,
+    )
+    rating_count = models.PositiveIntegerField(
+        verbose_name='Количество оценок',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         db_table = 'title'
@@ -96,6 +109,29 @@ class Title(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def rating(self):
+        """Средняя оценка, вычисляемая из хранимых суммы и количества."""
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    @classmethod
+    def update_rating(cls, title_id, score, count):
+        """Атомарно изменяет сумму и количество оценок произведения."""
+        cls.objects.filter(pk=title_id).update(
+            rating_sum=F('rating_sum') + score,
+            rating_count=F('rating_count') + count,
+        )
+
+    @classmethod
+    def recalculate_rating(cls, title_id):
+        """Пересчитывает сумму и количество оценок по отзывам."""
+        cls.objects.filter(pk=title_id).update(
+            rating_sum=rating_subquery(Sum('score')),
+            rating_count=rating_subquery(Count('pk')),
+        )
+
 
 class GenreTitle(models.Model):
     """Модель связи произведения с жанрами."""
@@ -116,11 +152,42 @@ class GenreTitle(models.Model):
         verbose_name_plural = 'Связи произведений и жанров'
 
 
+class TitleSearch(models.Model):
+    """
+    Полнотекстовый индекс названий произведений (SQLite FTS5).
+    Таблица создаётся миграцией и обновляется триггерами.
+    """
+    title = models.OneToOneField(
+        Title,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search',
+    )
+    name = SearchField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'title_fts'
+
+
+def cascade_without_rating(collector, field, sub_objs, using):
+    """
+    CASCADE для отзывов удаляемого произведения: рейтинг произведения,
+    которое удаляется вместе с ними, не пересчитывается по каждому отзыву.
+    """
+    for review in sub_objs:
+        review.title_deleted = True
+    models.CASCADE(collector, field, sub_objs, using)
+
+
 class Review(models.Model):
     """Модель отзывов о произведениях."""
     title = models.ForeignKey(
         Title,
-        on_delete=models.CASCADE,
+        on_delete=cascade_without_rating,
         related_name='reviews',
         verbose_name='Произведение',
     )
@@ -147,7 +214,13 @@ class Review(models.Model):
 
     class Meta:
         db_table = 'review'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=('title', '-pub_date', '-id'),
+                name='review_title_pub_date_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('title', 'author'), name='unique_title_author'
@@ -159,6 +232,47 @@ class Review(models.Model):
     def __str__(self):
         return f'{self.author} - {self.text[:30]}'
 
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет отзыв и в той же транзакции обновляет рейтинг
+        произведения. Прежние произведение и оценка перечитываются
+        с блокировкой строки: значения, загруженные вместе с отзывом,
+        могли устареть, пока его изменял параллельный запрос.
+        """
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = Review.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('title_id', 'score').first()
+            # Прежнее произведение нужно сигналам, сбрасывающим кэш.
+            self._previous_rating = previous
+            super().save(*args, **kwargs)
+            if not previous:
+                Title.update_rating(self.title_id, self.score, 1)
+            elif previous[0] == self.title_id:
+                if previous[1] != self.score:
+                    Title.update_rating(
+                        self.title_id, self.score - previous[1], 0
+                    )
+            else:
+                Title.update_rating(previous[0], -previous[1], -1)
+                Title.update_rating(self.title_id, self.score, 1)
+
+
+def rating_subquery(aggregate):
+    """Подзапрос, агрегирующий оценки отзывов одного произведения."""
+    reviews = Review.objects.filter(
+        title=OuterRef('pk')
+    ).order_by().values('title')
+    return Coalesce(
+        Subquery(
+            reviews.annotate(value=aggregate).values('value'),
+            output_field=models.PositiveIntegerField(),
+        ),
+        0,
+    )
+
 
 class Comment(models.Model):
     """Модель комментариев к отзывам."""
@@ -185,9 +299,84 @@ class Comment(models.Model):
 
     class Meta:
         db_table = 'comment'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=('review', '-pub_date', '-id'),
+                name='comment_review_pub_date_idx',
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
     def __str__(self):
         return f'{self.author} - {self.text[:30]}'
+
+
+class ImportCheckpoint(models.Model):
+    """Прогресс импорта CSV-файла в таблицу для возобновления загрузки."""
+    table = models.CharField(
+        verbose_name='Таблица',
+        max_length=settings.MAX_LENGTH_SLUG,
+        unique=True,
+    )
+    fingerprint = models.CharField(
+        verbose_name='Отпечаток файла',
+        max_length=settings.MAX_LENGTH_SLUG,
+    )
+    rows = models.PositiveBigIntegerField(
+        verbose_name='Загружено строк',
+        default=0,
+    )
+    completed = models.BooleanField(
+        verbose_name='Загрузка завершена',
+        default=False,
+    )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+
+    class Meta:
+        db_table = 'import_checkpoint'
+        verbose_name = 'Контрольная точка импорта'
+        verbose_name_plural = 'Контрольные точки импорта'
+
+    def __str__(self):
+        return f'{self.table}: {self.rows}'
+
+
+class ReviewSearch(models.Model):
+    """Полнотекстовый индекс текстов отзывов (SQLite FTS5)."""
+    review = models.OneToOneField(
+        Review,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search',
+    )
+    text = SearchField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'review_fts'
+
+
+class CommentSearch(models.Model):
+    """Полнотекстовый индекс текстов комментариев (SQLite FTS5)."""
+    comment = models.OneToOneField(
+        Comment,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search',
+    )
+    text = SearchField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'comment_fts'
@@ -0,0 +1,148 @@
+import re
+from html import escape
+
+from django.db import connections, models
+from django.db.models import Lookup
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+class SearchField(models.TextField):
+    """Столбец полнотекстового индекса SQLite FTS5."""
+
+
+@SearchField.register_lookup
+class Match(Lookup):
+    """Условие MATCH по столбцу полнотекстового индекса."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+class FullTextIndex:
+    """
+    Внешний (content=) индекс FTS5 над таблицей модели.
+    Индекс хранит только токены, а синхронизируется с таблицей
+    триггерами, поэтому его обновляют и ORM, и bulk-операции, и import_csv.
+    """
+    tokenize = 'unicode61 remove_diacritics 2'
+
+    def __init__(self, table, content, columns):
+        self.table = table
+        self.content = content
+        self.columns = columns
+
+    def create_sql(self):
+        columns = ', '.join(self.columns)
+        new = ', '.join(f'new.{column}' for column in self.columns)
+        old = ', '.join(f'old.{column}' for column in self.columns)
+        changed = ' OR '.join(
+            f'old.{column} IS NOT new.{column}' for column in self.columns
+        )
+        insert = (
+            f'INSERT INTO {self.table}(rowid, {columns}) '
+            f'VALUES (new.id, {new});'
+        )
+        delete = (
+            f'INSERT INTO {self.table}({self.table}, rowid, {columns}) '
+            f"VALUES ('delete', old.id, {old});"
+        )
+        return [
+            f'CREATE VIRTUAL TABLE {self.table} USING fts5({columns}, '
+            f"content='{self.content}', content_rowid='id', "
+            f"tokenize='{self.tokenize}')",
+            f'CREATE TRIGGER {self.table}_insert AFTER INSERT '
+            f'ON {self.content} BEGIN {insert} END',
+            f'CREATE TRIGGER {self.table}_delete AFTER DELETE '
+            f'ON {self.content} BEGIN {delete} END',
+            f'CREATE TRIGGER {self.table}_update AFTER UPDATE OF {columns} '
+            f'ON {self.content} WHEN {changed} BEGIN {delete} {insert} END',
+        ]
+
+    def drop_sql(self):
+        return [
+            f'DROP TRIGGER IF EXISTS {self.table}_{event}'
+            for event in ('insert', 'delete', 'update')
+        ] + [f'DROP TABLE IF EXISTS {self.table}']
+
+    def rebuild(self, connection):
+        """Перестраивает индекс по текущему содержимому таблицы."""
+        with connection.cursor() as cursor:
+            for command in ('rebuild', 'optimize'):
+                cursor.execute(
+                    f'INSERT INTO {self.table}({self.table}) VALUES (%s)',
+                    (command,),
+                )
+
+    def snippets(self, using, query, ids, tokens=16):
+        """
+        Фрагменты текста с подсвеченными совпадениями для найденных строк:
+        {id: фрагмент}. Текст экранируется, совпадения оборачиваются в <mark>.
+        """
+        if not ids:
+            return {}
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({self.table}, -1, %s, %s, %s, %s) '
+                f'FROM {self.table} WHERE {self.table} MATCH %s '
+                f'AND rowid IN ({", ".join(["%s"] * len(ids))})',
+                (MARK_START, MARK_END, '…', tokens, query, *ids),
+            )
+            return {
+                pk: escape(snippet).replace(
+                    MARK_START, '<mark>'
+                ).replace(MARK_END, '</mark>')
+                for pk, snippet in cursor.fetchall()
+            }
+
+
+# Служебные символы, которых не бывает в тексте: границы совпадений
+# размечаются ими, чтобы экранировать фрагмент до вставки тегов.
+MARK_START, MARK_END = '\x02', '\x03'
+
+TITLE_INDEX = FullTextIndex('title_fts', 'title', ('name',))
+REVIEW_INDEX = FullTextIndex('review_fts', 'review', ('text',))
+COMMENT_INDEX = FullTextIndex('comment_fts', 'comment', ('text',))
+
+INDEXES = (TITLE_INDEX, REVIEW_INDEX, COMMENT_INDEX)
+
+
+def search_available(using):
+    """Полнотекстовые индексы создаются миграциями только в SQLite."""
+    return connections[using].vendor == 'sqlite'
+
+
+def match_query(text):
+    """
+    Запрос FTS5 из пользовательского ввода: каждое слово ищется
+    как префикс, все слова должны встречаться в документе.
+    None, если в строке нет ни одного слова.
+    """
+    tokens = TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def create_indexes(*indexes):
+    """Операция миграции, создающая индексы в SQLite."""
+
+    def forwards(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for index in indexes:
+            for sql in index.create_sql():
+                schema_editor.execute(sql)
+            index.rebuild(schema_editor.connection)
+
+    def backwards(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for index in indexes:
+            for sql in index.drop_sql():
+                schema_editor.execute(sql)
+
+    return forwards, backwards
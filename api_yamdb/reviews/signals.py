@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete
+from django.dispatch import Signal, receiver
+
+from reviews.models import Review, Title
+
+# Загрузка данных в обход ORM (import_csv): сигналы моделей не приходят,
+# поэтому кэши сбрасываются по этому сигналу. models - изменённые модели.
+data_imported = Signal()
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_rating(sender, instance, **kwargs):
+    """
+    Удаление отзыва пересчитывает рейтинг произведения по оставшимся
+    отзывам. Сигнал приходит и тогда, когда строку уже удалил
+    параллельный запрос, поэтому оценка не вычитается.
+    """
+    if getattr(instance, 'title_deleted', False):
+        return
+    Title.recalculate_rating(instance.title_id)
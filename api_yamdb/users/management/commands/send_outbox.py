@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.outbox import drain
+
+
+class Command(BaseCommand):
+    help = 'Отправка писем из очереди исходящих писем'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Количество писем, выбираемых из очереди за раз.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а проверять очередь каждые --interval с.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза между проверками очереди в режиме --loop.',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        while True:
+            try:
+                sent, failed = drain(options['batch_size'])
+            except OSError as error:
+                if not options['loop']:
+                    raise CommandError(
+                        f'Нет соединения с почтовым сервером: {error}'
+                    ) from error
+                self.stderr.write(f'Нет соединения: {error}')
+            else:
+                if sent or failed or not options['loop']:
+                    self.stdout.write(
+                        f'Отправлено писем: {sent}, с ошибкой: {failed}'
+                    )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
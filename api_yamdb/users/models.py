@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 from users.validators import ValidateUsername
 
@@ -13,6 +14,9 @@ CHOICES_ROLE = (
     (ADMIN_ROLE, 'Администратор'),
 )
 
+# Поля, от которых зависят права, записанные в токен.
+RIGHTS_FIELDS = ('role', 'is_superuser', 'is_staff', 'is_active')
+
 
 class User(ValidateUsername, AbstractUser):
     """Пользователям добавлены новые поля биография и роль."""
@@ -28,6 +32,11 @@ class User(ValidateUsername, AbstractUser):
         choices=CHOICES_ROLE,
         default=USER_ROLE,
     )
+    token_version = models.PositiveIntegerField(
+        verbose_name='Версия токенов',
+        default=0,
+        editable=False,
+    )
 
     class Meta():
         db_table = 'user'
@@ -54,3 +63,80 @@ class User(ValidateUsername, AbstractUser):
 
     def __str__(self):
         return self.username
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rights = tuple(
+            instance.__dict__.get(field) for field in RIGHTS_FIELDS
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Изменение роли или флагов доступа увеличивает версию токенов:
+        выданные ранее токены с прежними правами перестают приниматься.
+        """
+        loaded = getattr(self, '_loaded_rights', None)
+        current = tuple(self.__dict__.get(field) for field in RIGHTS_FIELDS)
+        if loaded is not None and loaded != current:
+            self.token_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+        self._loaded_rights = current
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку (см. users.outbox)."""
+    subject = models.CharField(
+        verbose_name='Тема',
+        max_length=255,
+    )
+    message = models.TextField(
+        verbose_name='Текст',
+    )
+    from_email = models.EmailField(
+        verbose_name='Отправитель',
+    )
+    recipient = models.EmailField(
+        verbose_name='Получатель',
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток отправки',
+        default=0,
+    )
+    next_attempt = models.DateTimeField(
+        verbose_name='Следующая попытка',
+        default=timezone.now,
+    )
+    sent = models.DateTimeField(
+        verbose_name='Дата отправки',
+        null=True,
+        blank=True,
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True,
+    )
+
+    class Meta:
+        db_table = 'outgoing_email'
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'исходящие письма'
+        ordering = ('next_attempt',)
+        indexes = [
+            models.Index(
+                fields=('next_attempt',),
+                condition=models.Q(sent__isnull=True),
+                name='outgoing_email_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipient} - {self.subject}'
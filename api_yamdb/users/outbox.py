@@ -0,0 +1,119 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(subject, message, recipient_list, from_email=None):
+    """
+    Ставит письма в очередь вместо отправки в запросе.
+    Письма отправляет команда send_outbox; при EMAIL_OUTBOX_EAGER
+    они отправляются сразу после фиксации транзакции.
+    """
+    emails = [
+        OutgoingEmail.objects.create(
+            subject=subject,
+            message=message,
+            from_email=from_email or settings.DEFAULT_EMAIL,
+            recipient=recipient,
+        )
+        for recipient in recipient_list
+    ]
+    if settings.EMAIL_OUTBOX_EAGER:
+        transaction.on_commit(lambda: send_now(emails))
+    return emails
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед следующей попыткой."""
+    return timedelta(
+        seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    )
+
+
+def claim(batch_size):
+    """
+    Выбирает пакет писем к отправке и откладывает их следующую попытку
+    на EMAIL_OUTBOX_LEASE секунд, чтобы параллельный обработчик
+    не взял те же письма.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True).filter(
+                sent__isnull=True,
+                attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+                next_attempt__lte=now,
+            )[:batch_size]
+        )
+        OutgoingEmail.objects.filter(
+            pk__in=[email.pk for email in emails]
+        ).update(
+            next_attempt=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+        )
+    return emails
+
+
+def send_batch(emails, connection):
+    """
+    Отправляет письма через открытое соединение.
+    Неотправленные письма получают следующую попытку с задержкой.
+    """
+    sent, failed = [], []
+    for email in emails:
+        message = EmailMessage(
+            email.subject, email.message, email.from_email,
+            [email.recipient], connection=connection,
+        )
+        email.attempts += 1
+        try:
+            message.send()
+        except Exception as error:
+            email.last_error = repr(error)
+            failed.append(email)
+        else:
+            email.last_error = ''
+            sent.append(email)
+    now = timezone.now()
+    for email in sent:
+        email.sent = now
+    for email in failed:
+        email.next_attempt = now + retry_delay(email.attempts)
+    OutgoingEmail.objects.bulk_update(
+        sent + failed, ('attempts', 'sent', 'next_attempt', 'last_error')
+    )
+    return len(sent), len(failed)
+
+
+def send_now(emails):
+    """Отправка без очереди; при ошибке письма дождутся send_outbox."""
+    try:
+        with get_connection() as connection:
+            send_batch(emails, connection)
+    except Exception:
+        logger.exception('Не удалось отправить письма из очереди')
+
+
+def drain(batch_size):
+    """
+    Отправляет все готовые к отправке письма пакетами
+    через одно соединение с почтовым сервером.
+    Возвращает число отправленных и неотправленных писем.
+    """
+    total_sent = total_failed = 0
+    with get_connection() as connection:
+        while True:
+            emails = claim(batch_size)
+            if not emails:
+                break
+            sent, failed = send_batch(emails, connection)
+            total_sent += sent
+            total_failed += failed
+    return total_sent, total_failed
@@ -0,0 +1,13 @@
+import pytest
+from django.core.cache import cache
+
+from api.autocomplete import index as autocomplete_index
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    autocomplete_index.reset()
+    yield
+    autocomplete_index.reset()
+    cache.clear()
@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def eager_outbox(settings):
+    """Письма из очереди отправляются сразу, чтобы проверять mail.outbox."""
+    settings.EMAIL_OUTBOX_EAGER = True
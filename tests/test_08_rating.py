@@ -0,0 +1,93 @@
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Review, Title
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08TitleRating:
+
+    def get_rating(self, client, title_id):
+        response = client.get(f'/api/v1/titles/{title_id}/')
+        assert response.status_code == HTTPStatus.OK
+        return response.json()['rating']
+
+    def test_01_rating_follows_reviews(self, client, admin_client,
+                                       user_client, moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        url = f'/api/v1/titles/{title_id}/reviews/'
+
+        assert self.get_rating(client, title_id) is None, (
+            'Проверьте, что у произведения без отзывов рейтинг равен `None`.'
+        )
+
+        review = create_single_review(user_client, title_id, 'text', 4)
+        create_single_review(moderator_client, title_id, 'text', 8)
+        assert self.get_rating(client, title_id) == 6, (
+            'Проверьте, что рейтинг произведения пересчитывается '
+            'при создании отзыва.'
+        )
+
+        review_id = review.json()['id']
+        response = user_client.patch(f'{url}{review_id}/', data={'score': 10})
+        assert response.status_code == HTTPStatus.OK
+        assert self.get_rating(client, title_id) == 9, (
+            'Проверьте, что рейтинг произведения пересчитывается '
+            'при изменении оценки отзыва.'
+        )
+
+        response = user_client.delete(f'{url}{review_id}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert self.get_rating(client, title_id) == 8, (
+            'Проверьте, что рейтинг произведения пересчитывается '
+            'при удалении отзыва.'
+        )
+
+    def test_02_rebuild_ratings(self, client, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        create_single_review(user_client, title_id, 'text', 7)
+        Title.objects.update(rating_sum=0, rating_count=0)
+
+        call_command('rebuild_ratings')
+        title = Title.objects.get(pk=title_id)
+        assert (title.rating_sum, title.rating_count) == (7, 1), (
+            'Проверьте, что команда `rebuild_ratings` пересчитывает '
+            'рейтинги произведений по отзывам.'
+        )
+
+    def test_03_stale_instances(self, admin, user):
+        title = Title.objects.create(name='Солярис', year=1972)
+        Review.objects.create(title=title, author=admin, text='t', score=5)
+        Review.objects.create(title=title, author=user, text='t', score=2)
+        first, second = (
+            Review.objects.get(author=admin) for _ in range(2)
+        )
+        first.score = 3
+        first.save()
+        second.score = 1
+        second.save()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (3, 2), (
+            'Проверьте, что изменение оценки считается от сохранённой '
+            'оценки, а не от загруженной вместе с отзывом.'
+        )
+
+    def test_04_repeated_delete(self, admin, user):
+        title = Title.objects.create(name='Солярис', year=1972)
+        Review.objects.create(title=title, author=admin, text='t', score=5)
+        Review.objects.create(title=title, author=user, text='t', score=9)
+        first, second = (
+            Review.objects.get(author=admin) for _ in range(2)
+        )
+        first.delete()
+        second.delete()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (9, 1), (
+            'Проверьте, что повторное удаление уже удалённого отзыва '
+            'не меняет рейтинг произведения.'
+        )
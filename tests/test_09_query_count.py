@@ -0,0 +1,180 @@
+from http import HTTPStatus
+
+import pytest
+
+from api import dictionaries
+from api.dictionaries import genres
+from reviews.models import Category, Comment, Genre, Review, Title
+
+
+def create_catalog(size):
+    category = Category.objects.create(name='Фильм', slug='films')
+    genres = [
+        Genre.objects.create(name='Ужасы', slug='horror'),
+        Genre.objects.create(name='Комедия', slug='comedy'),
+    ]
+    for number in range(size):
+        title = Title.objects.create(
+            name=f'Произведение {number}', year=2000, category=category
+        )
+        title.genre.set(genres)
+
+
+def warm_up_dictionaries(client):
+    """Справочники жанров и категорий загружаются в память процесса."""
+    client.get('/api/v1/genres/')
+    client.get('/api/v1/categories/')
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09QueryCount:
+
+    @pytest.mark.parametrize('size,page', ((1, 1), (5, 1), (10, 1), (25, 3)))
+    def test_01_title_list(self, client, django_assert_num_queries,
+                           size, page):
+        create_catalog(size)
+        warm_up_dictionaries(client)
+        # COUNT(*), страница произведений, связи с жанрами;
+        # сами жанры и категории берутся из справочников в памяти.
+        with django_assert_num_queries(3):
+            response = client.get('/api/v1/titles/', {'page': page})
+        assert response.json()['results'], (
+            'Проверьте, что GET-запрос к `/api/v1/titles/` возвращает '
+            'произведения.'
+        )
+
+    @pytest.mark.parametrize('size', (1, 10))
+    def test_02_title_retrieve(self, client, django_assert_num_queries, size):
+        create_catalog(size)
+        title = Title.objects.first()
+        warm_up_dictionaries(client)
+        with django_assert_num_queries(2):
+            client.get(f'/api/v1/titles/{title.id}/')
+
+    def test_03_dictionaries(self, client, django_assert_num_queries):
+        create_catalog(1)
+        warm_up_dictionaries(client)
+        with django_assert_num_queries(0):
+            response = client.get('/api/v1/genres/', {'search': 'ужас'})
+            client.get('/api/v1/categories/')
+        results = response.json()['results']
+        assert [genre['slug'] for genre in results] == ['horror'], (
+            'Проверьте поиск по названию в справочнике жанров.'
+        )
+        Genre.objects.create(name='Драма', slug='drama')
+        response = client.get('/api/v1/genres/')
+        assert response.json()['count'] == 3, (
+            'Проверьте, что справочник жанров обновляется после записи.'
+        )
+
+    def test_04_dictionary_max_age(self, settings):
+        create_catalog(0)
+        assert len(genres.all()) == 2
+        # bulk_create не отправляет сигналов, версия справочника прежняя.
+        Genre.objects.bulk_create([Genre(name='Драма', slug='drama')])
+        assert len(genres.all()) == 2
+        settings.DICTIONARY_MAX_AGE = 0
+        assert len(genres.all()) == 3, (
+            'Проверьте, что устаревший снимок справочника перечитывается.'
+        )
+
+    def test_05_dictionary_version_per_page(self, client, monkeypatch):
+        create_catalog(10)
+        warm_up_dictionaries(client)
+        calls = []
+
+        def get_versions(*tags):
+            calls.append(tags)
+            return versions(*tags)
+
+        versions = dictionaries.get_versions
+        monkeypatch.setattr(dictionaries, 'get_versions', get_versions)
+        response = client.get('/api/v1/titles/')
+        assert len(response.json()['results']) == 10
+        assert len(calls) == 2, (
+            'Проверьте, что версия справочника проверяется в кэше один раз '
+            'на страницу произведений, а не для каждого произведения.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09NestedQueryCount:
+
+    @pytest.fixture
+    def review(self, admin):
+        title = Title.objects.create(name='Терминатор', year=1984)
+        return Review.objects.create(
+            title=title, author=admin, text='review', score=5
+        )
+
+    @pytest.fixture
+    def comment(self, review, user):
+        return Comment.objects.create(review=review, author=user, text='c')
+
+    def reviews_url(self, review):
+        return f'/api/v1/titles/{review.title_id}/reviews/'
+
+    def comments_url(self, review):
+        return f'{self.reviews_url(review)}{review.id}/comments/'
+
+    def test_01_review_read(self, client, review, django_assert_num_queries):
+        url = self.reviews_url(review)
+        with django_assert_num_queries(2):
+            assert client.get(url).status_code == HTTPStatus.OK
+        with django_assert_num_queries(1):
+            response = client.get(f'{url}{review.id}/')
+            assert response.status_code == HTTPStatus.OK
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/titles/0/reviews/')
+            assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_02_review_write(self, user_client, review,
+                             django_assert_num_queries):
+        url = self.reviews_url(review)
+        data = {'text': 'text', 'score': 3}
+        # Пользователь, проверка произведения и дубля, вставка, рейтинг.
+        with django_assert_num_queries(5):
+            response = user_client.post(url, data=data)
+            assert response.status_code == HTTPStatus.CREATED
+        with django_assert_num_queries(2):
+            response = user_client.post('/api/v1/titles/0/reviews/', data)
+            assert response.status_code == HTTPStatus.NOT_FOUND
+
+        review_id = Review.objects.get(text='text').id
+        review_url = f'{url}{review_id}/'
+        with django_assert_num_queries(6):
+            response = user_client.patch(review_url, data={'score': 9})
+            assert response.status_code == HTTPStatus.OK
+        with django_assert_num_queries(6):
+            response = user_client.delete(review_url)
+            assert response.status_code == HTTPStatus.NO_CONTENT
+
+    def test_03_comment_read(self, client, comment,
+                             django_assert_num_queries):
+        url = self.comments_url(comment.review)
+        with django_assert_num_queries(2):
+            assert client.get(url).status_code == HTTPStatus.OK
+        with django_assert_num_queries(1):
+            response = client.get(f'{url}{comment.id}/')
+            assert response.status_code == HTTPStatus.OK
+        with django_assert_num_queries(2):
+            response = client.get(
+                f'{self.reviews_url(comment.review)}0/comments/'
+            )
+            assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_04_comment_write(self, user_client, comment,
+                              django_assert_num_queries):
+        url = self.comments_url(comment.review)
+        # Пользователь, проверка отзыва, вставка.
+        with django_assert_num_queries(3):
+            response = user_client.post(url, data={'text': 'text'})
+            assert response.status_code == HTTPStatus.CREATED
+        with django_assert_num_queries(3):
+            response = user_client.patch(
+                f'{url}{comment.id}/', data={'text': 'new'}
+            )
+            assert response.status_code == HTTPStatus.OK
+        with django_assert_num_queries(4):
+            response = user_client.delete(f'{url}{comment.id}/')
+            assert response.status_code == HTTPStatus.NO_CONTENT
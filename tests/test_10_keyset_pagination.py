@@ -0,0 +1,69 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Comment, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10KeysetPagination:
+
+    @pytest.fixture
+    def comments_url(self, user):
+        title = Title.objects.create(name='Терминатор', year=1984)
+        review = Review.objects.create(
+            title=title, author=user, text='review', score=5
+        )
+        Comment.objects.bulk_create(
+            Comment(review=review, author=user, text=f'comment {number}')
+            for number in range(25)
+        )
+        return f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+
+    def collect_pages(self, client, url, link_key):
+        ids = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == HTTPStatus.OK
+            data = response.json()
+            assert 'count' not in data, (
+                'Проверьте, что курсорная пагинация не считает '
+                'общее количество объектов.'
+            )
+            ids.extend(obj['id'] for obj in data['results'])
+            url = data[link_key]
+        return ids
+
+    def test_01_cursor_walks_all_objects(self, client, comments_url):
+        expected = list(Comment.objects.values_list('id', flat=True))
+
+        ids = self.collect_pages(
+            client, f'{comments_url}?cursor=', 'next'
+        )
+        assert ids == expected, (
+            'Проверьте, что курсорная пагинация отдаёт все объекты '
+            'в порядке от новых к старым без повторов.'
+        )
+
+        response = client.get(f'{comments_url}?cursor=')
+        first_page = [obj['id'] for obj in response.json()['results']]
+        assert response.json()['previous'] is None
+        second_page = client.get(response.json()['next']).json()
+        previous = client.get(second_page['previous']).json()
+        assert [obj['id'] for obj in previous['results']] == first_page, (
+            'Проверьте, что ссылка `previous` курсорной пагинации '
+            'возвращает предыдущую страницу.'
+        )
+
+    def test_02_page_number_contract_kept(self, client, comments_url):
+        response = client.get(comments_url, {'page': 3})
+        data = response.json()
+        assert data['count'] == 25, (
+            'Проверьте, что без параметра `cursor` сохраняется '
+            'постраничная пагинация со счётчиком `count`.'
+        )
+        assert len(data['results']) == 5
+
+    def test_03_invalid_cursor(self, client, comments_url):
+        response = client.get(comments_url, {'cursor': 'invalid'})
+        assert response.status_code == HTTPStatus.NOT_FOUND
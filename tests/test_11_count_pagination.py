@@ -0,0 +1,100 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11CountPagination:
+    url = '/api/v1/titles/'
+
+    @pytest.fixture
+    def titles(self):
+        Title.objects.bulk_create(
+            Title(name=f'Произведение {number}', year=2000)
+            for number in range(12)
+        )
+        return list(Title.objects.all())
+
+    def test_01_count_is_cached(self, client, titles,
+                                django_assert_num_queries):
+        assert client.get(self.url).json()['count'] == 12
+        # Другой ответ (page=1), но тот же счётчик из кэша:
+        # только страница произведений и жанры.
+        with django_assert_num_queries(2):
+            response = client.get(self.url, {'page': 1})
+        assert response.json()['count'] == 12
+
+    def test_02_count_invalidated_on_write(self, client, titles):
+        assert client.get(self.url).json()['count'] == 12
+        Title.objects.create(name='Новое произведение', year=2000)
+        assert client.get(self.url).json()['count'] == 13, (
+            'Проверьте, что закэшированный счётчик сбрасывается '
+            'при создании объекта.'
+        )
+        titles[0].delete()
+        assert client.get(self.url).json()['count'] == 12, (
+            'Проверьте, что закэшированный счётчик сбрасывается '
+            'при удалении объекта.'
+        )
+
+    def test_03_count_cached_per_filter(self, client, titles):
+        Title.objects.create(name='Терминатор', year=1984)
+        assert client.get(self.url).json()['count'] == 13
+        response = client.get(self.url, {'year': 1984})
+        assert response.json()['count'] == 1, (
+            'Проверьте, что счётчик кэшируется отдельно для каждого '
+            'набора фильтров.'
+        )
+
+    def test_04_count_disabled(self, client, titles,
+                               django_assert_num_queries):
+        with django_assert_num_queries(2):
+            response = client.get(self.url, {'count': 'false'})
+        data = response.json()
+        assert response.status_code == HTTPStatus.OK
+        assert data['count'] is None
+        assert len(data['results']) == 10
+        assert data['previous'] is None
+        assert 'page=2' in data['next']
+
+        data = client.get(data['next']).json()
+        assert len(data['results']) == 2
+        assert data['next'] is None
+        assert data['previous'] is not None
+
+    def test_05_approximate_count(self, client, titles, settings):
+        settings.PAGINATION_APPROXIMATE_COUNT_THRESHOLD = 1
+        Title.objects.order_by('id')[5].delete()
+        response = client.get(self.url)
+        assert response.json()['count'] == 12, (
+            'Проверьте, что для больших таблиц без фильтров '
+            'используется оценка количества строк.'
+        )
+        response = client.get(self.url, {'year': 2000})
+        assert response.json()['count'] == 11
+
+    def test_06_review_count_per_title(self, client, titles, user, admin):
+        first, second = titles[:2]
+        Review.objects.create(title=first, author=user, text='t', score=5)
+        url = f'/api/v1/titles/{first.id}/reviews/'
+        assert client.get(url).json()['count'] == 1
+
+        Review.objects.create(title=second, author=user, text='t', score=5)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {'page': 1})
+        assert response.json()['count'] == 1
+        assert not any('COUNT' in query['sql'] for query in queries), (
+            'Проверьте, что отзыв на другое произведение не сбрасывает '
+            'закэшированный счётчик отзывов.'
+        )
+
+        Review.objects.create(title=first, author=admin, text='t', score=5)
+        response = client.get(url)
+        assert response.json()['count'] == 2, (
+            'Проверьте, что новый отзыв сбрасывает счётчик отзывов '
+            'своего произведения.'
+        )
@@ -0,0 +1,213 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, GenreTitle, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12TitleWrite:
+    url = '/api/v1/titles/'
+
+    @pytest.fixture
+    def genres(self):
+        Category.objects.create(name='Фильм', slug='films')
+        return [
+            Genre.objects.create(name=f'Жанр {number}', slug=f'genre{number}')
+            for number in range(5)
+        ]
+
+    def post_title(self, client, genres):
+        return client.post(self.url, data={
+            'name': 'Терминатор',
+            'year': 1984,
+            'category': 'films',
+            'genre': genres,
+        })
+
+    def test_01_unknown_slugs_reported_together(self, admin_client, genres):
+        response = self.post_title(
+            admin_client, ['genre0', 'unknown1', 'unknown2']
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        error = ' '.join(response.json()['genre'])
+        assert 'unknown1' in error and 'unknown2' in error, (
+            'Проверьте, что все неизвестные slug жанров перечислены '
+            'в одной ошибке валидации.'
+        )
+
+    def test_02_genres_resolved_in_one_query(self, admin_client, genres):
+        self.post_title(admin_client, ['genre0'])
+        queries = []
+        for slugs in (['genre0'], [genre.slug for genre in genres]):
+            with CaptureQueriesContext(connection) as context:
+                response = self.post_title(admin_client, slugs)
+            assert response.status_code == HTTPStatus.CREATED
+            assert sorted(response.json()['genre']) == sorted(slugs)
+            queries.append(len(context))
+        assert queries[0] == queries[1], (
+            'Проверьте, что количество запросов при создании произведения '
+            'не зависит от количества жанров.'
+        )
+
+    def test_03_genre_diff(self, admin_client, genres):
+        response = self.post_title(admin_client, ['genre0', 'genre1'])
+        title_id = response.json()['id']
+        kept = GenreTitle.objects.get(title_id=title_id, genre__slug='genre0')
+
+        response = admin_client.patch(
+            f'{self.url}{title_id}/', data={'genre': ['genre0', 'genre2']},
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert sorted(response.json()['genre']) == ['genre0', 'genre2']
+        assert GenreTitle.objects.filter(pk=kept.pk).exists(), (
+            'Проверьте, что при изменении жанров произведения '
+            'неизменившиеся связи не пересоздаются.'
+        )
+        title = Title.objects.get(pk=title_id)
+        assert sorted(title.genre.values_list('slug', flat=True)) == [
+            'genre0', 'genre2'
+        ]
+
+    def test_04_bulk_create_and_update(self, admin_client, genres):
+        existing = self.post_title(admin_client, ['genre0']).json()
+        payload = [
+            {
+                'name': f'Произведение {number}',
+                'year': 2000 + number,
+                'category': 'films',
+                'genre': ['genre1', 'genre2'],
+            }
+            for number in range(20)
+        ]
+        payload.append({
+            'id': existing['id'],
+            'name': 'Терминатор 2',
+            'year': 1991,
+            'category': 'films',
+            'genre': ['genre3'],
+        })
+        response = admin_client.post(
+            f'{self.url}bulk/', data=payload, format='json'
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что POST-запрос администратора к '
+            '`/api/v1/titles/bulk/` с корректными данными возвращает '
+            'ответ со статусом 201.'
+        )
+        data = response.json()
+        assert len(data) == 21
+        assert data[0]['genre'] == ['genre1', 'genre2']
+        assert Title.objects.count() == 21
+        title = Title.objects.get(pk=existing['id'])
+        assert title.name == 'Терминатор 2'
+        assert list(title.genre.values_list('slug', flat=True)) == ['genre3']
+        assert GenreTitle.objects.count() == 41
+
+    def test_05_bulk_reports_item_errors(self, admin_client, user_client,
+                                         genres):
+        payload = [
+            {'name': 'Хорошее', 'year': 2000, 'category': 'films',
+             'genre': ['genre0']},
+            {'name': 'Плохое', 'year': 2000, 'category': 'unknown',
+             'genre': ['genre0']},
+            {'id': 0, 'name': 'Нет такого', 'year': 2000,
+             'category': 'films', 'genre': ['genre0']},
+        ]
+        url = f'{self.url}bulk/'
+        response = user_client.post(url, data=payload, format='json')
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+        response = admin_client.post(url, data=payload, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        errors = response.json()
+        assert errors[0] == {}
+        assert 'category' in errors[1]
+        assert 'id' in errors[2]
+        assert not Title.objects.exists(), (
+            'Проверьте, что при ошибке в любом элементе пакета '
+            'произведения не сохраняются.'
+        )
+
+    def test_06_bulk_ids(self, admin_client, genres, settings):
+        existing = Title.objects.create(name='Терминатор', year=1984)
+        url = f'{self.url}bulk/'
+        item = {'year': 2000, 'category': 'films', 'genre': ['genre0']}
+        response = admin_client.post(url, data=[
+            {**item, 'id': str(existing.id), 'name': 'Терминатор 2'},
+        ], format='json')
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что id произведения в пакете можно передать строкой.'
+        )
+        assert Title.objects.get(pk=existing.id).name == 'Терминатор 2'
+
+        response = admin_client.post(url, data=[
+            {**item, 'id': existing.id, 'name': 'Первое'},
+            {**item, 'name': 'Новое'},
+            {**item, 'id': str(existing.id), 'name': 'Второе'},
+        ], format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        errors = response.json()
+        assert 'id' in errors[0] and 'id' in errors[2], (
+            'Проверьте, что повторяющиеся id в пакете '
+            'отклоняются с ошибкой для каждого элемента.'
+        )
+        assert errors[1] == {}
+
+        settings.BULK_MAX_ITEMS = 2
+        response = admin_client.post(url, data=[
+            {**item, 'name': f'Произведение {number}'} for number in range(3)
+        ], format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что размер пакета ограничен BULK_MAX_ITEMS.'
+        )
+        assert Title.objects.count() == 1
+
+    def test_07_bulk_queries_do_not_grow(self, admin_client, genres):
+        queries = []
+        for size in (1, 2, 20):
+            payload = [
+                {'name': f'Произведение {number}', 'year': 2000,
+                 'category': 'films', 'genre': ['genre0', 'genre1']}
+                for number in range(size)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                response = admin_client.post(
+                    f'{self.url}bulk/', data=payload, format='json'
+                )
+            assert response.status_code == HTTPStatus.CREATED
+            queries.append(len(context))
+        assert queries[1] == queries[2], (
+            'Проверьте, что количество запросов при пакетной загрузке '
+            'не зависит от количества произведений.'
+        )
+
+    def test_08_bulk_create_without_returning(self, admin_client, genres,
+                                              monkeypatch):
+        Title.objects.create(name='Терминатор', year=1984)
+        # Путь MySQL и Oracle: ключи перечитываются после вставки.
+        monkeypatch.setattr(connection, 'vendor', 'mysql')
+        queries = []
+        for size in (1, 2, 20):
+            payload = [
+                {'name': f'Произведение {size}-{number}', 'year': 2000,
+                 'category': 'films', 'genre': ['genre0']}
+                for number in range(size)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                response = admin_client.post(
+                    f'{self.url}bulk/', data=payload, format='json'
+                )
+            assert response.status_code == HTTPStatus.CREATED
+            queries.append(len(context))
+            for item in response.json():
+                assert Title.objects.get(pk=item['id']).name == item['name'], (
+                    'Проверьте, что созданным произведениям возвращаются '
+                    'их первичные ключи.'
+                )
+        assert queries[1] == queries[2], (
+            'Проверьте, что без RETURNING произведения не сохраняются '
+            'по одному.'
+        )
@@ -0,0 +1,166 @@
+import csv
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from api.autocomplete import index as autocomplete_index
+from reviews.management.commands.import_csv import data, dependency_order
+from reviews.models import Category, Comment, Genre, Review, Title
+
+FILES = {
+    'users.csv': (
+        ('id', 'username', 'email', 'role', 'bio', 'first_name',
+         'last_name'),
+        (100, 'reviewer', 'reviewer@yamdb.fake', 'user', '', '', ''),
+    ),
+    'category.csv': (('id', 'name', 'slug'), (1, 'Фильм', 'movie')),
+    'genre.csv': (('id', 'name', 'slug'), (1, 'Драма', 'drama')),
+    'titles.csv': (('id', 'name', 'year', 'category'),) + tuple(
+        (number, f'Произведение {number}', 2000, 1)
+        for number in range(1, 6)
+    ),
+    'genre_title.csv': (('id', 'title_id', 'genre_id'), (1, 1, 1)),
+    'review.csv': (('id', 'title_id', 'text', 'author', 'score',
+                    'pub_date'),) + tuple(
+        (number, number, 'text', 100, number, '2020-01-13T23:20:02.422Z')
+        for number in range(1, 6)
+    ),
+    'comments.csv': (('id', 'review_id', 'text', 'author', 'pub_date'),),
+}
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        csv.writer(file).writerows(rows)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13ImportCsv:
+
+    @pytest.fixture
+    def data_dir(self, tmp_path):
+        for name, rows in FILES.items():
+            write_csv(tmp_path / name, rows)
+        return tmp_path
+
+    def import_csv(self, data_dir, **options):
+        call_command(
+            'import_csv', data_dir=data_dir, chunk_size=2,
+            stdout=StringIO(), **options
+        )
+
+    def test_01_import_and_rerun(self, data_dir):
+        self.import_csv(data_dir)
+        assert Title.objects.count() == 5
+        assert Title.objects.get(pk=3).rating == 3, (
+            'Проверьте, что после импорта пересчитываются рейтинги.'
+        )
+        self.import_csv(data_dir)
+        assert Review.objects.count() == 5, (
+            'Проверьте, что повторный запуск `import_csv` не задваивает '
+            'уже загруженные строки.'
+        )
+
+    def test_02_failure_exits_and_resumes(self, data_dir, django_user_model):
+        rows = list(FILES['review.csv'])
+        rows[4] = (4, 4, 'text', 101, 4, '2020-01-13T23:20:02.422Z')
+        write_csv(data_dir / 'review.csv', rows)
+        with pytest.raises(CommandError):
+            self.import_csv(data_dir)
+        assert Review.objects.count() == 2, (
+            'Проверьте, что при ошибке сохраняются уже загруженные пакеты.'
+        )
+
+        django_user_model.objects.create(
+            id=101, username='late', email='late@yamdb.fake'
+        )
+        self.import_csv(data_dir)
+        assert sorted(Review.objects.values_list('id', flat=True)) == [
+            1, 2, 3, 4, 5
+        ], (
+            'Проверьте, что `import_csv` продолжает загрузку '
+            'с прерванного пакета.'
+        )
+
+    def test_03_upsert(self, data_dir):
+        self.import_csv(data_dir)
+        write_csv(data_dir / 'category.csv', (
+            ('id', 'name', 'slug'),
+            (1, 'Кино', 'movie'),
+            (2, 'Книга', 'book'),
+        ))
+        write_csv(data_dir / 'genre.csv', (('id', 'name', 'slug'),
+                                           (7, 'Драма', 'drama')))
+        with pytest.raises(CommandError):
+            self.import_csv(data_dir)
+
+        self.import_csv(data_dir, upsert=True)
+        assert Category.objects.get(slug='movie').name == 'Кино'
+        assert Category.objects.filter(slug='book').exists()
+        assert Genre.objects.get(slug='drama').pk == 1, (
+            'Проверьте, что жанры обновляются по `slug`.'
+        )
+        assert Title.objects.count() == 5
+
+    def test_04_validation_before_write(self, data_dir, django_user_model):
+        rows = list(FILES['titles.csv'])
+        rows[3] = (3, 'Произведение 3', 'не год', 1)
+        write_csv(data_dir / 'titles.csv', rows)
+        with pytest.raises(CommandError, match='titles.csv'):
+            self.import_csv(data_dir, workers=2)
+        assert not django_user_model.objects.exists(), (
+            'Проверьте, что `import_csv` проверяет все файлы '
+            'до начала записи в базу.'
+        )
+
+    @pytest.mark.parametrize('workers', (1, 3))
+    def test_05_workers(self, data_dir, workers):
+        self.import_csv(data_dir, workers=workers)
+        assert Review.objects.count() == 5, (
+            'Проверьте, что результат импорта не зависит от `--workers`.'
+        )
+
+    def test_06_dependency_order(self):
+        order = dependency_order([model for _, model in reversed(data)])
+        assert order.index(Title) > order.index(Category)
+        assert order.index(Review) > order.index(Title)
+        assert order.index(Comment) > order.index(Review), (
+            'Проверьте, что таблицы загружаются после таблиц, '
+            'на которые ссылаются.'
+        )
+
+    def test_07_caches_reset(self, client, data_dir):
+        assert client.get('/api/v1/titles/').json()['count'] == 0
+        assert client.get('/api/v1/categories/').json()['count'] == 0
+        assert client.get(
+            '/api/v1/autocomplete/', {'q': 'произв'}
+        ).json() == []
+        self.import_csv(data_dir)
+        assert client.get('/api/v1/titles/').json()['count'] == 5, (
+            'Проверьте, что после `import_csv` сбрасываются '
+            'закэшированные ответы.'
+        )
+        assert client.get('/api/v1/categories/').json()['count'] == 1
+        assert client.get('/api/v1/titles/1/').json()['name'] == (
+            'Произведение 1'
+        )
+
+        rows = list(FILES['titles.csv'])
+        rows[1] = (1, 'Новое название', 2000, 1)
+        write_csv(data_dir / 'titles.csv', rows)
+        self.import_csv(data_dir, upsert=True)
+        assert client.get('/api/v1/titles/1/').json()['name'] == (
+            'Новое название'
+        ), (
+            'Проверьте, что `import_csv` сбрасывает кэш карточек '
+            'произведений.'
+        )
+        # Первый запрос отвечает по прежнему индексу и перестраивает его.
+        client.get('/api/v1/autocomplete/', {'q': 'нов'})
+        autocomplete_index.refreshing.join()
+        assert client.get('/api/v1/autocomplete/', {'q': 'нов'}).json(), (
+            'Проверьте, что после `import_csv` перестраивается '
+            'индекс автодополнения.'
+        )
@@ -0,0 +1,67 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Title
+
+URL = '/api/v1/titles/'
+
+
+def search(client, text):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(URL, {'name': text})
+    assert any('MATCH' in query['sql'] for query in context.captured_queries), (
+        'Проверьте, что поиск по названию использует полнотекстовый индекс.'
+    )
+    return [title['name'] for title in response.json()['results']]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14TitleSearch:
+
+    def test_01_prefix_and_relevance(self, client):
+        Title.objects.bulk_create([
+            Title(name='Война и мир', year=1869),
+            Title(name='Мир Дикого Запада', year=2016),
+            Title(name='Мир, мир, мир', year=2000),
+            Title(name='Война миров', year=1898),
+        ])
+        assert search(client, 'мир') == [
+            'Мир, мир, мир', 'Война миров', 'Война и мир', 'Мир Дикого Запада'
+        ], (
+            'Проверьте, что поиск находит слова по префиксу '
+            'и сортирует результаты по релевантности.'
+        )
+        assert search(client, 'ВОЙН мир') == ['Война миров', 'Война и мир']
+        assert search(client, 'запад!') == ['Мир Дикого Запада']
+
+    def test_02_sync_on_write(self, client):
+        title = Title.objects.create(name='Солярис', year=1961)
+        assert search(client, 'солярис') == ['Солярис']
+
+        title.name = 'Пикник на обочине'
+        title.save()
+        assert search(client, 'солярис') == [], (
+            'Проверьте, что индекс обновляется при изменении названия.'
+        )
+        assert search(client, 'пикник') == ['Пикник на обочине']
+
+        title.delete()
+        assert search(client, 'пикник') == [], (
+            'Проверьте, что индекс обновляется при удалении произведения.'
+        )
+
+    def test_03_rebuild_command(self, client):
+        Title.objects.create(name='Сталкер', year=1979)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO title_fts(title_fts) VALUES ('delete-all')"
+            )
+        call_command('rebuild_search_index', stdout=StringIO())
+        assert search(client, 'сталкер') == ['Сталкер'], (
+            'Проверьте, что команда `rebuild_search_index` '
+            'восстанавливает индекс.'
+        )
@@ -0,0 +1,92 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Comment, Review, Title
+
+REVIEWS_URL = '/api/v1/search/reviews/'
+COMMENTS_URL = '/api/v1/search/comments/'
+
+
+@pytest.fixture
+def reviews(user, admin):
+    Title.objects.bulk_create([
+        Title(name='Солярис', year=1961),
+        Title(name='Сталкер', year=1979),
+    ])
+    titles = list(Title.objects.order_by('id'))
+    return [
+        Review.objects.create(
+            title=titles[0], author=user, score=9,
+            text='Океан думает, а люди <b>не понимают</b> океан.',
+        ),
+        Review.objects.create(
+            title=titles[0], author=admin, score=3,
+            text='Скучный фильм про станцию на орбите.',
+        ),
+        Review.objects.create(
+            title=titles[1], author=user, score=7,
+            text='Зона исполняет желания, но не те.',
+        ),
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15TextSearch:
+
+    def test_01_review_search(self, client, reviews):
+        response = client.get(REVIEWS_URL, {'q': 'океан'})
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что эндпоинт `{REVIEWS_URL}` доступен всем.'
+        )
+        data = response.json()
+        assert data['count'] == 1
+        result = data['results'][0]
+        assert result['id'] == reviews[0].id
+        assert result['title'] == reviews[0].title_id
+        assert '<mark>Океан</mark>' in result['snippet'], (
+            'Проверьте, что в результатах поиска подсвечены совпадения.'
+        )
+        assert '<b>' not in result['snippet'], (
+            'Проверьте, что текст фрагмента экранируется.'
+        )
+
+    def test_02_review_filters(self, client, reviews, user):
+        def found(**params):
+            response = client.get(REVIEWS_URL, params)
+            return [review['id'] for review in response.json()['results']]
+
+        assert found(q='не') == [reviews[2].id, reviews[0].id]
+        assert found(q='не', title=reviews[0].title_id) == [reviews[0].id]
+        assert found(q='фильм', author=user.username) == []
+        assert found(q='не', min_score=8) == [reviews[0].id]
+        assert found(q='не', max_score=8) == [reviews[2].id], (
+            'Проверьте фильтрацию результатов поиска по диапазону оценок.'
+        )
+        response = client.get(REVIEWS_URL)
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что без параметра `q` поиск возвращает ошибку 400.'
+        )
+
+    def test_03_comment_search_and_sync(self, client, reviews, user):
+        comment = Comment.objects.create(
+            review=reviews[2], author=user, text='Дикобраз знал про зону.'
+        )
+        response = client.get(COMMENTS_URL, {'q': 'зон', 'min_score': 5})
+        result = response.json()['results'][0]
+        assert result['id'] == comment.id
+        assert result['review'] == reviews[2].id
+        assert result['title'] == reviews[2].title_id
+        assert '<mark>зону</mark>' in result['snippet']
+
+        comment.text = 'Дикобраз повесился.'
+        comment.save()
+        response = client.get(COMMENTS_URL, {'q': 'зон'})
+        assert response.json()['count'] == 0, (
+            'Проверьте, что индекс комментариев обновляется при изменении.'
+        )
+        reviews[2].delete()
+        response = client.get(REVIEWS_URL, {'q': 'зона'})
+        assert response.json()['count'] == 0, (
+            'Проверьте, что индекс отзывов обновляется при удалении.'
+        )
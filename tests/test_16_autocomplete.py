@@ -0,0 +1,164 @@
+import pytest
+
+from api.autocomplete import AutocompleteIndex
+from api.autocomplete import index as autocomplete_index
+from reviews.models import Category, Genre, Review, Title
+
+URL = '/api/v1/autocomplete/'
+
+
+def suggest(client, q, **params):
+    response = client.get(URL, {'q': q, **params})
+    assert response.status_code == 200, (
+        f'Проверьте, что эндпоинт `{URL}` доступен всем.'
+    )
+    return [(item['type'], item['name']) for item in response.json()]
+
+
+@pytest.fixture
+def catalog(user, admin):
+    category = Category.objects.create(name='Мировое кино', slug='world')
+    Genre.objects.create(name='Мистика', slug='mystic')
+    titles = [
+        Title.objects.create(name=name, year=2000, category=category)
+        for name in ('Война и мир', 'Мир Дикого Запада', 'Мирный атом')
+    ]
+    for author in (user, admin):
+        Review.objects.create(
+            title=titles[1], author=author, text='text', score=5
+        )
+    Review.objects.create(title=titles[0], author=user, text='text', score=5)
+    return titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16Autocomplete:
+
+    def test_01_prefix_and_popularity(self, client, catalog):
+        assert suggest(client, 'мир') == [
+            ('category', 'Мировое кино'),
+            ('title', 'Мир Дикого Запада'),
+            ('title', 'Война и мир'),
+            ('title', 'Мирный атом'),
+        ], (
+            'Проверьте, что автодополнение ищет по началу слов '
+            'и сортирует подсказки по числу отзывов.'
+        )
+        assert suggest(client, 'ми', type='genre') == [('genre', 'Мистика')]
+        assert suggest(client, 'мир', type='title', limit=1) == [
+            ('title', 'Мир Дикого Запада')
+        ]
+        assert suggest(client, 'ВОЙНА И') == [('title', 'Война и мир')]
+        assert suggest(client, '') == []
+        assert client.get(URL, {'q': 'мир', 'type': 'user'}).status_code == 400
+
+    def test_02_incremental_updates(self, client, catalog, user, admin,
+                                    django_assert_num_queries):
+        suggest(client, 'мир')
+        with django_assert_num_queries(0):
+            assert suggest(client, 'мирн') == [('title', 'Мирный атом')]
+
+        title = catalog[2]
+        title.name = 'Мирная жизнь'
+        title.save()
+        Title.objects.create(name='Миражи', year=2001)
+        for author in (user, admin):
+            Review.objects.create(title=title, author=author, text='t', score=1)
+        with django_assert_num_queries(0):
+            assert suggest(client, 'мир', type='title') == [
+                ('title', 'Мир Дикого Запада'),
+                ('title', 'Мирная жизнь'),
+                ('title', 'Война и мир'),
+                ('title', 'Миражи'),
+            ], (
+                'Проверьте, что индекс автодополнения обновляется '
+                'при записи без перестроения.'
+            )
+
+        catalog[1].delete()
+        with django_assert_num_queries(0):
+            assert ('title', 'Мир Дикого Запада') not in suggest(
+                client, 'мир'
+            )
+
+    def test_03_popularity_from_api(self, client, catalog, user_client,
+                                    admin_client, moderator_client):
+        suggest(client, 'мир')
+        url = f'/api/v1/titles/{catalog[2].id}/reviews/'
+        for author_client in (user_client, admin_client, moderator_client):
+            response = author_client.post(url, {'text': 'text', 'score': 5})
+            assert response.status_code == 201
+        assert suggest(client, 'мир', type='title') == [
+            ('title', 'Мирный атом'),
+            ('title', 'Мир Дикого Запада'),
+            ('title', 'Война и мир'),
+        ], (
+            'Проверьте, что отзывы, созданные через API, '
+            'повышают популярность произведения в автодополнении.'
+        )
+
+    def test_04_background_rebuild(self, client, catalog,
+                                   django_assert_num_queries):
+        suggest(client, 'мир')
+        Title.objects.bulk_create([Title(name='Миражи', year=2001)])
+        autocomplete_index.invalidate()
+        with django_assert_num_queries(0):
+            assert ('title', 'Миражи') not in suggest(client, 'мир'), (
+                'Проверьте, что до перестроения автодополнение отвечает '
+                'по прежнему индексу, не читая базу в запросе.'
+            )
+        autocomplete_index.refreshing.join()
+        assert ('title', 'Миражи') in suggest(client, 'мир'), (
+            'Проверьте, что устаревший индекс перестраивается в фоне.'
+        )
+
+    def test_05_memoized_top_updates(self, client, catalog, user, admin,
+                                     monkeypatch):
+        monkeypatch.setattr(autocomplete_index, 'scan_limit', 0)
+        suggest(client, 'мир')
+        suggest(client, 'атом')
+        Review.objects.create(
+            title=catalog[2], author=admin, text='text', score=5
+        )
+        Title.objects.create(name='Миражи', year=2001)
+        assert {('атом', None), ('мир', None)} <= set(
+            autocomplete_index.top
+        ), (
+            'Проверьте, что изменение записи не сбрасывает запомненные '
+            'подсказки префиксов.'
+        )
+        expected = [
+            ('category', 'Мировое кино'),
+            ('title', 'Мир Дикого Запада'),
+            ('title', 'Война и мир'),
+            ('title', 'Мирный атом'),
+            ('title', 'Миражи'),
+        ]
+        assert suggest(client, 'мир') == expected, (
+            'Проверьте, что запомненные подсказки префикса поправляются '
+            'при изменении подходящих записей.'
+        )
+        autocomplete_index.top.clear()
+        assert suggest(client, 'мир') == expected
+
+    def test_06_changes_from_other_process(self, client, catalog, user,
+                                           django_assert_num_queries):
+        other = AutocompleteIndex()
+        other.search('мир', 10)
+        title = catalog[2]
+        title.name = 'Мирная жизнь'
+        title.save()
+        Review.objects.create(title=title, author=user, text='t', score=1)
+        catalog[0].delete()
+        with django_assert_num_queries(0):
+            names = [entry.name for entry in other.search('мир', 10)]
+        assert names == [
+            'Мировое кино', 'Мир Дикого Запада', 'Мирная жизнь'
+        ], (
+            'Проверьте, что другие процессы применяют изменения индекса '
+            'автодополнения из журнала в кэше.'
+        )
+        assert other.refreshing is None, (
+            'Проверьте, что изменения из журнала не приводят '
+            'к перестроению индекса.'
+        )
@@ -0,0 +1,140 @@
+import pytest
+from django.db import transaction
+
+from api.cache import get_versions, model_tag
+from reviews.models import Comment, Genre, Review, Title
+
+
+@pytest.fixture(params=('locmem', 'filebased'))
+def cache_backend(request, settings, tmp_path):
+    backend = {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'filebased': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'cache'),
+        },
+    }[request.param]
+    settings.CACHES = {'default': backend}
+    return request.param
+
+
+@pytest.fixture
+def catalog(cache_backend, admin):
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    titles = [
+        Title.objects.create(name=name, year=2000)
+        for name in ('Солярис', 'Сталкер')
+    ]
+    for title in titles:
+        title.genre.set([genre])
+    review = Review.objects.create(
+        title=titles[0], author=admin, text='text', score=5
+    )
+    Comment.objects.create(review=review, author=admin, text='text')
+    return titles, review
+
+
+def title_url(title):
+    return f'/api/v1/titles/{title.id}/'
+
+
+def reviews_url(title):
+    return f'{title_url(title)}reviews/'
+
+
+def comments_url(review):
+    return f'{reviews_url(review.title)}{review.id}/comments/'
+
+
+def assert_cached(client, url, django_assert_num_queries):
+    first = client.get(url)
+    with django_assert_num_queries(0):
+        second = client.get(url)
+    assert second.status_code == 200
+    assert second.content == first.content, (
+        f'Проверьте, что повторный GET-запрос к `{url}` '
+        'отдаётся из кэша без запросов к базе данных.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17ResponseCache:
+
+    def test_01_responses_cached(self, client, catalog,
+                                 django_assert_num_queries):
+        titles, review = catalog
+        for url in ('/api/v1/titles/', title_url(titles[0]),
+                    reviews_url(titles[0]), comments_url(review),
+                    '/api/v1/genres/', '/api/v1/categories/'):
+            assert_cached(client, url, django_assert_num_queries)
+
+    def test_02_review_evicts_only_its_title(self, client, catalog, user,
+                                             django_assert_num_queries):
+        titles, review = catalog
+        for url in ('/api/v1/titles/', title_url(titles[0]),
+                    title_url(titles[1]), reviews_url(titles[0]),
+                    comments_url(review)):
+            client.get(url)
+
+        Review.objects.create(
+            title=titles[0], author=user, text='text', score=1
+        )
+        assert client.get(title_url(titles[0])).json()['rating'] == 3, (
+            'Проверьте, что новый отзыв сбрасывает кэш карточки '
+            'его произведения.'
+        )
+        assert client.get(reviews_url(titles[0])).json()['count'] == 2
+        rating = {
+            title['id']: title['rating']
+            for title in client.get('/api/v1/titles/').json()['results']
+        }
+        assert rating[titles[0].id] == 3, (
+            'Проверьте, что новый отзыв сбрасывает страницы списка '
+            'с его произведением.'
+        )
+        with django_assert_num_queries(0):
+            client.get(title_url(titles[1]))
+            client.get(comments_url(review))
+
+    def test_03_comment_and_genre_invalidation(self, client, catalog,
+                                               django_assert_num_queries):
+        titles, review = catalog
+        client.get(comments_url(review))
+        client.get(title_url(titles[1]))
+        client.get(reviews_url(titles[0]))
+
+        Comment.objects.create(review=review, author=review.author, text='t')
+        assert client.get(comments_url(review)).json()['count'] == 2, (
+            'Проверьте, что новый комментарий сбрасывает кэш '
+            'списка комментариев отзыва.'
+        )
+        with django_assert_num_queries(0):
+            client.get(reviews_url(titles[0]))
+
+        Genre.objects.filter(slug='drama').get().delete()
+        assert client.get(title_url(titles[1])).json()['genre'] == [], (
+            'Проверьте, что изменение жанра сбрасывает кэш карточек '
+            'произведений.'
+        )
+
+    def test_04_key_includes_role(self, client, admin_client, catalog):
+        titles, _ = catalog
+        client.get(title_url(titles[0]))
+        response = admin_client.get(title_url(titles[0]), {'x': '1'})
+        assert response.status_code == 200
+        anonymous = client.get(title_url(titles[0]), {'x': '1'})
+        assert anonymous.content == response.content
+
+    def test_05_model_tag_bumped_after_commit(self, catalog):
+        tag = model_tag(Title)
+        before = get_versions(tag)
+        with transaction.atomic():
+            Title.objects.create(name='Зеркало', year=1975)
+            assert get_versions(tag) == before, (
+                'Проверьте, что версия модели меняется только после '
+                'фиксации транзакции: иначе параллельный запрос '
+                'закэширует ещё не изменённые данные.'
+            )
+        assert get_versions(tag) != before
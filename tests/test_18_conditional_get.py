@@ -0,0 +1,90 @@
+import time
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Comment, Review, Title
+
+
+@pytest.fixture
+def review(admin):
+    title = Title.objects.create(name='Солярис', year=1961)
+    return Review.objects.create(
+        title=title, author=admin, text='text', score=5
+    )
+
+
+def urls(review):
+    title_url = f'/api/v1/titles/{review.title_id}/'
+    reviews_url = f'{title_url}reviews/'
+    return title_url, reviews_url, f'{reviews_url}{review.id}/comments/'
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18ConditionalGet:
+
+    def test_01_not_modified(self, client, review,
+                             django_assert_num_queries):
+        for url in urls(review):
+            response = client.get(url)
+            etag = response.get('ETag')
+            assert etag and response.get('Last-Modified'), (
+                f'Проверьте, что ответ на GET-запрос к `{url}` '
+                'содержит заголовки ETag и Last-Modified.'
+            )
+            with django_assert_num_queries(0):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+                f'Проверьте, что GET-запрос к `{url}` с актуальным '
+                'If-None-Match получает ответ 304 без запросов к базе.'
+            )
+            assert response['ETag'] == etag
+            response = client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+            assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    def test_02_validators_change_on_write(self, client, review, user):
+        title_url, reviews_url, comments_url = urls(review)
+        etags = {url: client.get(url)['ETag'] for url in urls(review)}
+
+        Comment.objects.create(review=review, author=user, text='text')
+        response = client.get(
+            comments_url, HTTP_IF_NONE_MATCH=etags[comments_url]
+        )
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что новый комментарий меняет ETag '
+            'списка комментариев.'
+        )
+        assert response.json()['count'] == 1
+        response = client.get(
+            title_url, HTTP_IF_NONE_MATCH=etags[title_url]
+        )
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+        Review.objects.create(
+            title=review.title, author=user, text='text', score=1
+        )
+        for url in (title_url, reviews_url):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == HTTPStatus.OK, (
+                'Проверьте, что новый отзыв меняет ETag карточки '
+                'произведения и списка отзывов.'
+            )
+
+    def test_03_local_versions_expire(self, client, review, settings,
+                                      monkeypatch):
+        settings.CACHE_VERSION_LOCAL_TIMEOUT = 30
+        title_url = urls(review)[0]
+        etag = client.get(title_url)['ETag']
+        # Запись другого процесса: версии в памяти этого процесса
+        # она не меняет.
+        Title.objects.filter(pk=review.title_id).update(name='Зеркало')
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now + 31)
+        response = client.get(title_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что версии в кэше памяти процесса устаревают '
+            'через CACHE_VERSION_LOCAL_TIMEOUT секунд.'
+        )
+        assert response.json()['name'] == 'Зеркало'
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.core.cache import caches
+from django.db import connections
+from django.test import Client
+
+from api.cache import acquire_lock, lock_path, release_lock
+from api.serializers import ReviewSerializer, TitleReadSerializer
+from reviews.models import Review, Title
+
+
+@pytest.fixture
+def review(admin):
+    title = Title.objects.create(name='Солярис', year=1961)
+    return Review.objects.create(
+        title=title, author=admin, text='text', score=5
+    )
+
+
+@pytest.fixture
+def slow_serializers(monkeypatch):
+    """Считает построения ответов и замедляет их."""
+    calls = []
+    lock = threading.Lock()
+
+    for serializer in (TitleReadSerializer, ReviewSerializer):
+        original = serializer.to_representation
+
+        def to_representation(self, instance, original=original):
+            with lock:
+                calls.append(type(instance).__name__)
+            time.sleep(0.2)
+            return original(self, instance)
+
+        monkeypatch.setattr(serializer, 'to_representation',
+                            to_representation)
+    return calls
+
+
+def get_concurrently(url, count=5):
+    def get(_):
+        try:
+            return Client().get(url)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(count) as executor:
+        return list(executor.map(get, range(count)))
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19RequestCoalescing:
+
+    def test_01_single_flight(self, review, slow_serializers):
+        title_url = f'/api/v1/titles/{review.title_id}/'
+        for url, model in ((title_url, 'Title'),
+                           (f'{title_url}reviews/', 'Review')):
+            responses = get_concurrently(url)
+            assert {response.status_code for response in responses} == {200}
+            assert len({response.content for response in responses}) == 1
+            assert slow_serializers.count(model) == 1, (
+                f'Проверьте, что при промахе кэша для `{url}` ответ '
+                'строит один запрос, а остальные ждут его результат.'
+            )
+
+    def test_02_stale_while_revalidate(self, client, review, user, settings,
+                                       slow_serializers):
+        settings.RESPONSE_CACHE_STALE_WHILE_REVALIDATE = True
+        url = f'/api/v1/titles/{review.title_id}/reviews/'
+        assert client.get(url).json()['count'] == 1
+
+        Review.objects.create(
+            title=review.title, author=user, text='text', score=1
+        )
+        started = time.monotonic()
+        responses = get_concurrently(url)
+        assert time.monotonic() - started < 0.2, (
+            'Проверьте, что в режиме stale-while-revalidate устаревший '
+            'ответ отдаётся без ожидания пересчёта.'
+        )
+        assert {
+            response.json()['count'] for response in responses
+        } == {1}
+
+        deadline = time.monotonic() + 5
+        while client.get(url).json()['count'] != 2:
+            assert time.monotonic() < deadline, (
+                'Проверьте, что устаревший ответ обновляется в фоне.'
+            )
+            time.sleep(0.05)
+        assert slow_serializers.count('Review') == 1 + 2, (
+            'Проверьте, что фоновое обновление запускается один раз.'
+        )
+
+    def test_03_file_cache_lock(self, settings, tmp_path):
+        settings.CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'cache'),
+        }}
+        with ThreadPoolExecutor(8) as executor:
+            acquired = list(executor.map(
+                lambda _: acquire_lock('lock:key'), range(8)
+            ))
+        assert acquired.count(True) == 1, (
+            'Проверьте, что блокировку в файловом кэше получает '
+            'только один запрос.'
+        )
+        release_lock('lock:key')
+        assert acquire_lock('lock:key')
+
+        settings.RESPONSE_CACHE_LOCK_TIMEOUT = 0
+        time.sleep(0.01)
+        assert acquire_lock('lock:key'), (
+            'Проверьте, что оставленная блокировка истекает '
+            'через RESPONSE_CACHE_LOCK_TIMEOUT.'
+        )
+
+    def test_04_file_cache_stale_lock_takeover(self, settings, tmp_path,
+                                               monkeypatch):
+        settings.CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'cache'),
+        }}
+        assert acquire_lock('lock:key')
+        os.utime(lock_path(caches['default'], 'lock:key'), (0, 0))
+        remove = os.remove
+
+        def slow_remove(path):
+            time.sleep(0.01)
+            remove(path)
+
+        monkeypatch.setattr(os, 'remove', slow_remove)
+        with ThreadPoolExecutor(8) as executor:
+            acquired = list(executor.map(
+                lambda _: acquire_lock('lock:key'), range(8)
+            ))
+        assert acquired.count(True) == 1, (
+            'Проверьте, что оставленную блокировку в файловом кэше '
+            'перехватывает только один запрос.'
+        )
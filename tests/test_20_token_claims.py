@@ -0,0 +1,101 @@
+from http import HTTPStatus
+
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from api.authentication import TOKEN_RIGHTS_KEY
+from reviews.models import Review, Title
+
+
+def claims_client(client, user):
+    """Клиент с токеном, полученным через `/api/v1/auth/token/`."""
+    response = client.post('/api/v1/auth/token/', data={
+        'username': user.username,
+        'confirmation_code': default_token_generator.make_token(user),
+    })
+    assert response.status_code == HTTPStatus.OK
+    authorized = APIClient()
+    authorized.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {response.json()["access"]}'
+    )
+    return authorized
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20TokenClaims:
+
+    def test_01_permissions_without_queries(self, client, user, moderator,
+                                            django_assert_num_queries):
+        title = Title.objects.create(name='Солярис', year=1961)
+        review = Review.objects.create(
+            title=title, author=user, text='text', score=5
+        )
+        user_client = claims_client(client, user)
+        moderator_client = claims_client(client, moderator)
+        assert user_client.get('/api/v1/users/me/').json()['role'] == 'user'
+        moderator_client.get('/api/v1/users/me/')
+
+        with django_assert_num_queries(0):
+            response = user_client.post(
+                '/api/v1/categories/', data={'name': 'Кино', 'slug': 'film'}
+            )
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            'Проверьте, что права пользователя проверяются по claims '
+            'токена без запросов к базе данных.'
+        )
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/'
+        response = moderator_client.patch(url, data={'text': 'new'})
+        assert response.status_code == HTTPStatus.OK
+        response = user_client.post(
+            f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/',
+            data={'text': 'comment'},
+        )
+        assert response.status_code == HTTPStatus.CREATED
+        assert response.json()['author'] == user.username
+
+    def test_02_role_change_revokes_tokens(self, client, admin_client,
+                                           moderator, user):
+        moderator_client = claims_client(client, moderator)
+        url = f'/api/v1/users/{moderator.username}/'
+        response = admin_client.patch(url, data={'bio': 'new bio'})
+        assert response.status_code == HTTPStatus.OK
+        assert moderator_client.get(
+            '/api/v1/users/me/'
+        ).status_code == HTTPStatus.OK, (
+            'Проверьте, что изменение полей без прав доступа '
+            'не отзывает токены пользователя.'
+        )
+
+        response = admin_client.patch(url, data={'role': 'user'})
+        assert response.status_code == HTTPStatus.OK
+        response = moderator_client.get('/api/v1/users/me/')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что изменение роли пользователя '
+            'отзывает выданные ему токены.'
+        )
+        moderator.refresh_from_db()
+        response = claims_client(client, moderator).get('/api/v1/users/me/')
+        assert response.json()['role'] == 'user'
+
+        user_client = claims_client(client, user)
+        user.delete()
+        response = user_client.get('/api/v1/users/me/')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что токен удалённого пользователя не принимается.'
+        )
+
+    def test_03_rights_changed_without_signals(self, client, moderator):
+        moderator_client = claims_client(client, moderator)
+        assert moderator_client.get(
+            '/api/v1/users/me/'
+        ).status_code == HTTPStatus.OK
+        type(moderator).objects.filter(pk=moderator.pk).update(role='user')
+        # Запись о правах истекла или её не было в кэше этого процесса.
+        cache.delete(TOKEN_RIGHTS_KEY.format(moderator.pk))
+        response = moderator_client.get('/api/v1/users/me/')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что после истечения записи в кэше права '
+            'пользователя сверяются с базой данных.'
+        )
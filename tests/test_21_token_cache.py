@@ -0,0 +1,72 @@
+import time
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.backends import TokenBackend
+
+from api.authentication import ClaimsAccessToken, verified_tokens
+
+URL = '/api/v1/users/me/'
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Считает проверки подписи токенов."""
+    verified_tokens.clear()
+    calls = []
+    original = TokenBackend.decode
+
+    def decode(self, token, verify=True):
+        calls.append(token)
+        return original(self, token, verify)
+
+    monkeypatch.setattr(TokenBackend, 'decode', decode)
+    yield calls
+    verified_tokens.clear()
+
+
+def client_for(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21TokenCache:
+
+    def test_01_verified_once(self, user, decodes):
+        client = client_for(ClaimsAccessToken.for_user(user))
+        for _ in range(3):
+            assert client.get(URL).status_code == HTTPStatus.OK
+        assert len(decodes) == 1, (
+            'Проверьте, что повторный запрос с тем же токеном '
+            'не проверяет его подпись заново.'
+        )
+        assert verified_tokens.stats() == {'hits': 2, 'misses': 1, 'size': 1}
+
+    def test_02_size_limit(self, user, admin, settings, decodes):
+        settings.JWT_CACHE_SIZE = 1
+        clients = [
+            client_for(ClaimsAccessToken.for_user(author))
+            for author in (user, admin)
+        ]
+        for client in clients + clients:
+            assert client.get(URL).status_code == HTTPStatus.OK
+        assert len(decodes) == 4, (
+            'Проверьте, что кэш токенов вытесняет давно '
+            'использованные записи при превышении JWT_CACHE_SIZE.'
+        )
+        assert verified_tokens.stats()['size'] == 1
+
+    def test_03_expired_token(self, user, decodes):
+        token = ClaimsAccessToken.for_user(user)
+        token.set_exp(lifetime=timedelta(seconds=1))
+        client = client_for(token)
+        assert client.get(URL).status_code == HTTPStatus.OK
+        time.sleep(1.1)
+        assert client.get(URL).status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что запись кэша токенов живёт не дольше '
+            'срока действия токена.'
+        )
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+
+from users.models import OutgoingEmail
+
+URL = '/api/v1/auth/signup/'
+
+
+def signup(client, username):
+    response = client.post(URL, data={
+        'username': username, 'email': f'{username}@yamdb.fake'
+    })
+    assert response.status_code == 200
+    return response
+
+
+class BrokenBackend(EmailBackend):
+    """Почтовый сервер, отклоняющий письма."""
+
+    def send_messages(self, messages):
+        raise OSError('connection refused')
+
+
+@pytest.fixture
+def queued(settings):
+    settings.EMAIL_OUTBOX_EAGER = False
+    return settings
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22EmailOutbox:
+
+    def test_01_signup_enqueues(self, client, queued):
+        outbox_before = len(mail.outbox)
+        for username in ('first', 'second', 'third'):
+            signup(client, username)
+        assert len(mail.outbox) == outbox_before, (
+            f'Проверьте, что POST-запрос к `{URL}` ставит письмо '
+            'в очередь, а не отправляет его в запросе.'
+        )
+        assert OutgoingEmail.objects.filter(sent__isnull=True).count() == 3
+
+        call_command('send_outbox', batch_size=2)
+        assert len(mail.outbox) == outbox_before + 3, (
+            'Проверьте, что команда send_outbox отправляет '
+            'все письма из очереди.'
+        )
+        assert sorted(
+            email.to[0] for email in mail.outbox[outbox_before:]
+        ) == ['first@yamdb.fake', 'second@yamdb.fake', 'third@yamdb.fake']
+        assert not OutgoingEmail.objects.filter(sent__isnull=True).exists()
+
+        call_command('send_outbox')
+        assert len(mail.outbox) == outbox_before + 3
+
+    def test_02_retry_with_backoff(self, client, queued):
+        signup(client, 'retry')
+        queued.EMAIL_BACKEND = f'{__name__}.BrokenBackend'
+        call_command('send_outbox')
+        email = OutgoingEmail.objects.get()
+        assert email.attempts == 1 and email.sent is None
+        assert 'connection refused' in email.last_error
+        delay = email.next_attempt - timezone.now()
+        assert timedelta(seconds=30) < delay <= timedelta(
+            seconds=queued.EMAIL_OUTBOX_RETRY_DELAY
+        ), 'Проверьте, что неотправленное письмо откладывается.'
+
+        call_command('send_outbox')
+        assert OutgoingEmail.objects.get().attempts == 1, (
+            'Проверьте, что письмо не отправляется повторно '
+            'до истечения задержки.'
+        )
+
+        OutgoingEmail.objects.update(next_attempt=timezone.now())
+        call_command('send_outbox')
+        email = OutgoingEmail.objects.get()
+        assert email.attempts == 2
+        assert email.next_attempt - timezone.now() > timedelta(
+            seconds=queued.EMAIL_OUTBOX_RETRY_DELAY
+        ), 'Проверьте, что задержка растёт с каждой неудачной попыткой.'
+
+        queued.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+        OutgoingEmail.objects.update(next_attempt=timezone.now())
+        call_command('send_outbox')
+        assert OutgoingEmail.objects.get().sent is not None
+        assert mail.outbox[-1].to == ['retry@yamdb.fake']
@@ -0,0 +1,79 @@
+import json
+import logging
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Genre, Title
+
+URL = '/api/v1/titles/'
+
+
+def server_timing(response):
+    header = response.get('Server-Timing')
+    assert header, (
+        'Проверьте, что ответ содержит заголовок Server-Timing.'
+    )
+    metrics = {}
+    for metric in header.split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@pytest.fixture(autouse=True)
+def sample_all(settings):
+    settings.SQL_TIMING_SAMPLE_RATE = 1
+
+
+@pytest.fixture
+def catalog():
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    for name in ('Солярис', 'Сталкер'):
+        Title.objects.create(name=name, year=2000).genre.set([genre])
+
+
+@pytest.mark.django_db(transaction=True)
+class Test23ServerTiming:
+
+    def test_01_header_and_log(self, client, catalog, caplog):
+        caplog.set_level(logging.INFO, logger='api.middleware')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(URL)
+        metrics = server_timing(response)
+        assert set(metrics) == {'db', 'view', 'render', 'total'}
+        assert metrics['db']['desc'] == f'"{len(queries)} queries"', (
+            'Проверьте, что Server-Timing содержит число SQL-запросов.'
+        )
+        assert float(metrics['total']['dur']) >= float(
+            metrics['view']['dur']
+        )
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['path'] == URL and record['status'] == 200
+        assert record['queries'] == len(queries)
+        assert 'sql' not in record
+
+        cached = server_timing(client.get(URL))
+        assert float(cached['render']['dur']) == 0, (
+            'Проверьте, что у ответа из кэша нет времени рендеринга.'
+        )
+
+    def test_02_query_heavy_request_logs_sql(self, client, catalog, caplog,
+                                             settings):
+        settings.SQL_TIMING_MAX_QUERIES = 1
+        client.get(URL)
+        record = caplog.records[-1]
+        assert record.levelno == logging.WARNING
+        logged = json.loads(record.getMessage())
+        assert len(logged.get('sql', [])) == logged['queries'] > 1, (
+            'Проверьте, что запрос с большим числом SQL-запросов '
+            'логируется со списком запросов.'
+        )
+        assert any('title' in query['sql'] for query in logged['sql'])
+
+    def test_03_sampling(self, client, catalog, settings):
+        settings.SQL_TIMING_SAMPLE_RATE = 0
+        assert 'Server-Timing' not in client.get(URL), (
+            'Проверьте, что запросы вне выборки не замеряются.'
+        )
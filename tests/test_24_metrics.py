@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import re
+import shutil
+from http import HTTPStatus
+
+import pytest
+
+from api.metrics import exposition, registry
+from reviews.models import Title
+
+URL = '/api/v1/metrics/'
+
+
+@pytest.fixture
+def metrics_dir(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    registry.clear()
+    yield tmp_path
+    registry.clear()
+
+
+def sample(text, name, **labels):
+    """Значение ряда метрики с указанными метками."""
+    for line in text.splitlines():
+        match = re.fullmatch(rf'{name}(?:{{(.*)}})? (\S+)', line)
+        if match is None:
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', match.group(1) or ''))
+        if all(found.get(key) == str(value) for key, value in labels.items()):
+            return float(match.group(2))
+    return None
+
+
+def worker_requests(count):
+    registry.clear()
+    for _ in range(count):
+        registry.inc('http_requests_total', {
+            'route': 'titles', 'method': 'GET', 'status': 200
+        })
+        registry.observe(
+            'http_request_duration_seconds', {'route': 'titles'}, 0.3
+        )
+    registry.flush(force=True)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test24Metrics:
+
+    def test_01_access(self, client, user_client, admin_client, metrics_dir):
+        assert client.get(URL).status_code == HTTPStatus.UNAUTHORIZED
+        assert user_client.get(URL).status_code == HTTPStatus.FORBIDDEN, (
+            f'Проверьте, что `{URL}` доступен только администратору.'
+        )
+        response = admin_client.get(URL)
+        assert response.status_code == HTTPStatus.OK
+        assert response['Content-Type'].startswith('text/plain')
+
+    def test_02_requests_by_route(self, client, admin_client, metrics_dir):
+        title = Title.objects.create(name='Солярис', year=1961)
+        for url in ('/api/v1/titles/', f'/api/v1/titles/{title.id}/',
+                    f'/api/v1/titles/{title.id}/reviews/',
+                    f'/api/v1/titles/{title.id}/reviews/'):
+            client.get(url)
+        client.get('/api/v1/titles/0/reviews/')
+        client.post('/api/v1/auth/token/')
+
+        text = admin_client.get(URL).content.decode()
+        assert sample(text, 'http_requests_total', route='titles',
+                      method='GET', status=200) == 2, (
+            'Проверьте, что запросы считаются по маршрутам и статусам.'
+        )
+        assert sample(text, 'http_requests_total', route='reviews',
+                      status=404) == 1
+        assert sample(text, 'http_requests_total', route='auth',
+                      method='POST', status=400) == 1
+        assert sample(text, 'http_request_duration_seconds_count',
+                      route='reviews') == 3
+        assert sample(text, 'http_request_duration_seconds_bucket',
+                      route='reviews', le='+Inf') == 3
+        assert sample(text, 'db_queries_total', route='titles') > 0
+        assert sample(text, 'cache_requests_total', cache='response',
+                      result='hit') == 1, (
+            'Проверьте, что метрики содержат обращения к кэшу ответов.'
+        )
+        assert '# TYPE http_request_duration_seconds histogram' in text
+
+    def test_03_aggregates_processes(self, admin_client, metrics_dir):
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=worker_requests, args=(count,))
+            for count in (2, 3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert len(list(metrics_dir.glob('metrics_*.json'))) == 2
+
+        text = admin_client.get(URL).content.decode()
+        assert sample(text, 'http_requests_total', route='titles',
+                      method='GET', status=200) == 5, (
+            'Проверьте, что метрики складываются по всем процессам.'
+        )
+        assert sample(text, 'http_request_duration_seconds_bucket',
+                      route='titles', le=0.25) == 0
+        assert sample(text, 'http_request_duration_seconds_bucket',
+                      route='titles', le=0.5) == 5
+        assert sample(text, 'http_request_duration_seconds_sum',
+                      route='titles') == pytest.approx(1.5)
+
+    def test_04_dead_processes(self, admin_client, metrics_dir):
+        context = multiprocessing.get_context('fork')
+        worker = context.Process(target=worker_requests, args=(2,))
+        worker.start()
+        worker.join()
+        # Файл прежнего процесса, чей PID достался текущему.
+        shutil.copy(
+            metrics_dir / f'metrics_{worker.pid}.json',
+            metrics_dir / f'metrics_{os.getpid()}.json',
+        )
+        registry.flush(force=True)
+        assert sorted(path.name for path in metrics_dir.glob('*.json')) == [
+            f'metrics_{os.getpid()}.json', 'metrics_dead.json'
+        ], (
+            'Проверьте, что файлы завершившихся процессов переносятся '
+            'в общий архив.'
+        )
+
+        text = admin_client.get(URL).content.decode()
+        assert sample(text, 'http_requests_total', route='titles',
+                      method='GET', status=200) == 4, (
+            'Проверьте, что значения завершившихся процессов и прежнего '
+            'процесса с тем же PID сохраняются.'
+        )
+
+    def test_05_precision(self):
+        key = 'db_queries_total', (('route', 'titles'),)
+        text = exposition({key: 123456789.0}, {})
+        assert sample(text, 'db_queries_total') == 123456789
+        text = exposition({key: 1234567.125}, {})
+        assert 'db_queries_total{route="titles"} 1234567.125' in text, (
+            'Проверьте, что большие значения выводятся без округления.'
+        )
@@ -0,0 +1,75 @@
+import csv
+import json
+from collections import Counter
+
+import pytest
+from django.core.management import call_command
+from django.urls import URLResolver
+
+from api.management.commands.benchmark import SKIPPED
+from api.urls import urlpatterns
+from reviews.models import Comment, Review, Title
+
+
+def route_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from route_names(pattern.url_patterns)
+        else:
+            yield pattern.name
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    data_dir = tmp_path / 'data'
+    call_command(
+        'generate_dataset', output=data_dir, users=50, titles=40,
+        reviews=400, comments=600, genres=5, categories=3, load=True,
+    )
+    return data_dir
+
+
+@pytest.mark.django_db(transaction=True)
+class Test25Benchmark:
+
+    def test_01_generated_dataset(self, dataset):
+        assert Title.objects.count() == 40
+        assert abs(Review.objects.count() - 400) <= 40, (
+            'Проверьте, что generate_dataset создаёт заданное '
+            'количество отзывов.'
+        )
+        assert abs(Comment.objects.count() - 600) <= 60
+        with open(dataset / 'review.csv', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        pairs = {(row['title_id'], row['author']) for row in rows}
+        assert len(pairs) == len(rows), (
+            'Проверьте, что у одного произведения нет двух отзывов '
+            'одного автора.'
+        )
+        counts = sorted(
+            Counter(row['title_id'] for row in rows).values(), reverse=True
+        )
+        assert sum(counts[:4]) > len(rows) / 3, (
+            'Проверьте, что популярность произведений неравномерна.'
+        )
+
+    def test_02_benchmark_covers_routes(self, dataset, tmp_path):
+        output = tmp_path / 'results.json'
+        call_command('benchmark', requests=3, warmup=0, output=output)
+        with open(output, encoding='utf-8') as file:
+            report = json.load(file)
+        measured = {result['route'] for result in report['results']}
+        assert set(route_names(urlpatterns)) == measured | SKIPPED.keys(), (
+            'Проверьте, что benchmark замеряет все маршруты api/urls.py.'
+        )
+        for result in report['results']:
+            assert result['requests'] == 3 and result['errors'] == 0, (
+                f'Маршрут {result["route"]}: {result["statuses"]}'
+            )
+            assert {'p50', 'p99'} <= result['latency_ms'].keys()
+        assert report['dataset']['title'] == 40
+
+        call_command(
+            'benchmark', requests=2, warmup=0, route=['titles-detail'],
+            baseline=output, output=tmp_path / 'second.json',
+        )
@@ -0,0 +1,218 @@
+from http import HTTPStatus
+
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework.test import APIClient
+
+from api.authentication import ClaimsAccessToken
+from api.dictionaries import DICTIONARIES
+from api.pagination import CachedCountPageNumberPagination, KeysetPagination
+from api.urls import v1_router
+from api.utils import get_query_budget
+from api.views import (CategoryViewSet, CommentViewSet, GenreViewSet,
+                       ReviewViewSet, TitleViewSet, UserViewSet)
+from reviews.models import Category, Comment, Genre, Review, Title
+
+BUDGETED_VIEWSETS = (
+    UserViewSet, TitleViewSet, ReviewViewSet, CommentViewSet,
+    CategoryViewSet, GenreViewSet,
+)
+
+# Размеры страницы; данных на каждом уровне на один объект больше,
+# чтобы страница была полной и у неё была следующая.
+PAGE_SIZES = (2, 6)
+
+# Маршрут, метод, аргументы URL, тело запроса, роль клиента, статус.
+CASES = (
+    ('users-list', 'get', {}, None, 'admin', HTTPStatus.OK),
+    ('users-list', 'post', {},
+     {'username': 'newuser', 'email': 'newuser@yamdb.fake'},
+     'admin', HTTPStatus.CREATED),
+    ('users-detail', 'get', {'username': 'user0'}, None,
+     'admin', HTTPStatus.OK),
+    ('users-detail', 'patch', {'username': 'user0'}, {'bio': 'bio'},
+     'admin', HTTPStatus.OK),
+    ('users-detail', 'delete', {'username': 'user0'}, None,
+     'admin', HTTPStatus.NO_CONTENT),
+    ('users-me', 'get', {}, None, 'user', HTTPStatus.OK),
+    ('users-me', 'patch', {}, {'bio': 'bio'}, 'user', HTTPStatus.OK),
+    ('titles-list', 'get', {}, None, None, HTTPStatus.OK),
+    ('titles-list', 'post', {},
+     {'name': 'Новое', 'year': 2000, 'category': 'category',
+      'genre': ['genre0', 'genre1']},
+     'admin', HTTPStatus.CREATED),
+    ('titles-detail', 'get', {'pk': 'title'}, None, None, HTTPStatus.OK),
+    ('titles-detail', 'patch', {'pk': 'title'},
+     {'name': 'Другое', 'genre': ['genre1']}, 'admin', HTTPStatus.OK),
+    ('titles-detail', 'delete', {'pk': 'title'}, None,
+     'admin', HTTPStatus.NO_CONTENT),
+    ('titles-bulk', 'post', {},
+     [{'name': 'Пакет', 'year': 2000, 'category': 'category',
+       'genre': ['genre0']}],
+     'admin', HTTPStatus.CREATED),
+    ('reviews-list', 'get', {'title_id': 'title'}, None,
+     None, HTTPStatus.OK),
+    ('reviews-list', 'post', {'title_id': 'other'},
+     {'text': 'text', 'score': 5}, 'user', HTTPStatus.CREATED),
+    ('reviews-detail', 'get', {'title_id': 'title', 'pk': 'review'}, None,
+     None, HTTPStatus.OK),
+    ('reviews-detail', 'patch', {'title_id': 'title', 'pk': 'review'},
+     {'score': 1}, 'user', HTTPStatus.OK),
+    ('reviews-detail', 'delete', {'title_id': 'title', 'pk': 'review'},
+     None, 'user', HTTPStatus.NO_CONTENT),
+    ('comments-list', 'get', {'title_id': 'title', 'review_id': 'review'},
+     None, None, HTTPStatus.OK),
+    ('comments-list', 'post', {'title_id': 'title', 'review_id': 'review'},
+     {'text': 'text'}, 'user', HTTPStatus.CREATED),
+    ('comments-detail', 'get',
+     {'title_id': 'title', 'review_id': 'review', 'pk': 'comment'}, None,
+     None, HTTPStatus.OK),
+    ('comments-detail', 'patch',
+     {'title_id': 'title', 'review_id': 'review', 'pk': 'comment'},
+     {'text': 'new'}, 'user', HTTPStatus.OK),
+    ('comments-detail', 'delete',
+     {'title_id': 'title', 'review_id': 'review', 'pk': 'comment'}, None,
+     'user', HTTPStatus.NO_CONTENT),
+    ('categories-list', 'get', {}, None, None, HTTPStatus.OK),
+    ('categories-list', 'post', {}, {'name': 'Новая', 'slug': 'new'},
+     'admin', HTTPStatus.CREATED),
+    ('categories-detail', 'delete', {'slug': 'category'}, None,
+     'admin', HTTPStatus.NO_CONTENT),
+    ('genres-list', 'get', {}, None, None, HTTPStatus.OK),
+    ('genres-list', 'post', {}, {'name': 'Новый', 'slug': 'new'},
+     'admin', HTTPStatus.CREATED),
+    ('genres-detail', 'delete', {'slug': 'genre0'}, None,
+     'admin', HTTPStatus.NO_CONTENT),
+    ('auth-signup', 'post', {},
+     {'username': 'newuser', 'email': 'newuser@yamdb.fake'},
+     None, HTTPStatus.OK),
+    ('auth-token', 'post', {}, {'username': 'user0'}, None, HTTPStatus.OK),
+)
+
+
+def create_data(size, user):
+    """
+    Произведения с size + 1 жанрами каждое, у первого произведения
+    size + 1 отзывов, у отзыва пользователя user - size + 1 комментариев.
+    """
+    users = [
+        type(user).objects.create_user(
+            username=f'user{number}', email=f'user{number}@yamdb.fake'
+        )
+        for number in range(size + 1)
+    ]
+    category = Category.objects.create(name='Категория', slug='category')
+    genres = [
+        Genre.objects.create(name=f'Жанр {number}', slug=f'genre{number}')
+        for number in range(size + 1)
+    ]
+    titles = []
+    for number in range(size + 1):
+        title = Title.objects.create(
+            name=f'Произведение {number}', year=2000, category=category
+        )
+        title.genre.set(genres)
+        titles.append(title)
+    review = Review.objects.create(
+        title=titles[0], author=user, text='review', score=5
+    )
+    for author in users[1:]:
+        Review.objects.create(
+            title=titles[0], author=author, text='review', score=7
+        )
+    comments = [
+        Comment.objects.create(review=review, author=author, text='comment')
+        for author in (user, *users[1:])
+    ]
+    return {
+        'title': titles[0].id,
+        'other': titles[1].id,
+        'review': review.id,
+        'comment': comments[0].id,
+        'category': category.slug,
+        'genre0': genres[0].slug,
+        'user0': users[0].username,
+    }
+
+
+def claims_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {ClaimsAccessToken.for_user(user)}'
+    )
+    return client
+
+
+def case_id(case):
+    return f'{case[0]}-{case[1]}'
+
+
+@pytest.mark.django_db(transaction=True)
+class Test26QueryBudgets:
+
+    @pytest.fixture(params=PAGE_SIZES, ids=lambda size: f'page{size}')
+    def page_size(self, request, monkeypatch):
+        for pagination in (CachedCountPageNumberPagination, KeysetPagination):
+            monkeypatch.setattr(pagination, 'page_size', request.param)
+        return request.param
+
+    def test_01_budgets_declared(self):
+        missing = []
+        for prefix, viewset, basename in v1_router.registry:
+            if viewset not in BUDGETED_VIEWSETS:
+                continue
+            budgets = getattr(viewset, 'query_budget', {})
+            for route in v1_router.get_routes(viewset):
+                missing += [
+                    f'{basename}.{action}'
+                    for method, action in route.mapping.items()
+                    if method in viewset.http_method_names
+                    and hasattr(viewset, action)
+                    and action not in budgets
+                    and f'{basename}.{action}' not in missing
+                ]
+        for name in ('auth-signup', 'auth-token'):
+            if get_query_budget(resolve(reverse(name)), 'post') is None:
+                missing.append(name)
+        assert not missing, (
+            'Проверьте, что для каждого действия API объявлен бюджет '
+            f'SQL-запросов: нет бюджета для {", ".join(missing)}.'
+        )
+
+    @pytest.mark.parametrize('case', CASES, ids=case_id)
+    def test_02_action_within_budget(self, case, page_size, admin, user):
+        name, method, url_kwargs, body, role, status = case
+        data = create_data(page_size, user)
+        url = reverse(name, kwargs={
+            key: data.get(value, value) for key, value in url_kwargs.items()
+        })
+        if name == 'auth-token':
+            body = {
+                **body,
+                'confirmation_code': default_token_generator.make_token(
+                    type(user).objects.get(username=data['user0'])
+                ),
+            }
+        client = {
+            'admin': claims_client(admin), 'user': claims_client(user)
+        }.get(role, APIClient())
+        for dictionary in DICTIONARIES.values():
+            dictionary.load()
+        budget = get_query_budget(resolve(url), method)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, body, format='json')
+        assert response.status_code == status, (
+            f'Проверьте, что {method.upper()}-запрос к `{url}` возвращает '
+            f'ответ со статусом {status}.'
+        )
+        assert len(queries) <= budget, (
+            f'{method.upper()}-запрос к `{url}` при размере страницы '
+            f'{page_size} выполнил {len(queries)} SQL-запросов при '
+            f'бюджете {budget}. Проверьте, что сериализаторы не загружают '
+            'связанные объекты по одному:\n'
+            + '\n'.join(query['sql'] for query in queries)
+        )
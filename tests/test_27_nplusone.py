@@ -0,0 +1,93 @@
+import logging
+from http import HTTPStatus
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.test import Client
+
+from api.nplusone import NPlusOneError, NPlusOneWarning
+from api.views import ReviewViewSet
+from reviews.models import Review, Title
+
+
+@pytest.fixture
+def reviews(django_user_model):
+    title = Title.objects.create(name='Сталкер', year=1979)
+    for number in range(6):
+        author = django_user_model.objects.create_user(
+            username=f'author{number}', email=f'author{number}@yamdb.fake'
+        )
+        Review.objects.create(
+            title=title, author=author, text='text', score=5
+        )
+    return f'/api/v1/titles/{title.id}/reviews/'
+
+
+@pytest.fixture
+def lazy_authors(monkeypatch):
+    """Список отзывов без select_related('author')."""
+    monkeypatch.setattr(
+        ReviewViewSet, 'get_queryset',
+        lambda view: Review.objects.filter(
+            title_id=view.kwargs.get('title_id')
+        ),
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test27NPlusOne:
+
+    def test_01_raise(self, settings, reviews, lazy_authors):
+        settings.NPLUSONE_MODE = 'raise'
+        settings.NPLUSONE_THRESHOLD = 3
+        with pytest.raises(NPlusOneError) as error:
+            Client().get(reviews)
+        message = str(error.value)
+        assert 'Связь: Review.author' in message, (
+            'Проверьте, что отчёт об N+1 называет лениво загружаемую связь.'
+        )
+        assert (
+            "ReviewSerializer.author = SlugRelatedField(read_only=True, "
+            "slug_field='username')"
+        ) in message, (
+            'Проверьте, что отчёт об N+1 называет поле сериализатора.'
+        )
+        assert 'rest_framework/serializers.py' in message, (
+            'Проверьте, что отчёт об N+1 содержит стек вызовов.'
+        )
+
+    def test_02_log_and_warn(self, settings, reviews, lazy_authors, caplog):
+        settings.NPLUSONE_MODE = 'log'
+        settings.NPLUSONE_THRESHOLD = 3
+        caplog.set_level(logging.WARNING, logger='api.nplusone')
+        response = Client().get(reviews)
+        assert response.status_code == HTTPStatus.OK
+        records = [
+            record for record in caplog.records
+            if record.name == 'api.nplusone'
+        ]
+        assert len(records) == 1, (
+            'Проверьте, что о каждой форме запроса сообщается один раз '
+            'за запрос.'
+        )
+        assert 'Review.author' in records[0].getMessage()
+
+        settings.NPLUSONE_MODE = 'warn'
+        with pytest.warns(NPlusOneWarning, match='Review.author'):
+            # Другой адрес, чтобы не получить ответ из кэша.
+            response = Client().get(reviews, {'page': 1})
+        assert response.status_code == HTTPStatus.OK
+
+    def test_03_no_report_with_select_related(self, settings, reviews):
+        settings.NPLUSONE_MODE = 'raise'
+        settings.NPLUSONE_THRESHOLD = 1
+        response = Client().get(reviews)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что список отзывов загружает авторов '
+            'одним запросом.'
+        )
+
+    def test_04_invalid_mode(self, settings):
+        settings.NPLUSONE_MODE = 'ignore'
+        with pytest.raises(ImproperlyConfigured):
+            Client().get('/api/v1/')